@@ -4,12 +4,16 @@ from django.contrib.auth import get_user_model
 from unfold.admin import ModelAdmin
 from unfold.forms import AdminOwnPasswordChangeForm, UserChangeForm, UserCreationForm
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.utils import timezone
+from .models import EmailOutbox
+from apex.admin_performance import FastChangeListMixin
+from .search import MemberSearchAdminMixin
 
 User = get_user_model()
 
 
 @register(User)
-class CustomUserAdmin(BaseUserAdmin, ModelAdmin):
+class CustomUserAdmin(MemberSearchAdminMixin, FastChangeListMixin, BaseUserAdmin, ModelAdmin):
     form = UserChangeForm
     add_form = UserCreationForm
     change_password_form = AdminOwnPasswordChangeForm
@@ -38,3 +42,20 @@ class CustomUserAdmin(BaseUserAdmin, ModelAdmin):
             'fields': ('email', 'first_name', 'last_name', 'password1', 'password2'),
         }),
     )
+
+
+@register(EmailOutbox)
+class EmailOutboxAdmin(FastChangeListMixin, ModelAdmin):
+    list_display = ('to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to_email',)
+    readonly_fields = ('created_at', 'sent_at', 'attempts', 'last_error')
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status=EmailOutbox.STATUS_SENT).update(
+            status=EmailOutbox.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{count} email(s) queued for retry.")
+
+    retry_now.short_description = "🔁 Retry selected now"
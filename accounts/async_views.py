@@ -0,0 +1,355 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from apex.renderers import FastJSONRenderer, loads
+
+from .authentication import CachedJWTAuthentication
+from .hashing import HasherOverloaded, password_hasher
+from .models import User
+from .otp_store import (
+    ERROR_MESSAGES,
+    MISSING,
+    PASSWORD_RESET,
+    VALID,
+    VERIFICATION,
+    asend_otp,
+    get_otp_store,
+)
+from .serializers import (
+    LoginCredentialsSerializer,
+    LogoutSerializer,
+    OTPRequestSerializer,
+    OTPVerificationSerializer,
+    PasswordResetConfirmSerializer,
+    UserRegisterSerializer,
+)
+from .throttles import (
+    LoginThrottle,
+    OTPRequestThrottle,
+    OTPVerifyThrottle,
+    PasswordResetThrottle,
+    RequestPasswordResetThrottle,
+)
+from .tokens import RefreshToken
+
+
+# Rendered like the DRF views' responses, by the same renderer
+class APIResponse(HttpResponse):
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", FastJSONRenderer.media_type)
+        super().__init__(FastJSONRenderer().render(data), **kwargs)
+
+
+# Minimal async counterpart of GenericAPIView for the ASGI deployment: JSON or
+# form bodies, DRF-style throttling and DRF-shaped error responses.
+class AsyncAPIView(View):
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authenticated like the DRF views, so no CSRF check
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        # The anon/user throttles look at request.user, which may not be set without sessions
+        if not hasattr(request, "user"):
+            request.user = AnonymousUser()
+
+        # Authenticate before throttling, as DRF's APIView.initial() does: a token
+        # user is throttled in the user scope, and a bad token is a 401
+        try:
+            await self.authenticate(request)
+        except APIException as e:
+            return self.authentication_failed(e.detail)
+
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            allowed = await sync_to_async(throttle.allow_request, thread_sensitive=False)(
+                request, self
+            )
+            if not allowed:
+                return self.throttled(throttle.wait())
+
+        try:
+            self.data = self.parse_body(request)
+        except ValueError as e:
+            return APIResponse({"detail": f"JSON parse error - {e}"}, status=400)
+
+        return await super().dispatch(request, *args, **kwargs)
+
+    def parse_body(self, request):
+        if request.method != "POST":
+            return {}
+        if request.content_type == "application/json":
+            return loads(request.body or b"{}")
+        return request.POST
+
+    def throttled(self, wait):
+        # Throttled rounds the wait up, like DRF's Retry-After
+        throttled = Throttled(wait)
+        response = APIResponse({"detail": str(throttled.detail)}, status=429)
+        if throttled.wait is not None:
+            response["Retry-After"] = "%d" % throttled.wait
+        return response
+
+    async def authenticate(self, request):
+        # Same as DRF: no token means anonymous, a bad token raises AuthenticationFailed
+        if jwt_settings.AUTH_HEADER_NAME not in request.META:
+            return request.user  # no thread hop for the usual anonymous request
+        result = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+        if result is not None:
+            request.user = result[0]
+        return request.user
+
+    def error(self, message, status):
+        return APIResponse({"error": message}, status=status)
+
+    def authentication_failed(self, detail):
+        body = detail if isinstance(detail, dict) else {"detail": detail}
+        response = APIResponse(body, status=401)
+        response["WWW-Authenticate"] = 'Bearer realm="api"'
+        return response
+
+    def overloaded(self):
+        response = APIResponse(
+            {"detail": "Server is busy hashing passwords, please retry shortly."}, status=503
+        )
+        response["Retry-After"] = "1"
+        return response
+
+
+class AsyncLoginView(AsyncAPIView):
+    throttle_classes = [LoginThrottle]
+
+    async def post(self, request):
+        serializer = LoginCredentialsSerializer(data=self.data)
+        if not serializer.is_valid():
+            return APIResponse(serializer.errors, status=400)
+
+        email = serializer.validated_data["email"]
+        password = serializer.validated_data["password"]
+
+        # Same checks as ModelBackend, with the hashing moved off the event loop
+        user = await User.objects.filter(email=email).afirst()
+        try:
+            if user is None:
+                # Hash anyway so unknown emails take as long as wrong passwords
+                await password_hasher.make_password(password)
+                valid = False
+            else:
+                valid = await password_hasher.check_password(password, user.password)
+        except HasherOverloaded:
+            return self.overloaded()
+
+        if not valid or not user.is_active:
+            return self.authentication_failed("invalid credentials, please try again")
+
+        if not user.is_verified:
+            return self.authentication_failed("Email is not verified")
+
+        user_token = await sync_to_async(user.tokens)()
+
+        return APIResponse(
+            {
+                "email": user.email,
+                "full_name": user.get_full_name(),
+                "access_token": str(user_token.get("access")),
+                "refresh_token": str(user_token.get("refresh")),
+            }
+        )
+
+
+class AsyncRegisterUserView(AsyncAPIView):
+    async def post(self, request):
+        serializer = UserRegisterSerializer(data=self.data)
+        # The unique email validator queries the database
+        if not await sync_to_async(serializer.is_valid)():
+            return APIResponse(serializer.errors, status=400)
+
+        data = serializer.validated_data
+        try:
+            password = await password_hasher.make_password(data["password"])
+        except HasherOverloaded:
+            return self.overloaded()
+
+        user = User(
+            email=User.objects.normalize_email(data["email"]),
+            first_name=data["first_name"],
+            last_name=data["last_name"],
+            password=password,
+        )
+        try:
+            await user.asave()
+        except IntegrityError:
+            # Lost a race with another signup for the same email
+            return APIResponse(
+                {"email": ["user with this Email Address already exists."]}, status=400
+            )
+
+        # Issue the OTP and queue the email
+        try:
+            await asend_otp(user, VERIFICATION)
+        except Exception as e:
+            return self.error(f"Failed to queue email: {str(e)}", 500)
+
+        return APIResponse(
+            {
+                "data": {
+                    "email": user.email,
+                    "first_name": user.first_name,
+                    "last_name": user.last_name,
+                },
+                "message": f"Hi {user.first_name}, your account was created. An OTP has been queued to your email for verification.",
+            },
+            status=201,
+        )
+
+
+class AsyncVerifyOTPView(AsyncAPIView):
+    throttle_classes = [OTPVerifyThrottle]
+
+    async def post(self, request):
+        serializer = OTPVerificationSerializer(data=self.data)
+        if not serializer.is_valid():
+            return APIResponse(serializer.errors, status=400)
+
+        email = serializer.validated_data["email"]
+        otp_code = serializer.validated_data["otp"]
+
+        try:
+            user = await User.objects.aget(email=email)
+        except User.DoesNotExist:
+            return self.error("User not found", 404)
+
+        if user.is_verified:
+            return self.error("OTP is invalid, user is already verified", 400)
+
+        store = get_otp_store()
+        outcome = await store.averify(user, VERIFICATION, otp_code)
+        if outcome == VALID and not await store.aconsume(user, VERIFICATION):
+            outcome = MISSING  # used by a concurrent request
+        if outcome != VALID:
+            return self.error(ERROR_MESSAGES[outcome], 400)
+
+        user.is_verified = True
+        user.is_active = True
+        await user.asave()
+        return APIResponse({"message": "OTP verified successfully"})
+
+
+class AsyncResendOTPView(AsyncAPIView):
+    throttle_classes = [OTPRequestThrottle]
+
+    async def post(self, request):
+        serializer = OTPRequestSerializer(data=self.data)
+        if not serializer.is_valid():
+            return APIResponse(serializer.errors, status=400)
+
+        try:
+            user = await User.objects.aget(email=serializer.validated_data["email"])
+        except User.DoesNotExist:
+            return self.error("User not found", 404)
+
+        if user.is_verified:
+            return self.error("User is already verified", 400)
+
+        try:
+            sent = await asend_otp(user, VERIFICATION)
+        except Exception as e:
+            return self.error(f"Failed to queue email: {str(e)}", 500)
+
+        if not sent:
+            return APIResponse(
+                {"message": "An OTP was sent recently, check your email or try again shortly."}
+            )
+        return APIResponse({"message": "A new OTP has been queued to your email."})
+
+
+class AsyncLogoutView(AsyncAPIView):
+    async def post(self, request):
+        user = request.user
+        serializer = LogoutSerializer(data=self.data)
+        if not serializer.is_valid():
+            return APIResponse(serializer.errors, status=400)
+
+        refresh_token = serializer.validated_data["refresh"]
+
+        try:
+            # Verifying and blacklisting touch the cache and the token tables
+            token = await sync_to_async(RefreshToken)(refresh_token)
+            await sync_to_async(token.blacklist)()
+        except TokenError as e:
+            return self.error(f"Invalid token: {str(e)}", 400)
+        except Exception as e:
+            return self.error(f"Logout failed: {str(e)}", 500)
+
+        # Optionally deactivate user if authenticated
+        if user.is_authenticated:
+            user.is_active = False
+            await user.asave()
+
+        return APIResponse({"message": "Successfully logged out"})
+
+
+class AsyncPasswordResetRequestView(AsyncAPIView):
+    throttle_classes = [RequestPasswordResetThrottle]
+
+    async def post(self, request):
+        serializer = OTPRequestSerializer(data=self.data)
+        if not serializer.is_valid():
+            return APIResponse(serializer.errors, status=400)
+
+        try:
+            user = await User.objects.aget(email=serializer.validated_data["email"])
+        except User.DoesNotExist:
+            return self.error("Invalid email", 400)
+
+        # Repeated requests within the cooldown don't send another email
+        try:
+            await asend_otp(user, PASSWORD_RESET)
+        except Exception as e:
+            return self.error(f"Failed to queue email: {str(e)}", 500)
+
+        return APIResponse({"message": "verify your email to complete password reset"})
+
+
+class AsyncPasswordResetConfirmView(AsyncAPIView):
+    throttle_classes = [PasswordResetThrottle]
+
+    async def post(self, request):
+        serializer = PasswordResetConfirmSerializer(data=self.data)
+        if not serializer.is_valid():
+            return APIResponse(serializer.errors, status=400)
+
+        email = serializer.validated_data["email"]
+        otp_code = serializer.validated_data["otp"]
+        new_password = serializer.validated_data["new_password"]
+
+        try:
+            user = await User.objects.aget(email=email)
+        except User.DoesNotExist:
+            return self.error("User not found", 404)
+
+        store = get_otp_store()
+        outcome = await store.averify(user, PASSWORD_RESET, otp_code)
+        if outcome != VALID:
+            return self.error(ERROR_MESSAGES[outcome], 400)
+
+        # Hash before using up the OTP, so a busy hasher doesn't cost the user their code
+        try:
+            user.password = await password_hasher.make_password(new_password)
+        except HasherOverloaded:
+            return self.overloaded()
+
+        if not await store.aconsume(user, PASSWORD_RESET):
+            return self.error(ERROR_MESSAGES[MISSING], 400)  # used by a concurrent request
+        await user.asave()
+        return APIResponse({"message": "Password reset successfull"})
@@ -0,0 +1,129 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from apex.metrics import record_cache
+
+
+# Small in-process LRU in front of the shared cache. Entries live for LOCAL_TTL
+# seconds, which bounds how long another worker's invalidation can go unseen.
+class UserLRU:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < now:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            self.stats["local_hits"] += 1
+            return user
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "size": len(self._entries)}
+
+
+user_lru = UserLRU(
+    settings.AUTH_USER_CACHE["MAX_SIZE"], settings.AUTH_USER_CACHE["LOCAL_TTL"]
+)
+
+
+def user_cache_key(user_id):
+    return f"auth_user:{user_id}"
+
+
+# Called once the change commits: from the User signals (accounts/signals.py) and
+# after writes that send none, like import_members' bulk upserts
+def invalidate_cached_users(user_ids):
+    for user_id in user_ids:
+        user_lru.delete(str(user_id))
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user from the in-process LRU,
+    then the shared cache, and only then the database.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = self.get_cached_user(str(user_id))
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        # Views may modify request.user, so never hand out the cached instance itself
+        return copy.copy(user)
+
+    def get_cached_user(self, user_id):
+        user = user_lru.get(user_id)
+        if user is not None:
+            record_cache("auth_user_local", 1, 0)
+            return user
+        record_cache("auth_user_local", 0, 1)
+
+        user = cache.get(user_cache_key(user_id))
+        if user is not None:
+            user_lru.count("shared_hits")
+        else:
+            user_lru.count("misses")
+            try:
+                user = self.user_model.objects.get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cache.set(
+                user_cache_key(user_id), user, settings.AUTH_USER_CACHE["TIMEOUT"]
+            )
+
+        user_lru.set(user_id, user)
+        return user
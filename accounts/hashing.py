@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+
+class HasherOverloaded(Exception):
+    pass
+
+
+# Runs password hashing on a small dedicated thread pool. At most MAX_WORKERS
+# hashes run at once and at most MAX_QUEUE wait behind them; beyond that, or
+# after QUEUE_TIMEOUT seconds, callers get HasherOverloaded instead of piling up.
+# A login storm therefore slows down logins only, not the rest of the API.
+class BoundedHasher:
+    def __init__(self, max_workers, max_queue, queue_timeout):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        # Created lazily so a pre-forked master doesn't hand dead threads to workers
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix="password-hasher"
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise HasherOverloaded()
+            self._pending += 1
+
+        # The slot is released when the hash finishes (or is cancelled before
+        # starting), not when the caller gives up waiting on it.
+        job = self.executor.submit(fn, *args)
+        job.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(job), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HasherOverloaded()
+
+    def _release(self, job):
+        with self._lock:
+            self._pending -= 1
+
+    async def check_password(self, password, encoded):
+        return await self.run(check_password, password, encoded)
+
+    async def make_password(self, password):
+        return await self.run(make_password, password)
+
+
+password_hasher = BoundedHasher(
+    settings.PASSWORD_HASHER_POOL["MAX_WORKERS"],
+    settings.PASSWORD_HASHER_POOL["MAX_QUEUE"],
+    settings.PASSWORD_HASHER_POOL["QUEUE_TIMEOUT"],
+)
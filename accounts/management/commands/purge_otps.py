@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import OTP, PasswordResetToken
+
+
+class Command(BaseCommand):
+    help = "Delete expired and verified OTP and password reset tokens in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows deleted per transaction, keeps each write lock short.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between batches to let other writers in.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = 0
+
+        for model in (OTP, PasswordResetToken):
+            deleted = self.purge(model, options["batch_size"], options["pause"])
+            self.stdout.write(f"{model.__name__}: pruned {deleted} row(s)")
+            total += deleted
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Pruned {total} row(s) in {elapsed:.2f}s")
+        )
+
+    def purge(self, model, batch_size, pause):
+        # One pass per condition so each can use its own index
+        deleted = 0
+        for stale in (
+            model.objects.filter(expires_at__lt=timezone.now()),
+            model.objects.filter(is_verified=True),
+        ):
+            while True:
+                pks = list(stale.values_list("pk", flat=True)[:batch_size])
+                if not pks:
+                    break
+                count, _ = model.objects.filter(pk__in=pks).delete()
+                deleted += count
+                if pause:
+                    time.sleep(pause)
+
+        return deleted
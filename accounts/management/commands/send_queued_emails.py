@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts.utils import deliver_queued_emails
+
+
+class Command(BaseCommand):
+    help = "Deliver emails queued in the outbox, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help="Number of emails to claim and send per batch.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.EMAIL_OUTBOX_POLL_INTERVAL,
+            help="Seconds to sleep when the outbox is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the due emails once and exit instead of polling forever.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        interval = options["interval"]
+
+        while True:
+            close_old_connections()
+            sent, failed = deliver_queued_emails(batch_size)
+
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} email(s), {failed} failed.")
+
+            # A full batch means there may be more due right now
+            if sent + failed >= batch_size:
+                continue
+
+            if options["once"]:
+                break
+
+            time.sleep(interval)
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(condition=models.Q(('is_verified', False)), fields=['user', '-id'], name='otp_user_unverified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(condition=models.Q(('is_verified', True)), fields=['id'], name='otp_verified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresettoken',
+            index=models.Index(condition=models.Q(('is_verified', False)), fields=['user', '-id'], name='reset_user_unverified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresettoken',
+            index=models.Index(fields=['expires_at'], name='reset_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresettoken',
+            index=models.Index(condition=models.Q(('is_verified', True)), fields=['id'], name='reset_verified_idx'),
+        ),
+    ]
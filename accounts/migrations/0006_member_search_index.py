@@ -0,0 +1,69 @@
+from django.db import migrations
+
+# External-content FTS5 table: the text lives in accounts_user, the index in
+# member_search. The triggers keep it in sync for every write, including
+# bulk_create and update(), which send no signals.
+#
+# Django's SQLite backend rebuilds a table for most ALTERs, which drops its
+# triggers. A later migration that alters accounts_user must run this again.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS member_search USING fts5(
+        email, first_name, last_name,
+        content='accounts_user', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS member_search_insert AFTER INSERT ON accounts_user BEGIN
+        INSERT INTO member_search (rowid, email, first_name, last_name)
+        VALUES (new.id, new.email, new.first_name, new.last_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS member_search_delete AFTER DELETE ON accounts_user BEGIN
+        INSERT INTO member_search (member_search, rowid, email, first_name, last_name)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS member_search_update
+    AFTER UPDATE OF email, first_name, last_name ON accounts_user BEGIN
+        INSERT INTO member_search (member_search, rowid, email, first_name, last_name)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+        INSERT INTO member_search (rowid, email, first_name, last_name)
+        VALUES (new.id, new.email, new.first_name, new.last_name);
+    END
+    """,
+    # Index the users that already exist
+    "INSERT INTO member_search (member_search) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS member_search_insert",
+    "DROP TRIGGER IF EXISTS member_search_delete",
+    "DROP TRIGGER IF EXISTS member_search_update",
+    "DROP TABLE IF EXISTS member_search",
+]
+
+
+# FTS5 is SQLite only; on other databases the admin falls back to LIKE searches
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0005_admin_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
@@ -4,7 +4,7 @@ from django.utils.translation import gettext_lazy as _
 from .managers import UserManager
 from django.utils import timezone
 from datetime import timedelta
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import AuthenticationFailed
 
 # Create your models here.
@@ -29,6 +29,13 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     REQUIRED_FIELDS = ["first_name", "last_name"]
 
+    class Meta:
+        # The admin changelist is ordered by -date_joined and filtered by is_active
+        indexes = [
+            models.Index(fields=["is_active", "date_joined"], name="user_active_joined_idx"),
+            models.Index(fields=["date_joined"], name="user_joined_idx"),
+        ]
+
     def __str__(self) -> str:
         return self.email
 
@@ -53,6 +60,23 @@ class OTP(models.Model):
     expires_at = models.DateTimeField()
     is_verified = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # "Latest unverified token for a user": filter(user, is_verified=False).last()
+            models.Index(
+                fields=["user", "-id"],
+                condition=models.Q(is_verified=False),
+                name="otp_user_unverified_idx",
+            ),
+            # Let purge_otps find expired and verified rows without a full scan
+            models.Index(fields=["expires_at"], name="otp_expires_idx"),
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_verified=True),
+                name="otp_verified_idx",
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.expires_at:
             self.expires_at = timezone.now() + timedelta(
@@ -74,6 +98,23 @@ class PasswordResetToken(models.Model):
     expires_at = models.DateTimeField()
     is_verified = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # "Latest unverified token for a user": filter(user, is_verified=False).last()
+            models.Index(
+                fields=["user", "-id"],
+                condition=models.Q(is_verified=False),
+                name="reset_user_unverified_idx",
+            ),
+            # Let purge_otps find expired and verified rows without a full scan
+            models.Index(fields=["expires_at"], name="reset_expires_idx"),
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_verified=True),
+                name="reset_verified_idx",
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.expires_at:
             self.expires_at = timezone.now() + timedelta(
@@ -86,5 +127,38 @@ class PasswordResetToken(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - OTP expires at {self.expires_at}"
-    
-    
+
+
+# Outgoing emails waiting to be delivered by the send_queued_emails worker
+class EmailOutbox(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    to_email = models.EmailField(max_length=225)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"], name="outbox_due_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.to_email} - {self.subject} ({self.status})"
@@ -0,0 +1,186 @@
+import hmac
+import secrets
+import time
+
+import pyotp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OTP, PasswordResetToken
+from .utils import queue_otp_email
+
+VERIFICATION = "verification"
+PASSWORD_RESET = "password_reset"
+
+# Outcomes of OTPStore.verify
+VALID = "valid"
+INVALID = "invalid"
+EXPIRED = "expired"
+MISSING = "missing"
+LOCKED = "locked"
+
+ERROR_MESSAGES = {
+    INVALID: "Invalid OTP",
+    EXPIRED: "OTP has expired",
+    MISSING: "No valid OTP found",
+    LOCKED: "Too many wrong attempts, request a new OTP",
+}
+
+# Passed to queue_otp_email for each purpose
+EMAIL_PURPOSES = {
+    VERIFICATION: "Your OTP Code for Verification",
+    PASSWORD_RESET: "Your OTP Code for password reset",
+}
+
+# Same 10 minutes as the OTP emails promise and the OTP models use
+OTP_TTL = 10 * 60
+
+
+# Where OTPs live between the email and the verification. A flow calls issue()
+# to get the code to email, verify() with what the user typed, and consume()
+# right before acting on it: only one caller's consume() returns True.
+class OTPStore:
+    def issue(self, user, purpose):
+        raise NotImplementedError
+
+    # The live code if it was issued less than max_age seconds ago, else None
+    def reuse(self, user, purpose, max_age):
+        raise NotImplementedError
+
+    def issue_or_reuse(self, user, purpose):
+        return self.reuse(user, purpose, settings.OTP_REUSE_WINDOW) or self.issue(user, purpose)
+
+    def verify(self, user, purpose, code):
+        raise NotImplementedError
+
+    def consume(self, user, purpose):
+        raise NotImplementedError
+
+    async def averify(self, user, purpose, code):
+        return await sync_to_async(self.verify)(user, purpose, code)
+
+    async def aconsume(self, user, purpose):
+        return await sync_to_async(self.consume)(user, purpose)
+
+
+# OTP and PasswordResetToken rows holding a TOTP secret: a DELETE and an INSERT
+# per issue, an UPDATE per successful verification. Clean up with purge_otps.
+class DatabaseOTPStore(OTPStore):
+    models = {VERIFICATION: OTP, PASSWORD_RESET: PasswordResetToken}
+    # Verification accepts the previous 10 minute TOTP step as well
+    valid_windows = {VERIFICATION: 1, PASSWORD_RESET: 0}
+
+    def issue(self, user, purpose):
+        model = self.models[purpose]
+        otp_secret = pyotp.random_base32()
+        model.objects.filter(user=user, is_verified=False).delete()  # Clear any old
+        model.objects.create(user=user, otp_secret=otp_secret)
+        return pyotp.TOTP(otp_secret, interval=OTP_TTL).now()
+
+    def reuse(self, user, purpose, max_age):
+        otp = self.models[purpose].objects.filter(user=user, is_verified=False).last()
+        if not otp or otp.is_expired():
+            return None
+        if (timezone.now() - otp.created_at).total_seconds() >= max_age:
+            return None
+        return pyotp.TOTP(otp.otp_secret, interval=OTP_TTL).now()
+
+    def verify(self, user, purpose, code):
+        otp = self.models[purpose].objects.filter(user=user, is_verified=False).last()
+        if not otp:
+            return MISSING
+        if otp.is_expired():
+            return EXPIRED
+        totp = pyotp.TOTP(otp.otp_secret, interval=OTP_TTL)
+        if not totp.verify(code, valid_window=self.valid_windows[purpose]):
+            return INVALID
+        return VALID
+
+    def consume(self, user, purpose):
+        return bool(
+            self.models[purpose].objects.filter(user=user, is_verified=False).update(
+                is_verified=True
+            )
+        )
+
+
+# The code and a wrong-attempts counter as two cache entries that expire on their
+# own, so issuing and verifying OTPs writes nothing to the database. The counter
+# is bumped with incr(), which is atomic, and the code is dropped once it passes
+# OTP_MAX_ATTEMPTS. Needs a cache shared by every worker, not LocMemCache.
+class CacheOTPStore(OTPStore):
+    def __init__(self, alias=None):
+        self.cache = caches[alias or settings.OTP_STORE_CACHE]
+
+    def keys(self, user, purpose):
+        return f"otp:{purpose}:{user.pk}", f"otp_attempts:{purpose}:{user.pk}"
+
+    def issue(self, user, purpose):
+        code = f"{secrets.randbelow(10**6):06d}"
+        code_key, attempts_key = self.keys(user, purpose)
+        # Replaces any previous code and resets its counter
+        self.cache.set_many({code_key: (code, time.time()), attempts_key: 0}, OTP_TTL)
+        return code
+
+    def reuse(self, user, purpose, max_age):
+        # Keeps the wrong-attempts counter, a resend doesn't buy more guesses
+        entry = self.cache.get(self.keys(user, purpose)[0])
+        if entry is not None and time.time() - entry[1] < max_age:
+            return entry[0]
+        return None
+
+    def verify(self, user, purpose, code):
+        code_key, attempts_key = self.keys(user, purpose)
+        entry = self.cache.get(code_key)
+        if entry is None:
+            return MISSING
+        code = str(code)
+        # Not a code we could have issued: no guess was made, don't count one.
+        # compare_digest also raises TypeError on non-ASCII str.
+        if len(code) != len(entry[0]) or not (code.isascii() and code.isdigit()):
+            return INVALID
+        try:
+            attempts = self.cache.incr(attempts_key)
+        except ValueError:
+            return MISSING  # expired between the two reads
+        if attempts > settings.OTP_MAX_ATTEMPTS:
+            self.cache.delete_many([code_key, attempts_key])
+            return LOCKED
+        if not hmac.compare_digest(entry[0], code):
+            return INVALID
+        return VALID
+
+    def consume(self, user, purpose):
+        code_key, attempts_key = self.keys(user, purpose)
+        consumed = self.cache.delete(code_key)
+        self.cache.delete(attempts_key)
+        return consumed
+
+
+def get_otp_store():
+    return import_string(settings.OTP_STORE)()
+
+
+# Queue the OTP email unless one went to this user within OTP_RESEND_COOLDOWN.
+# A code issued within OTP_REUSE_WINDOW is sent again rather than replaced, so
+# clients retrying in a loop cost one cache write per cooldown, not a new OTP
+# and an email each. Returns whether an email was queued.
+def send_otp(user, purpose):
+    cache = caches[settings.OTP_STORE_CACHE]
+    cooldown_key = f"otp_sent:{purpose}:{user.pk}"
+    if not cache.add(cooldown_key, True, settings.OTP_RESEND_COOLDOWN):
+        return False
+    try:
+        otp_code = get_otp_store().issue_or_reuse(user, purpose)
+        queue_otp_email(user, otp_code, EMAIL_PURPOSES[purpose])
+    except Exception:
+        cache.delete(cooldown_key)  # nothing was sent, allow a retry straight away
+        raise
+    return True
+
+
+async def asend_otp(user, purpose):
+    return await sync_to_async(send_otp)(user, purpose)
@@ -0,0 +1,72 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import User
+
+# FTS5 table over accounts_user (email, first_name, last_name), kept in sync by
+# the triggers created in migration 0006_member_search_index
+SEARCH_TABLE = "member_search"
+
+WORD_PATTERN = re.compile(r"\w+")
+MAX_SEARCH_WORDS = 8
+
+
+# "jo smi" -> '"jo"* "smi"*': every word must match the start of a token. The
+# email is split on "@" and ".", so "john.doe@gm" finds john.doe@gmail.com
+def match_expression(term):
+    words = WORD_PATTERN.findall(term.lower())[:MAX_SEARCH_WORDS]
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_available(using):
+    return connections[using].vendor == "sqlite"
+
+
+def matching_user_ids(term):
+    """
+    Subquery of the ids of users matching ``term``, for ``id__in`` filters. It is
+    part of the outer query's SQL, so it runs on whichever database that uses.
+    """
+    return RawSQL(
+        f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+        (match_expression(term),),
+    )
+
+
+def search_user_ids(term, limit):
+    """Ids of the best ``limit`` matches for ``term``, best first."""
+    expression = match_expression(term)
+    if not expression:
+        return []
+    using = router.db_for_read(User)
+    if not search_available(using):
+        # Slow path for databases without FTS5
+        return list(
+            User.objects.filter(
+                Q(email__icontains=term) | Q(first_name__icontains=term) | Q(last_name__icontains=term)
+            ).values_list("pk", flat=True)[:limit]
+        )
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+            "ORDER BY rank LIMIT %s",
+            (expression, limit),
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+# Admin search through the FTS index instead of LIKE '%term%' over every
+# search field. member_search_field is the field holding the user id.
+class MemberSearchAdminMixin:
+    member_search_field = "pk"
+
+    def get_search_results(self, request, queryset, search_term):
+        if not match_expression(search_term) or not search_available(queryset.db):
+            return super().get_search_results(request, queryset, search_term)
+        queryset = queryset.filter(
+            **{f"{self.member_search_field}__in": matching_user_ids(search_term)}
+        )
+        return queryset, False
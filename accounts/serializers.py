@@ -3,6 +3,10 @@ from .models import User, PasswordResetToken
 from django.contrib.auth import authenticate
 from rest_framework.exceptions import AuthenticationFailed
 import pyotp
+from rest_framework_simplejwt.serializers import (
+    TokenRefreshSerializer as BaseTokenRefreshSerializer,
+)
+from .tokens import RefreshToken
 
 
 class UserRegisterSerializer(serializers.ModelSerializer):
@@ -65,12 +69,18 @@ class LoginSerializer(serializers.ModelSerializer):
 
         return {
             "email": user.email,
-            "full_name": user.get_full_name,
+            "full_name": user.get_full_name(),
             "access_token": str(user_token.get("access")),
             "refresh_token": str(user_token.get("refresh")),
         }
 
 
+# Shape-only validation of the login payload, the async login view checks the password itself
+class LoginCredentialsSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    password = serializers.CharField(max_length=68, min_length=8, write_only=True)
+
+
 # Serializer for Logout
 class LogoutSerializer(serializers.Serializer):
     refresh = serializers.CharField()
@@ -87,3 +97,8 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
         if data["new_password"] != data["confirm_password"]:
             raise serializers.ValidationError("Passwords do not match")
         return data
+
+
+# Refresh serializer that checks the blacklist through the in-memory filter
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    token_class = RefreshToken
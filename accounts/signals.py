@@ -0,0 +1,29 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_users
+from .models import User
+
+
+# Drop the cached copy used by CachedJWTAuthentication whenever a user changes.
+# Only once the change commits: dropped earlier, a concurrent request could cache
+# the old row again and keep it for the whole AUTH_USER_CACHE TIMEOUT.
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, using, **kwargs):
+    transaction.on_commit(partial(invalidate_cached_users, [instance.pk]), using=using)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_cache_on_permissions(sender, instance, pk_set, using, **kwargs):
+    if isinstance(instance, User):
+        user_ids = [instance.pk]
+    else:
+        # Changed from the group/permission side: pk_set holds user ids
+        user_ids = list(pk_set or ())
+    if user_ids:
+        transaction.on_commit(partial(invalidate_cached_users, user_ids), using=using)
@@ -1,3 +1,730 @@
-from django.test import TestCase
+import asyncio
+import json
+import random
+import threading
+import re
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import authentication, tokens
+from .async_views import (
+    AsyncLoginView,
+    AsyncLogoutView,
+    AsyncPasswordResetConfirmView,
+    AsyncPasswordResetRequestView,
+    AsyncRegisterUserView,
+    AsyncResendOTPView,
+    AsyncVerifyOTPView,
+)
+from .authentication import CachedJWTAuthentication, UserLRU, user_cache_key
+from .hashing import BoundedHasher, HasherOverloaded, password_hasher
+from .models import OTP, EmailOutbox, PasswordResetToken, User
+from .otp_store import (
+    INVALID,
+    LOCKED,
+    MISSING,
+    PASSWORD_RESET,
+    VALID,
+    VERIFICATION,
+    CacheOTPStore,
+    DatabaseOTPStore,
+    send_otp,
+)
+from .search import matching_user_ids, search_user_ids
+from .throttles import AnonSlidingWindowThrottle, SlidingWindowRateThrottle
+from .tokens import BlacklistIndex, BloomFilter, RefreshToken
+from .utils import claim_due_emails, deliver_queued_emails, queue_otp_email, retry_delay
+
+# Throttle counters, OTPs and the blacklist generation stay in the test process
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def create_member(email="ada@apex.test", password="secret-pass-1"):
+    return User.objects.create_user(
+        email, "Ada", "Lovelace", password, is_active=True, is_verified=True
+    )
+
+
+# The URLconf picks sync or async views at import time, so call the async ones directly
+async def async_post(view_class, data, headers=None):
+    request = AsyncRequestFactory().post(
+        "/", data, content_type="application/json", headers=headers or {}
+    )
+    response = await view_class.as_view()(request)
+    return response, json.loads(response.content)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        # A fresh per-process index: ids are reused once a test's rows are rolled back
+        self.index = BlacklistIndex()
+        patcher = mock.patch.object(tokens, "blacklist_index", self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = create_member()
+        self.client = APIClient()
+
+    def test_logout_then_refresh_is_rejected(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        response = self.client.post(reverse("token_refresh"), {"refresh": refresh})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(reverse("logout"), {"refresh": refresh})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(reverse("token_refresh"), {"refresh": refresh})
+        self.assertEqual(response.status_code, 401)
+
+    def test_other_workers_load_new_rows(self):
+        other_worker = BlacklistIndex()
+        refresh = RefreshToken.for_user(self.user)
+        jti = refresh["jti"]
+        self.assertFalse(other_worker.is_blacklisted(jti))
+
+        refresh.blacklist()
+        self.assertTrue(other_worker.is_blacklisted(jti))
+        self.assertFalse(other_worker.is_blacklisted(RefreshToken.for_user(self.user)["jti"]))
+
+    @override_settings(TOKEN_BLACKLIST_FILTER={"CAPACITY": 2, "ERROR_RATE": 0.01})
+    def test_filter_grows_past_its_capacity(self):
+        other_worker = BlacklistIndex()
+        other_worker.refresh()
+        refreshes = [RefreshToken.for_user(self.user) for _ in range(5)]
+        for refresh in refreshes:
+            refresh.blacklist()
+
+        self.assertTrue(all(other_worker.is_blacklisted(r["jti"]) for r in refreshes))
+        self.assertGreater(other_worker._filter.capacity, 2)
+
+    def test_rebuild_never_exposes_a_partly_loaded_filter(self):
+        refresh = RefreshToken.for_user(self.user)
+        refresh.blacklist()
+        self.index.preload()
+        jti = refresh["jti"]
+
+        # What a request thread running during the rebuild would see
+        seen = []
+        add = BloomFilter.add
+
+        def add_and_check(bloom, value):
+            seen.append(jti in self.index._filter)
+            add(bloom, value)
+
+        with mock.patch.object(BloomFilter, "add", add_and_check):
+            self.index._rebuild(self.index._filter.capacity * 2)
+        self.assertEqual(seen, [True])
+        self.assertIn(jti, self.index._filter)
+
+
+class ClockThrottle(SlidingWindowRateThrottle):
+    scope = "test"
+    rate = "5/min"
+
+    def __init__(self, now):
+        self.clock = now
+        super().__init__()
+
+    def timer(self):
+        return self.clock
+
+    def get_cache_key(self, request, view):
+        return "throttle_test"
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SlidingWindowThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def attempt(self, now):
+        throttle = ClockThrottle(now)
+        if throttle.allow_request(None, None):
+            return None
+        return throttle.wait()
+
+    def test_rejects_past_the_rate(self):
+        for _ in range(5):
+            self.assertIsNone(self.attempt(600))
+        self.assertIsNotNone(self.attempt(600))
+
+    def test_retry_after_holds_across_the_window_rollover(self):
+        for _ in range(5):
+            self.assertIsNone(self.attempt(659))
+        # At 660 the five requests count almost fully as the previous window
+        wait = self.attempt(659)
+        self.assertAlmostEqual(wait, 1 + 60 / 5)
+        self.assertIsNotNone(self.attempt(659 + wait - 0.5))
+        self.assertIsNone(self.attempt(659 + wait + 1e-6))
+
+    def test_retry_after_is_the_earliest_accepted_time(self):
+        rng = random.Random(5)
+        now = 600.0
+        for _ in range(500):
+            now += rng.uniform(0, 6)
+            wait = self.attempt(now)
+            if wait is None:
+                continue
+            if wait > 0.01:
+                self.assertIsNotNone(self.attempt(now + wait - 0.01), now)
+            now += wait + 1e-6
+            self.assertIsNone(self.attempt(now), now)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MemberSearchTests(TestCase):
+    def setUp(self):
+        self.john = User.objects.create_user("john.doe@gmail.com", "John", "Smith", "secret-pass-1")
+        self.joan = User.objects.create_user("joan@apex.test", "Joan", "Smithers", "secret-pass-1")
+        self.other = User.objects.create_user("ada@apex.test", "Ada", "Lovelace", "secret-pass-1")
+
+    def test_every_word_matches_a_token_prefix(self):
+        self.assertCountEqual(search_user_ids("jo smi", 10), [self.john.pk, self.joan.pk])
+        self.assertEqual(search_user_ids("john.doe@gm", 10), [self.john.pk])
+        self.assertEqual(search_user_ids("smithers", 10), [self.joan.pk])
+        self.assertEqual(search_user_ids("mith", 10), [])
+        self.assertEqual(search_user_ids("!!", 10), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.other.last_name = "King"
+        self.other.save()
+        self.assertEqual(search_user_ids("king", 10), [self.other.pk])
+        self.assertEqual(search_user_ids("lovelace", 10), [])
+
+        self.other.delete()
+        self.assertEqual(search_user_ids("king", 10), [])
+
+    def test_subquery_runs_on_the_querysets_database(self):
+        queryset = User.objects.using("default").filter(pk__in=matching_user_ids("ada"))
+        self.assertEqual(list(queryset), [self.other])
+
+    def test_staff_api(self):
+        client = APIClient()
+        url = reverse("member-search")
+        client.force_authenticate(self.other)
+        self.assertEqual(client.get(url, {"q": "john"}).status_code, 403)
+
+        staff = User.objects.create_superuser("staff@apex.test", "Staff", "Member", "admin-pass-1")
+        client.force_authenticate(staff)
+        self.assertEqual(client.get(url, {"q": "j"}).status_code, 400)
+        response = client.get(url, {"q": "john smith"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([hit["email"] for hit in response.data["results"]], [self.john.email])
+
+    def test_admin_changelist_search(self):
+        staff = User.objects.create_superuser("staff@apex.test", "Staff", "Member", "admin-pass-1")
+        self.client.force_login(staff)
+        response = self.client.get(reverse("admin:accounts_user_changelist"), {"q": "smi"})
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(response.context["cl"].result_list, [self.john, self.joan])
+
+
+# Run against both stores by the subclasses below
+class OTPStoreTestsMixin:
+    def setUp(self):
+        cache.clear()
+        self.user = create_member()
+        self.store = self.store_class()
+
+    def test_issue_verify_consume(self):
+        code = self.store.issue(self.user, VERIFICATION)
+        self.assertEqual(self.store.verify(self.user, VERIFICATION, code), VALID)
+        self.assertTrue(self.store.consume(self.user, VERIFICATION))
+        self.assertFalse(self.store.consume(self.user, VERIFICATION))
+        self.assertEqual(self.store.verify(self.user, VERIFICATION, code), MISSING)
+
+    def test_wrong_code_and_wrong_purpose(self):
+        code = self.store.issue(self.user, VERIFICATION)
+        wrong = f"{(int(code) + 1) % 10**6:06d}"
+        self.assertEqual(self.store.verify(self.user, VERIFICATION, wrong), INVALID)
+        self.assertEqual(self.store.verify(self.user, PASSWORD_RESET, code), MISSING)
+
+    def test_malformed_codes_are_invalid(self):
+        code = self.store.issue(self.user, VERIFICATION)
+        for malformed in ["é12345", "\uff11" * 6, code[:5], code + "0", "12 345", ""]:
+            self.assertEqual(self.store.verify(self.user, VERIFICATION, malformed), INVALID)
+        self.assertEqual(self.store.verify(self.user, VERIFICATION, code), VALID)
+
+    def test_reissue_replaces_the_code(self):
+        self.store.issue(self.user, VERIFICATION)
+        code = self.store.issue(self.user, VERIFICATION)
+        self.assertEqual(self.store.verify(self.user, VERIFICATION, code), VALID)
+
+    def test_reuse_within_the_window_only(self):
+        self.assertIsNone(self.store.reuse(self.user, VERIFICATION, 60))
+        code = self.store.issue(self.user, VERIFICATION)
+        self.assertEqual(self.store.reuse(self.user, VERIFICATION, 60), code)
+        self.assertIsNone(self.store.reuse(self.user, VERIFICATION, 0))
+        self.assertEqual(self.store.issue_or_reuse(self.user, VERIFICATION), code)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DatabaseOTPStoreTests(OTPStoreTestsMixin, TestCase):
+    store_class = DatabaseOTPStore
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CacheOTPStoreTests(OTPStoreTestsMixin, TestCase):
+    store_class = CacheOTPStore
+
+    def attempts(self):
+        return self.store.cache.get(self.store.keys(self.user, VERIFICATION)[1])
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_locked_after_too_many_wrong_codes(self):
+        code = self.store.issue(self.user, VERIFICATION)
+        wrong = f"{(int(code) + 1) % 10**6:06d}"
+        for _ in range(3):
+            self.assertEqual(self.store.verify(self.user, VERIFICATION, wrong), INVALID)
+        self.assertEqual(self.store.verify(self.user, VERIFICATION, code), LOCKED)
+        self.assertEqual(self.store.verify(self.user, VERIFICATION, code), MISSING)
+
+    def test_resend_keeps_the_attempt_count(self):
+        code = self.store.issue(self.user, VERIFICATION)
+        self.store.verify(self.user, VERIFICATION, "000000" if code != "000000" else "111111")
+        self.assertEqual(self.store.reuse(self.user, VERIFICATION, 60), code)
+        self.assertEqual(self.attempts(), 1)
+
+    @override_settings(OTP_STORE="accounts.otp_store.CacheOTPStore")
+    def test_verify_endpoint_rejects_a_non_ascii_code(self):
+        self.user.is_verified = False
+        self.user.save(update_fields=["is_verified"])
+        self.store.issue(self.user, VERIFICATION)
+        response = APIClient().post(
+            reverse("verify-otp"), {"email": self.user.email, "otp": "é12345"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.attempts(), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, OTP_STORE="accounts.otp_store.CacheOTPStore")
+class SendOTPTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("ada@apex.test", "Ada", "Lovelace", "secret-pass-1")
+        self.client = APIClient()
+
+    def sent_codes(self):
+        return [
+            re.search(r"Your OTP code is (\d+)", body).group(1)
+            for body in EmailOutbox.objects.order_by("pk").values_list("body", flat=True)
+        ]
+
+    def test_sends_once_per_cooldown_and_resends_the_live_code(self):
+        self.assertTrue(send_otp(self.user, VERIFICATION))
+        self.assertFalse(send_otp(self.user, VERIFICATION))
+        self.assertEqual(len(self.sent_codes()), 1)
+
+        # Cooldown over, the code is still young enough to be sent again
+        cache.delete(f"otp_sent:{VERIFICATION}:{self.user.pk}")
+        self.assertTrue(send_otp(self.user, VERIFICATION))
+        first, second = self.sent_codes()
+        self.assertEqual(first, second)
+
+    def test_failed_send_allows_an_immediate_retry(self):
+        with mock.patch("accounts.otp_store.queue_otp_email", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                send_otp(self.user, VERIFICATION)
+        self.assertTrue(send_otp(self.user, VERIFICATION))
+
+    def test_resend_endpoint_then_verify(self):
+        url = reverse("resend-otp")
+        self.assertEqual(self.client.post(url, {"email": self.user.email}).status_code, 200)
+        response = self.client.post(url, {"email": self.user.email})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("sent recently", response.data["message"])
+        [code] = self.sent_codes()
+
+        response = self.client.post(reverse("verify-otp"), {"email": self.user.email, "otp": code})
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_verified)
+
+        response = self.client.post(url, {"email": self.user.email})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(authentication, "user_lru", UserLRU(max_size=2, ttl=60))
+        self.lru = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = create_member()
+
+    def authenticate(self, user=None):
+        token = AccessToken.for_user(user or self.user)
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    def test_database_then_shared_cache_then_local(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate(), self.user)
+        self.lru.delete(str(self.user.pk))
+        with self.assertNumQueries(0):
+            self.authenticate()
+            user = self.authenticate()
+        self.assertEqual(self.lru.snapshot()["local_hits"], 1)
+        self.assertEqual(self.lru.snapshot()["shared_hits"], 1)
+        # A copy: views may change request.user without touching the cache
+        self.assertIsNot(user, self.lru.get(str(self.user.pk)))
+
+    def test_local_cache_is_bounded(self):
+        others = [create_member(f"member{n}@apex.test") for n in range(3)]
+        for user in [self.user, *others]:
+            self.authenticate(user)
+        self.assertEqual(self.lru.snapshot()["size"], 2)
+        self.assertIsNone(self.lru.get(str(self.user.pk)))
+
+    def test_deactivation_applies_once_committed(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.is_active = False
+            self.user.save()
+            # Dropped before commit, a concurrent request would cache the old row again
+            self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+            self.assertIsNotNone(self.lru.get(str(self.user.pk)))
+        for callback in callbacks:
+            callback()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_group_changes_and_deletes_invalidate(self):
+        self.authenticate()
+        group = Group.objects.create(name="coaches")
+        with self.captureOnCommitCallbacks(execute=True):
+            group.user_set.add(self.user)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.user.pk).delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncLogoutViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(tokens, "blacklist_index", BlacklistIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = create_member()
+        self.refresh = RefreshToken.for_user(self.user)
+
+    async def logout(self, authorization):
+        request = AsyncRequestFactory().post(
+            "/api/auth/logout/",
+            {"refresh": str(self.refresh)},
+            content_type="application/json",
+            headers={"Authorization": authorization},
+        )
+        return await AsyncLogoutView.as_view()(request)
+
+    async def test_token_users_are_throttled_in_the_user_scope(self):
+        keys = []
+        allow_request = SlidingWindowRateThrottle.allow_request
+
+        def record_key(throttle, request, view):
+            allowed = allow_request(throttle, request, view)
+            keys.append(throttle.key)
+            return allowed
+
+        with mock.patch.object(SlidingWindowRateThrottle, "allow_request", record_key):
+            response = await self.logout(f"Bearer {self.refresh.access_token}")
+        self.assertEqual(response.status_code, 200)
+        # The anon throttle skips authenticated requests
+        self.assertEqual(keys, [None, f"throttle_user_{self.user.pk}"])
+        await self.user.arefresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+    async def test_a_bad_token_is_rejected_before_throttling(self):
+        with mock.patch.object(AnonSlidingWindowThrottle, "allow_request") as allow_request:
+            response = await self.logout("Bearer not-a-token")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], 'Bearer realm="api"')
+        allow_request.assert_not_called()
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.user = create_member()
+
+    def test_queued_email_is_delivered_by_the_worker(self):
+        queue_otp_email(self.user, "123456", "Your OTP Code for Verification")
+        email = EmailOutbox.objects.get()
+        self.assertEqual((email.status, email.to_email), (EmailOutbox.STATUS_PENDING, self.user.email))
+        self.assertEqual(mail.outbox, [])
+
+        call_command("send_queued_emails", once=True, stdout=StringIO())
+        [message] = mail.outbox
+        self.assertEqual(message.to, [self.user.email])
+        self.assertIn("Your OTP code is 123456", message.body)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (EmailOutbox.STATUS_SENT, 1))
+        self.assertIsNotNone(email.sent_at)
+
+    def test_a_claimed_email_is_leased(self):
+        queue_otp_email(self.user, "123456")
+        [email] = claim_due_emails(10)
+        self.assertEqual(email.attempts, 1)
+        # Another worker finds nothing due until the lease runs out
+        self.assertEqual(claim_due_emails(10), [])
+        later = timezone.now() + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE + 1)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            [email] = claim_due_emails(10)
+        self.assertEqual(email.attempts, 2)
+
+    def test_failures_back_off_then_give_up(self):
+        queue_otp_email(self.user, "123456")
+        with mock.patch("accounts.utils.EmailMessage.send", side_effect=SMTPException("down")):
+            before = timezone.now()
+            self.assertEqual(deliver_queued_emails(), (0, 1))
+            email = EmailOutbox.objects.get()
+            self.assertEqual((email.status, email.last_error), (EmailOutbox.STATUS_PENDING, "down"))
+            self.assertGreaterEqual(email.next_attempt_at, before + retry_delay(1))
+            # Not due yet
+            self.assertEqual(deliver_queued_emails(), (0, 0))
+
+            EmailOutbox.objects.update(
+                attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS - 1, next_attempt_at=timezone.now()
+            )
+            self.assertEqual(deliver_queued_emails(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailOutbox.STATUS_FAILED)
+        self.assertEqual(deliver_queued_emails(), (0, 0))
+
+    def test_connection_failure_fails_the_whole_batch(self):
+        for code in ["111111", "222222"]:
+            queue_otp_email(self.user, code)
+        with mock.patch("accounts.utils.get_connection") as get_connection:
+            get_connection.return_value.open.side_effect = OSError("refused")
+            self.assertEqual(deliver_queued_emails(), (0, 2))
+        self.assertEqual(
+            list(EmailOutbox.objects.values_list("status", "last_error")),
+            [(EmailOutbox.STATUS_PENDING, "refused")] * 2,
+        )
+
+    def test_retry_delay_doubles_up_to_the_cap(self):
+        base = settings.EMAIL_OUTBOX_RETRY_BACKOFF
+        self.assertEqual(
+            [retry_delay(attempts).total_seconds() for attempts in [1, 2, 3]],
+            [base, base * 2, base * 4],
+        )
+        self.assertEqual(retry_delay(30).total_seconds(), settings.EMAIL_OUTBOX_MAX_RETRY_DELAY)
+
+
+class PurgeOTPsTests(TestCase):
+    def test_deletes_expired_and_verified_tokens_in_batches(self):
+        user = create_member()
+        past = timezone.now() - timedelta(minutes=1)
+        for model in (OTP, PasswordResetToken):
+            for n in range(5):
+                model.objects.create(user=user, otp_secret=f"expired-{n}", expires_at=past)
+            model.objects.create(user=user, otp_secret="verified", is_verified=True)
+            model.objects.create(user=user, otp_secret="live")
+
+        stdout = StringIO()
+        with mock.patch("accounts.management.commands.purge_otps.time.sleep") as sleep:
+            call_command("purge_otps", batch_size=2, pause=0.5, stdout=stdout)
+
+        for model in (OTP, PasswordResetToken):
+            self.assertEqual(list(model.objects.values_list("otp_secret", flat=True)), ["live"])
+        self.assertIn("OTP: pruned 6 row(s)", stdout.getvalue())
+        self.assertIn("PasswordResetToken: pruned 6 row(s)", stdout.getvalue())
+        self.assertIn("Pruned 12 row(s)", stdout.getvalue())
+        # Batches of 2: 3 for the expired rows, 1 for the verified one, per model
+        self.assertEqual(sleep.call_count, 8)
+        sleep.assert_called_with(0.5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncLoginViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_member()
+
+    async def login(self, password="secret-pass-1", email="ada@apex.test"):
+        return await async_post(AsyncLoginView, {"email": email, "password": password})
+
+    async def test_login(self):
+        response, data = await self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["email"], self.user.email)
+        self.assertEqual(AccessToken(data["access_token"])["user_id"], self.user.pk)
+        refresh = await sync_to_async(RefreshToken)(data["refresh_token"])
+        self.assertEqual(refresh["user_id"], self.user.pk)
+
+    async def test_bad_credentials(self):
+        response, data = await self.login(password="wrong-pass-1")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(data, {"detail": "invalid credentials, please try again"})
+
+        # Unknown emails still pay for a hash
+        make_password = password_hasher.make_password
+        with mock.patch.object(password_hasher, "make_password", wraps=make_password) as hash_:
+            response, data = await self.login(email="nobody@apex.test")
+        self.assertEqual(response.status_code, 401)
+        hash_.assert_awaited_once_with("secret-pass-1")
+
+    async def test_unverified_email(self):
+        await User.objects.filter(pk=self.user.pk).aupdate(is_verified=False)
+        response, data = await self.login()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(data, {"detail": "Email is not verified"})
+
+    async def test_busy_hasher(self):
+        with mock.patch.object(password_hasher, "check_password", side_effect=HasherOverloaded):
+            response, data = await self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+    async def test_throttled_after_five_attempts(self):
+        for _ in range(5):
+            response, data = await self.login(password="wrong-pass-1")
+            self.assertEqual(response.status_code, 401)
+        response, data = await self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+
+class BoundedHasherTests(TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def blocked(self):
+        self.release.wait(5)
+        return "done"
+
+    async def test_runs_off_the_event_loop(self):
+        hasher = BoundedHasher(max_workers=1, max_queue=0, queue_timeout=5)
+        thread = await hasher.run(threading.current_thread)
+        self.assertTrue(thread.name.startswith("password-hasher"))
+        encoded = await hasher.make_password("secret-pass-1")
+        self.assertTrue(await hasher.check_password("secret-pass-1", encoded))
+
+    async def test_overloaded_when_workers_and_queue_are_full(self):
+        hasher = BoundedHasher(max_workers=1, max_queue=1, queue_timeout=5)
+        running = [asyncio.create_task(hasher.run(self.blocked)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with self.assertRaises(HasherOverloaded):
+            await hasher.run(self.blocked)
+
+        self.release.set()
+        self.assertEqual(await asyncio.gather(*running), ["done", "done"])
+        # The slots are free again
+        self.assertEqual(await hasher.run(str.upper, "ok"), "OK")
+
+    async def test_overloaded_after_the_queue_timeout(self):
+        hasher = BoundedHasher(max_workers=1, max_queue=1, queue_timeout=0.05)
+        running = asyncio.create_task(hasher.run(self.blocked))
+        await asyncio.sleep(0)
+        with self.assertRaises(HasherOverloaded):
+            await hasher.run(str.upper, "queued")
+        # The queued job still holds its slot until it has run
+        with self.assertRaises(HasherOverloaded):
+            await hasher.run(str.upper, "one too many")
+
+        self.release.set()
+        with self.assertRaises(HasherOverloaded):
+            await running  # waited longer than queue_timeout too
+        await asyncio.to_thread(hasher.executor.shutdown)
+        self.assertEqual(hasher._pending, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncAccountViewsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def last_code(self):
+        body = EmailOutbox.objects.order_by("pk").values_list("body", flat=True).last()
+        return re.search(r"Your OTP code is (\d+)", body).group(1)
+
+    async def test_register_then_verify(self):
+        response, data = await async_post(AsyncRegisterUserView, {
+            "email": "ada@APEX.test", "first_name": "Ada", "last_name": "Lovelace",
+            "password": "secret-pass-1", "password2": "secret-pass-1",
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(data["data"]["email"], "ada@apex.test")
+        user = await User.objects.aget(email="ada@apex.test")
+        self.assertFalse(user.is_active)
+        self.assertTrue(user.check_password("secret-pass-1"))
+        code = await sync_to_async(self.last_code)()
+
+        # A resend inside the cooldown doesn't queue another email
+        response, data = await async_post(AsyncResendOTPView, {"email": user.email})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("sent recently", data["message"])
+        self.assertEqual(await EmailOutbox.objects.acount(), 1)
+
+        wrong = "000000" if code != "000000" else "111111"
+        response, data = await async_post(AsyncVerifyOTPView, {"email": user.email, "otp": wrong})
+        self.assertEqual(response.status_code, 400)
+        response, data = await async_post(AsyncVerifyOTPView, {"email": user.email, "otp": code})
+        self.assertEqual(response.status_code, 200)
+        await user.arefresh_from_db()
+        self.assertTrue(user.is_verified and user.is_active)
+
+        response, data = await async_post(AsyncVerifyOTPView, {"email": user.email, "otp": code})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data, {"error": "OTP is invalid, user is already verified"})
+
+    async def test_register_an_existing_email(self):
+        await sync_to_async(create_member)()
+        response, data = await async_post(AsyncRegisterUserView, {
+            "email": "ada@apex.test", "first_name": "Ada", "last_name": "Lovelace",
+            "password": "secret-pass-1", "password2": "secret-pass-1",
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("email", data)
+
+    async def test_password_reset(self):
+        user = await sync_to_async(create_member)()
+        response, data = await async_post(AsyncPasswordResetRequestView, {"email": user.email})
+        self.assertEqual(response.status_code, 200)
+        code = await sync_to_async(self.last_code)()
+
+        confirm = {
+            "email": user.email, "otp": code,
+            "new_password": "new-secret-2", "confirm_password": "new-secret-2",
+        }
+        response, data = await async_post(AsyncPasswordResetConfirmView, confirm)
+        self.assertEqual(response.status_code, 200)
+        await user.arefresh_from_db()
+        self.assertTrue(user.check_password("new-secret-2"))
+
+        # The code is used up
+        response, data = await async_post(AsyncPasswordResetConfirmView, confirm)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_unknown_emails(self):
+        response, data = await async_post(AsyncPasswordResetRequestView, {"email": "nobody@apex.test"})
+        self.assertEqual((response.status_code, data), (400, {"error": "Invalid email"}))
+        response, data = await async_post(AsyncResendOTPView, {"email": "nobody@apex.test"})
+        self.assertEqual((response.status_code, data), (404, {"error": "User not found"}))
+
+    async def test_malformed_json(self):
+        request = AsyncRequestFactory().post("/", b"{", content_type="application/json")
+        response = await AsyncResendOTPView.as_view()(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("JSON parse error", json.loads(response.content)["detail"])
@@ -1,35 +1,117 @@
-from rest_framework.throttling import SimpleRateThrottle
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    SimpleRateThrottle,
+    UserRateThrottle,
+)
 
-class LoginThrottle(SimpleRateThrottle):
-    scope = 'login'
+from apex.metrics import record_throttle
 
-    def get_cache_key(self, request, view):
-        return self.get_ident(request)
 
+# Sliding window counter: instead of a list of every request timestamp, keep one
+# counter per fixed window and weight the previous window by how much of it still
+# overlaps the sliding window. State per key is two integers, updated with cache.incr.
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
 
-class PasswordResetThrottle(SimpleRateThrottle):
-    scope = 'password_reset'
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
 
-    def get_cache_key(self, request, view):
-        return self.get_ident(request)
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.elapsed = self.now - window * self.duration
+        current_key = f"{self.key}:{window}"
 
+        # Cheap read first: abusive clients are rejected without any cache write
+        previous_key = f"{self.key}:{window - 1}"
+        counters = self.cache.get_many([previous_key, current_key])
+        self.previous = counters.get(previous_key, 0)
+        self.current = counters.get(current_key, 0) + 1
+        if self.estimated_count() > self.num_requests:
+            self.current -= 1
+            return self.throttle_failure()
 
-class RequestPasswordResetThrottle(SimpleRateThrottle):
-    scope = 'request_password_reset'
+        # Each window counter must outlive the following window, where it is "previous"
+        if current_key not in counters:
+            self.cache.add(current_key, 0, self.duration * 2)
+        try:
+            self.current = self.cache.incr(current_key)
+        except ValueError:
+            # The counter expired between the read and incr()
+            self.cache.set(current_key, 1, self.duration * 2)
+            self.current = 1
 
-    def get_cache_key(self, request, view):
-        return self.get_ident(request)
+        # Concurrent requests may have passed the read together, the incr result is exact
+        if self.estimated_count() > self.num_requests:
+            try:
+                self.cache.decr(current_key)
+            except ValueError:
+                pass
+            self.current -= 1
+            return self.throttle_failure()
+        return True
 
+    def throttle_failure(self):
+        record_throttle(self.scope)
+        return super().throttle_failure()
 
-class OTPRequestThrottle(SimpleRateThrottle):
-    scope = 'otp_request'
+    def estimated_count(self):
+        overlap = 1 - self.elapsed / self.duration
+        return self.previous * overlap + self.current
 
-    def get_cache_key(self, request, view):
-        return self.get_ident(request)
+    # Seconds until estimated_count() leaves room for one more request. The
+    # previous window's weight decays linearly to zero by the end of this window;
+    # if that isn't enough, in the next window this window's count is the one
+    # decaying.
+    def wait(self):
+        excess = self.estimated_count() + 1 - self.num_requests
+        if excess <= 0:
+            return None
 
+        remaining_window = self.duration - self.elapsed
+        if self.current + 1 <= self.num_requests:
+            # The previous window's share alone is over the limit, and runs out in time
+            return min(excess * self.duration / self.previous, remaining_window)
+
+        if not self.current:
+            return None  # a rate of 0 never lets a request through
+        next_excess = self.current + 1 - self.num_requests
+        return remaining_window + next_excess * self.duration / self.current
 
-class OTPVerifyThrottle(SimpleRateThrottle):
-    scope = 'otp_verify'
 
+class IdentRateThrottle(SlidingWindowRateThrottle):
     def get_cache_key(self, request, view):
-        return self.get_ident(request)
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+
+class AnonSlidingWindowThrottle(SlidingWindowRateThrottle, AnonRateThrottle):
+    pass
+
+
+class UserSlidingWindowThrottle(SlidingWindowRateThrottle, UserRateThrottle):
+    pass
+
+
+class LoginThrottle(IdentRateThrottle):
+    scope = 'login'
+
+
+class PasswordResetThrottle(IdentRateThrottle):
+    scope = 'password_reset'
+
+
+class RequestPasswordResetThrottle(IdentRateThrottle):
+    scope = 'request_password_reset'
+
+
+class OTPRequestThrottle(IdentRateThrottle):
+    scope = 'otp_request'
+
+
+class OTPVerifyThrottle(IdentRateThrottle):
+    scope = 'otp_verify'
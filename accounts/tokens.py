@@ -0,0 +1,158 @@
+import hashlib
+import math
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+
+# Bumped on every blacklist so other workers know to load the new rows
+GENERATION_KEY = "token_blacklist:generation"
+
+
+def blacklisted_jti_key(jti):
+    return f"token_blacklist:jti:{jti}"
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+# Per-process view of the blacklist. A JTI that is not in the bloom filter is
+# definitely not blacklisted, so the common case costs one cache read and no
+# database query. New rows are loaded incrementally by id whenever another
+# worker bumps the shared generation counter.
+class BlacklistIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._last_id = 0
+        self._generation = None
+
+    # is_blacklisted() reads self._filter without the lock, so the new filter is
+    # filled aside and swapped in complete, never seen half loaded
+    def _rebuild(self, capacity):
+        bloom = BloomFilter(capacity, settings.TOKEN_BLACKLIST_FILTER["ERROR_RATE"])
+        # Expired tokens can't be used anyway, so they don't need to be in the filter
+        rows = BlacklistedToken.objects.filter(
+            token__expires_at__gt=timezone.now()
+        ).values_list("id", "token__jti")
+        last_id = self._fill(bloom, rows.iterator(), 0)
+        self._filter, self._last_id = bloom, last_id
+
+    # Adding only sets bits, so the live filter can be extended in place
+    def _load(self, rows):
+        self._last_id = self._fill(self._filter, rows, self._last_id)
+
+    @staticmethod
+    def _fill(bloom, rows, last_id):
+        for row_id, jti in rows:
+            bloom.add(jti)
+            last_id = max(last_id, row_id)
+        return last_id
+
+    def refresh(self):
+        generation = cache.get(GENERATION_KEY)
+        if self._filter is not None and generation == self._generation:
+            return
+
+        with self._lock:
+            if self._filter is None:
+                self._rebuild(settings.TOKEN_BLACKLIST_FILTER["CAPACITY"])
+            else:
+                self._load(
+                    BlacklistedToken.objects.filter(id__gt=self._last_id)
+                    .order_by("id")
+                    .values_list("id", "token__jti")
+                )
+                # Keep the false positive rate near the target as the blacklist grows
+                if self._filter.count > self._filter.capacity:
+                    self._rebuild(self._filter.capacity * 2)
+            self._generation = generation
+
+    # Build the filter without reading the shared generation, so a gunicorn master
+    # can load it before forking without opening a cache connection. The first
+    # refresh() in a worker then only loads rows added since.
+    def preload(self):
+        with self._lock:
+            self._rebuild(settings.TOKEN_BLACKLIST_FILTER["CAPACITY"])
+
+    def add(self, jti):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+
+    def is_blacklisted(self, jti):
+        self.refresh()
+        if jti not in self._filter:
+            return False
+
+        # Possibly blacklisted: confirm with the shared cache, then the database
+        if cache.get(blacklisted_jti_key(jti)):
+            return True
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+blacklist_index = BlacklistIndex()
+
+
+class RefreshToken(BaseRefreshToken):
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+
+        if blacklist_index.is_blacklisted(jti):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        exp = self.payload["exp"]
+
+        # The outstanding row normally exists since login, only create it when missing
+        token_id = (
+            OutstandingToken.objects.filter(jti=jti)
+            .order_by()
+            .values_list("id", flat=True)
+            .first()
+        )
+        if token_id is None:
+            super().blacklist()
+        else:
+            BlacklistedToken.objects.bulk_create(
+                [BlacklistedToken(token_id=token_id)], ignore_conflicts=True
+            )
+
+        timeout = max(1, int(exp - self.current_time.timestamp()))
+        cache.set(blacklisted_jti_key(jti), True, timeout)
+        blacklist_index.add(jti)
+        if not cache.add(GENERATION_KEY, 1, None):
+            cache.incr(GENERATION_KEY)
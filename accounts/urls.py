@@ -1,27 +1,47 @@
+from django.conf import settings
 from django.urls import path
 
 from .views import (
     RegisterUserView,
     VerifyOTPView,
+    ResendOTPView,
     LoginView,
     PasswordResetConfirmView,
     PasswordResetRequestView,
     LogoutView,
+    AuthCacheStatsView,
 )
+from .async_views import (
+    AsyncRegisterUserView,
+    AsyncVerifyOTPView,
+    AsyncResendOTPView,
+    AsyncLoginView,
+    AsyncLogoutView,
+    AsyncPasswordResetRequestView,
+    AsyncPasswordResetConfirmView,
+)
+
+
+# Under ASGI the async views are served, the sync ones stay as the WSGI fallback
+def pick(sync_view, async_view):
+    return async_view.as_view() if settings.ASYNC_VIEWS else sync_view.as_view()
+
 
 urlpatterns = [
-    path("register/", RegisterUserView.as_view(), name="register view"),
-    path("verify-otp/", VerifyOTPView.as_view(), name="verify-otp"),
-    path("login/", LoginView.as_view(), name="login"),
-    path("logout/", LogoutView.as_view(), name="logout"),
+    path("register/", pick(RegisterUserView, AsyncRegisterUserView), name="register view"),
+    path("verify-otp/", pick(VerifyOTPView, AsyncVerifyOTPView), name="verify-otp"),
+    path("resend-otp/", pick(ResendOTPView, AsyncResendOTPView), name="resend-otp"),
+    path("login/", pick(LoginView, AsyncLoginView), name="login"),
+    path("logout/", pick(LogoutView, AsyncLogoutView), name="logout"),
     path(
         "reset-password/",
-        PasswordResetRequestView.as_view(),
+        pick(PasswordResetRequestView, AsyncPasswordResetRequestView),
         name="request-password-reset",
     ),
     path(
         "reset-password-confirm/",
-        PasswordResetConfirmView.as_view(),
+        pick(PasswordResetConfirmView, AsyncPasswordResetConfirmView),
         name="reset-password",
     ),
+    path("auth-cache-stats/", AuthCacheStatsView.as_view(), name="auth-cache-stats"),
 ]
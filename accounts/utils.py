@@ -1,9 +1,112 @@
-from django.core.mail import send_mail
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
 
+from .models import EmailOutbox
 
 
-def send_otp_email(user, otp_code, purpose="Verification"):
+def build_otp_email(user, otp_code, purpose="Verification"):
     subject = f"Your OTP Code for {purpose}"
     message = f"Hi {user.first_name},\n\nYour OTP code is {otp_code}. It is valid for 10 minutes."
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+    return subject, message
+
+
+def queue_email(subject, body, to_email, from_email=None):
+    return EmailOutbox.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to_email=to_email,
+    )
+
+
+# Store the OTP email in the outbox, the worker delivers it after the request returns
+def queue_otp_email(user, otp_code, purpose="Verification"):
+    subject, message = build_otp_email(user, otp_code, purpose)
+    return queue_email(subject, message, user.email)
+
+
+def retry_delay(attempts):
+    # Exponential backoff: base, 2x base, 4x base ... capped at the max delay
+    delay = settings.EMAIL_OUTBOX_RETRY_BACKOFF * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, settings.EMAIL_OUTBOX_MAX_RETRY_DELAY))
+
+
+def claim_due_emails(batch_size):
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+    due = EmailOutbox.objects.filter(
+        status=EmailOutbox.STATUS_PENDING, next_attempt_at__lte=now
+    ).order_by("next_attempt_at", "pk")[:batch_size]
+
+    claimed = []
+    for email in due:
+        # Only one worker wins the row: the update matches while attempts is unchanged.
+        # The lease makes the row due again if this worker dies before finishing.
+        won = EmailOutbox.objects.filter(
+            pk=email.pk,
+            status=EmailOutbox.STATUS_PENDING,
+            attempts=email.attempts,
+        ).update(attempts=F("attempts") + 1, next_attempt_at=lease_until)
+        if won:
+            email.attempts += 1
+            claimed.append(email)
+    return claimed
+
+
+# Send one batch of due outbox emails over a single connection, returns (sent, failed)
+def deliver_queued_emails(batch_size=None):
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    emails = claim_due_emails(batch_size)
+    if not emails:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            mark_email_failed(email, e)
+        return 0, len(emails)
+
+    try:
+        for email in emails:
+            message = EmailMessage(
+                email.subject,
+                email.body,
+                email.from_email,
+                [email.to_email],
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as e:
+                mark_email_failed(email, e)
+                failed += 1
+            else:
+                EmailOutbox.objects.filter(pk=email.pk).update(
+                    status=EmailOutbox.STATUS_SENT,
+                    sent_at=timezone.now(),
+                    last_error="",
+                )
+                sent += 1
+    finally:
+        connection.close()
+
+    return sent, failed
+
+
+def mark_email_failed(email, error):
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        EmailOutbox.objects.filter(pk=email.pk).update(
+            status=EmailOutbox.STATUS_FAILED, last_error=str(error)
+        )
+    else:
+        EmailOutbox.objects.filter(pk=email.pk).update(
+            next_attempt_at=timezone.now() + retry_delay(email.attempts),
+            last_error=str(error),
+        )
@@ -1,3 +1,4 @@
+import os
 from django.shortcuts import render
 from rest_framework.generics import GenericAPIView
 from .serializers import (
@@ -9,13 +10,11 @@ from .serializers import (
     LogoutSerializer,
 )
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework import status
-import pyotp
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import User, OTP, PasswordResetToken
-from rest_framework_simplejwt.tokens import RefreshToken
+from .models import User
+from .tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from .throttles import (
     LoginThrottle,
@@ -24,7 +23,16 @@ from .throttles import (
     OTPRequestThrottle,
     OTPVerifyThrottle,
 )
-from .utils import send_otp_email
+from .otp_store import (
+    ERROR_MESSAGES,
+    MISSING,
+    PASSWORD_RESET,
+    VALID,
+    VERIFICATION,
+    get_otp_store,
+    send_otp,
+)
+from .authentication import user_lru
 
 # Create your views here.
 
@@ -37,27 +45,19 @@ class RegisterUserView(GenericAPIView):
         if serializer.is_valid(raise_exception=True):
             user = serializer.save()
 
-            #  Generate OTP secret + code
-            otp_secret = pyotp.random_base32()
-            totp = pyotp.TOTP(otp_secret, interval=600)
-            otp_code = totp.now()
-
-            #  Save OTP record
-            OTP.objects.filter(user=user, is_verified=False).delete()  # Clear any old
-            OTP.objects.create(user=user, otp_secret=otp_secret)
-
+            # Issue the OTP and queue the email, the outbox worker sends it after we respond
             try:
-                send_otp_email(user, otp_code, "Your OTP Code for Verification")
+                send_otp(user, VERIFICATION)
             except Exception as e:
                 return Response(
-                    {"error": f"Failed to send email: {str(e)}"},
+                    {"error": f"Failed to queue email: {str(e)}"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 )
 
             return Response(
                 {
                     "data": serializer.data,
-                    "message": f"Hi {user.first_name}, your account was created. An OTP has been sent to your email for verification.",
+                    "message": f"Hi {user.first_name}, your account was created. An OTP has been queued to your email for verification.",
                 },
                 status=status.HTTP_201_CREATED,
             )
@@ -85,32 +85,22 @@ class VerifyOTPView(GenericAPIView):
                     {"error": "User not found"}, status=status.HTTP_404_NOT_FOUND
                 )
 
-            otp = OTP.objects.filter(user=user, is_verified=False).last()
-            if not otp:
-                return Response(
-                    {"error": "No valid OTP found"}, status=status.HTTP_400_BAD_REQUEST
-                )
-
-            if otp.is_expired():
+            # Verify OTP, use it up and update the user
+            store = get_otp_store()
+            outcome = store.verify(user, VERIFICATION, otp_code)
+            if outcome == VALID and not store.consume(user, VERIFICATION):
+                outcome = MISSING  # used by a concurrent request
+            if outcome != VALID:
                 return Response(
-                    {"error": "OTP has expired"}, status=status.HTTP_400_BAD_REQUEST
+                    {"error": ERROR_MESSAGES[outcome]}, status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Verify OTP and update the user
-            totp = pyotp.TOTP(otp.otp_secret, interval=600)
-            if totp.verify(otp_code, valid_window=1):
-                otp.is_verified = True
-                otp.save()
-                user.is_verified = True
-                user.is_active = True
-                user.save()
-                return Response(
-                    {"message": "OTP verified successfully"}, status=status.HTTP_200_OK
-                )
-            else:
-                return Response(
-                    {"error": "Invalid OTP"}, status=status.HTTP_400_BAD_REQUEST
-                )
+            user.is_verified = True
+            user.is_active = True
+            user.save()
+            return Response(
+                {"message": "OTP verified successfully"}, status=status.HTTP_200_OK
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -182,30 +172,54 @@ class PasswordResetRequestView(GenericAPIView):
                     {"error": "Invalid email"}, status=status.HTTP_400_BAD_REQUEST
                 )
 
-            #  Generate OTP secret + code
-            otp_secret = pyotp.random_base32()
-            totp = pyotp.TOTP(otp_secret, interval=600)
-            otp_code = totp.now()
-
-            #  Save OTP record
-
-            PasswordResetToken.objects.filter(
-                user=user, is_verified=False
-            ).delete()  # Clear any old
-
-            PasswordResetToken.objects.create(user=user, otp_secret=otp_secret)
-
+            # Repeated requests within the cooldown don't send another email
             try:
-                send_otp_email(user, otp_code, "Your OTP Code for password reset")
+                send_otp(user, PASSWORD_RESET)
             except Exception as e:
                 return Response(
-                    {"error": f"Failed to send email: {str(e)}"},
+                    {"error": f"Failed to queue email: {str(e)}"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 )
 
             return Response({"message": "verify your email to complete password reset"})
 
 
+# Send the registration OTP again, at most once per OTP_RESEND_COOLDOWN
+class ResendOTPView(GenericAPIView):
+    throttle_classes = [OTPRequestThrottle]
+
+    def post(self, request):
+        serializer = OTPRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            user = User.objects.get(email=serializer.validated_data["email"])
+        except User.DoesNotExist:
+            return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if user.is_verified:
+            return Response(
+                {"error": "User is already verified"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            sent = send_otp(user, VERIFICATION)
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to queue email: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        if not sent:
+            return Response(
+                {"message": "An OTP was sent recently, check your email or try again shortly."},
+                status=status.HTTP_200_OK,
+            )
+        return Response(
+            {"message": "A new OTP has been queued to your email."}, status=status.HTTP_200_OK
+        )
+
+
 # View for Password Reset Confirmation
 class PasswordResetConfirmView(GenericAPIView):
     throttle_classes = [PasswordResetThrottle]
@@ -224,30 +238,28 @@ class PasswordResetConfirmView(GenericAPIView):
                     {"error": "User not found"}, status=status.HTTP_404_NOT_FOUND
                 )
 
-            otp = PasswordResetToken.objects.filter(user=user, is_verified=False).last()
-            if not otp:
+            # Verify OTP and use it up
+            store = get_otp_store()
+            outcome = store.verify(user, PASSWORD_RESET, otp_code)
+            if outcome == VALID and not store.consume(user, PASSWORD_RESET):
+                outcome = MISSING  # used by a concurrent request
+            if outcome != VALID:
                 return Response(
-                    {"error": "No valid OTP found"}, status=status.HTTP_400_BAD_REQUEST
+                    {"error": ERROR_MESSAGES[outcome]}, status=status.HTTP_400_BAD_REQUEST
                 )
 
-            if otp.is_expired():
-                return Response(
-                    {"error": "OTP has expired"}, status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Verify OTP
-            totp = pyotp.TOTP(otp.otp_secret, interval=600)
-            if totp.verify(otp_code):
-                otp.is_verified = True
-                otp.save()
-                # Update password
-                user.set_password(new_password)
-                user.save()
-                return Response(
-                    {"message": "Password reset successfull"}, status=status.HTTP_200_OK
-                )
-            else:
-                return Response(
-                    {"error": "Invalid OTP"}, status=status.HTTP_400_BAD_REQUEST
-                )
+            # Update password
+            user.set_password(new_password)
+            user.save()
+            return Response(
+                {"message": "Password reset successfull"}, status=status.HTTP_200_OK
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Hit/miss counters of the authenticated-user cache in this worker process
+class AuthCacheStatsView(GenericAPIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({"pid": os.getpid(), **user_lru.snapshot()})
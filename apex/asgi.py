@@ -11,6 +11,13 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from apex.boot import warm_up
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'apex.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+# Async views run their queries on executor threads, so persistent connections
+# would pile up per thread instead of being reused
+os.environ.setdefault('CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+warm_up()
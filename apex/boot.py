@@ -0,0 +1,104 @@
+"""
+Warm the application up when it is loaded, before gunicorn forks its workers.
+
+apex/wsgi.py and apex/asgi.py call warm_up() right after building the
+application. With preload_app (see gunicorn.conf.py), the master pays these
+first-request costs once:
+- compiling the URL patterns
+- building every API serializer's fields
+- loading the password hashers, the JWT backend and the translation catalogs
+- opening a first database connection, which also loads the token blacklist filter
+
+The master then closes its connections and calls gc.freeze(). Workers forked
+after that share the warmed pages copy-on-write. The cyclic GC in a worker
+skips frozen objects, so it doesn't write to those pages and copy them.
+
+Without preloading, each worker warms itself up when it imports the app.
+Set BOOT_WARMUP=False to skip all of this.
+"""
+
+import gc
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.urls import URLResolver, get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def iter_callbacks(resolver):
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex  # compiled on first access
+        if isinstance(pattern, URLResolver):
+            yield from iter_callbacks(pattern)
+        else:
+            yield pattern.callback
+
+
+def warm_urls_and_serializers():
+    resolver = get_resolver()
+    resolver.reverse_dict  # built on the first reverse()
+    for callback in iter_callbacks(resolver):
+        view_class = getattr(callback, "view_class", None)
+        serializer_class = getattr(view_class, "serializer_class", None)
+        if serializer_class is not None:
+            serializer_class().fields  # also fills the models' _meta caches
+
+
+def warm_auth():
+    from django.contrib.auth.hashers import get_hashers
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from accounts.authentication import CachedJWTAuthentication
+
+    get_hashers()
+    CachedJWTAuthentication().get_validated_token(str(AccessToken()))
+
+
+def warm_translations():
+    from django.utils import translation
+
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext("This field is required.")
+
+
+def warm_database():
+    from accounts.tokens import blacklist_index
+
+    for alias in connections:
+        connections[alias].ensure_connection()
+    # Not refresh(): the shared cache's SQLite handle must not be inherited by workers
+    blacklist_index.preload()
+
+
+STEPS = [warm_urls_and_serializers, warm_auth, warm_translations, warm_database]
+
+
+def warm_up():
+    if not settings.BOOT_WARMUP:
+        return
+
+    started = time.perf_counter()
+    for step in STEPS:
+        try:
+            step()
+        except Exception:
+            # A cold worker is slower, not broken: never stop the server booting
+            logger.warning("Boot warm-up step %s failed", step.__name__, exc_info=True)
+    # Forked workers must open their own connections
+    connections.close_all()
+
+    gc.collect()
+    gc.freeze()
+    logger.info("Warmed up in %.0fms", (time.perf_counter() - started) * 1000)
+
+
+# Called in each worker after the fork, so its first request finds an open connection
+def connect_databases():
+    for alias in connections:
+        try:
+            connections[alias].ensure_connection()
+        except Exception:
+            logger.warning("Could not connect to database %s", alias, exc_info=True)
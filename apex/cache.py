@@ -0,0 +1,194 @@
+"""
+SQLite-backed cache shared by every worker process on the machine.
+
+LocMemCache is private to one process, so with several gunicorn workers each
+worker keeps its own throttle counters and cached objects. This backend keeps
+the entries in one SQLite file in WAL mode instead: reads don't block, writes
+are serialised by SQLite, and incr() is a single atomic UPDATE ... RETURNING.
+
+    CACHES = {
+        "default": {
+            "BACKEND": "apex.cache.SQLiteCache",
+            "LOCATION": "/var/tmp/apex-cache.sqlite3",
+            "OPTIONS": {"MAX_ENTRIES": 100_000, "CULL_FREQUENCY": 3},
+        }
+    }
+"""
+
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from apex.metrics import record_cache
+
+# Expiry stored for entries that never expire
+FOREVER = 2**53
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._path = str(location)
+        self._busy_timeout = options.get("BUSY_TIMEOUT", 5)
+        # Culling counts the table, so only do it on about 1 in N writes
+        self._cull_every = options.get("CULL_EVERY", 200)
+        self._local = threading.local()
+
+    # One connection per thread, reopened after a fork
+    def _connection(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=self._busy_timeout, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)"
+            )
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    # Plain integers are stored natively so incr() can do the arithmetic in SQL
+    def _encode(self, value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _decode(self, value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _expiry(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return FOREVER if expires is None else expires
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache.expires <= ?",
+            (key, self._encode(value), self._expiry(timeout), now),
+        )
+        self._maybe_cull()
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version)
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            record_cache("shared", 0, 1)
+            return default
+        record_cache("shared", 1, 0)
+        return self._decode(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, self._encode(value), self._expiry(timeout)),
+        )
+        self._maybe_cull()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        cursor = self._connection().execute(
+            "UPDATE cache SET expires = ? WHERE key = ? AND expires > ?",
+            (self._expiry(timeout), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version)
+        cursor = self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version)
+        row = self._connection().execute(
+            "SELECT 1 FROM cache WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version)
+        row = self._connection().execute(
+            "UPDATE cache SET value = value + ? "
+            "WHERE key = ? AND expires > ? AND typeof(value) = 'integer' "
+            "RETURNING value",
+            (delta, key, time.time()),
+        ).fetchone()
+        if row is None:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version): key for key in keys}
+        if not key_map:
+            return {}
+        placeholders = ", ".join("?" * len(key_map))
+        rows = self._connection().execute(
+            f"SELECT key, value FROM cache WHERE key IN ({placeholders}) AND expires > ?",
+            (*key_map, time.time()),
+        )
+        found = {key_map[key]: self._decode(value) for key, value in rows}
+        record_cache("shared", len(found), len(key_map) - len(found))
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expiry(timeout)
+        rows = [
+            (self.make_and_validate_key(key, version), self._encode(value), expires)
+            for key, value in data.items()
+        ]
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)", rows
+            )
+        self._maybe_cull()
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [(self.make_and_validate_key(key, version),) for key in keys]
+        self._connection().executemany("DELETE FROM cache WHERE key = ?", keys)
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def _maybe_cull(self):
+        if random.randrange(self._cull_every) == 0:
+            self._cull()
+
+    # Drop expired entries, then the 1/CULL_FREQUENCY entries closest to expiry
+    def _cull(self):
+        connection = self._connection()
+        connection.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        count = connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count > self._max_entries:
+            if self._cull_frequency == 0:
+                return self.clear()
+            excess = count - self._max_entries
+            connection.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY expires LIMIT ?)",
+                (max(excess, count // self._cull_frequency),),
+            )
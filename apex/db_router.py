@@ -0,0 +1,130 @@
+"""
+Send reads to read replicas and writes to the primary ("default") database.
+
+Only requests read from replicas. Management commands, outbox workers and
+anything else outside a request always use the primary, because they act on
+rows they have just claimed or written. Inside a request, reads go to the
+primary in three cases:
+
+- the request has already written something
+- it is inside a transaction
+- the client (by IP) or user (by bearer token) wrote within the last
+  REPLICA_PIN_SECONDS
+
+The last case is what lets a client read its own writes on its next
+request, e.g. verify-otp right after register.
+
+    DATABASE_REPLICAS=/var/lib/apex/replica.sqlite3 python manage.py runserver
+    python manage.py sync_replicas --interval 5   # keep the copy fresh
+"""
+
+import base64
+import contextvars
+import json
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.throttling import BaseThrottle
+from rest_framework_simplejwt.settings import api_settings
+
+PRIMARY = "default"
+
+
+class RequestPin:
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+current_pin = contextvars.ContextVar("apex_db_pin", default=None)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        pin = current_pin.get()
+        if pin is None or pin.pinned or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        pin = current_pin.get()
+        if pin is not None:
+            pin.pinned = pin.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are copies of the primary, so objects from any of them can relate
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+def pin_key(kind, value):
+    return f"db_pin:{kind}:{value}"
+
+
+# The token is not verified here: it only decides which database serves the reads
+def token_user_id(request):
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    if not header.startswith("Bearer "):
+        return None
+    try:
+        payload = header[7:].split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return claims.get(api_settings.USER_ID_CLAIM)
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+
+def pin_keys(request):
+    keys = [pin_key("ip", BaseThrottle().get_ident(request))]
+    user_id = token_user_id(request)
+    if user_id is not None:
+        keys.append(pin_key("user", user_id))
+    return keys
+
+
+class ReplicaPinMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        keys = pin_keys(request)
+        pin = RequestPin(pinned=bool(cache.get_many(keys)))
+        token = current_pin.set(pin)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_pin.reset(token)
+        if pin.wrote:
+            cache.set_many(dict.fromkeys(keys, True), settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        keys = pin_keys(request)
+        pin = RequestPin(pinned=bool(await cache.aget_many(keys)))
+        token = current_pin.set(pin)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_pin.reset(token)
+        if pin.wrote:
+            await cache.aset_many(dict.fromkeys(keys, True), settings.REPLICA_PIN_SECONDS)
+        return response
@@ -0,0 +1,343 @@
+"""
+Per-endpoint request metrics in the Prometheus text format.
+
+MetricsMiddleware times every request and labels it with the resolved URL
+name. While the request runs, a RequestStats object in a context variable
+collects the database queries, cache hits/misses and throttle rejections it
+causes. That object also follows the request into sync_to_async threads.
+
+Recording is lock-free. Each thread writes to its own shard of plain dicts,
+and the shards are only merged when metrics are collected. Under gunicorn,
+every worker writes its merged totals to METRICS_DIR/apex-<pid>.json at most
+once per METRICS_FLUSH_INTERVAL. The /metrics view sums those files, so a
+scrape covers all workers whichever one serves it.
+
+Files of exited workers are kept so the counters never go backwards.
+Empty METRICS_DIR when the server starts (see clear_metrics_dir). Leave
+METRICS_DIR unset for a single-process server.
+
+    MIDDLEWARE = ["apex.metrics.MetricsMiddleware", ...]
+    METRICS_DIR = "/var/tmp/apex-metrics"
+"""
+
+import atexit
+import bisect
+import contextvars
+import glob
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+
+# Seconds. The login view hashes a password, so the buckets go up to several seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label for requests that did not resolve to a URL pattern (404s)
+UNRESOLVED = "<unresolved>"
+
+HELP = {
+    "apex_http_requests_total": ("counter", "HTTP responses by view, method and status."),
+    "apex_http_request_duration_seconds": ("histogram", "Request latency by view."),
+    "apex_db_queries_total": ("counter", "SQL queries executed by view."),
+    "apex_db_query_duration_seconds_total": ("counter", "Time spent in SQL by view."),
+    "apex_cache_hits_total": ("counter", "Cache lookups that found a value, by view and cache."),
+    "apex_cache_misses_total": ("counter", "Cache lookups that found nothing, by view and cache."),
+    "apex_throttle_rejections_total": ("counter", "Requests rejected by a throttle, by view and scope."),
+}
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_time", "cache", "throttled")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.cache = {}
+        self.throttled = []
+
+
+current_request = contextvars.ContextVar("apex_metrics_request", default=None)
+
+
+class Shard:
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters = {}
+        # (name, labels) -> [count per bucket..., +Inf count, sum]
+        self.histograms = {}
+
+
+class Registry:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = Shard()
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def inc(self, name, labels, value=1):
+        counters = self.shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        histograms = self.shard().histograms
+        key = (name, labels)
+        buckets = histograms.get(key)
+        if buckets is None:
+            buckets = histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        buckets[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        buckets[-1] += value
+
+    def record_request(self, view, method, status, duration, stats):
+        self.inc("apex_http_requests_total", (view, method, str(status)))
+        self.observe("apex_http_request_duration_seconds", (view,), duration)
+        if stats.queries:
+            self.inc("apex_db_queries_total", (view,), stats.queries)
+            self.inc("apex_db_query_duration_seconds_total", (view,), stats.query_time)
+        for (cache_name, hit), count in stats.cache.items():
+            name = "apex_cache_hits_total" if hit else "apex_cache_misses_total"
+            self.inc(name, (view, cache_name), count)
+        for scope in stats.throttled:
+            self.inc("apex_throttle_rejections_total", (view, scope))
+
+    # Merge every thread's shard. dict.copy() is atomic under the GIL, so the
+    # owning threads never have to take a lock to write
+    def snapshot(self):
+        with self._lock:
+            shards = list(self._shards)
+        counters, histograms = {}, {}
+        for shard in shards:
+            for key, value in shard.counters.copy().items():
+                counters[key] = counters.get(key, 0) + value
+            for key, buckets in shard.histograms.copy().items():
+                merged = histograms.setdefault(key, [0] * len(buckets))
+                for i, value in enumerate(list(buckets)):
+                    merged[i] += value
+        return counters, histograms
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        # Whoever gets the lock flushes, the other threads carry on serving
+        if self._flush_lock.acquire(blocking=False):
+            try:
+                self.flush()
+            finally:
+                self._flush_lock.release()
+
+    def flush(self):
+        directory = settings.METRICS_DIR
+        self._last_flush = time.monotonic()
+        if not directory:
+            return
+        counters, histograms = self.snapshot()
+        data = {
+            "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+            "histograms": [
+                [name, list(labels), buckets] for (name, labels), buckets in histograms.items()
+            ],
+        }
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename so a concurrent scrape never reads half a file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, os.path.join(directory, f"apex-{os.getpid()}.json"))
+
+    # Totals across every worker process that has flushed to METRICS_DIR
+    def collect(self):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return self.snapshot()
+
+        with self._flush_lock:
+            self.flush()
+        counters, histograms = {}, {}
+        for path in glob.glob(os.path.join(directory, "apex-*.json")):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in data["counters"]:
+                key = (name, tuple(labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, buckets in data["histograms"]:
+                merged = histograms.setdefault((name, tuple(labels)), [0] * len(buckets))
+                for i, value in enumerate(buckets):
+                    merged[i] += value
+        return counters, histograms
+
+
+registry = Registry()
+
+
+def clear_metrics_dir():
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, "apex-*.json")):
+        os.remove(path)
+
+
+def record_cache(cache_name, hits, misses):
+    stats = current_request.get()
+    if stats is not None:
+        if hits:
+            stats.cache[cache_name, True] = stats.cache.get((cache_name, True), 0) + hits
+        if misses:
+            stats.cache[cache_name, False] = stats.cache.get((cache_name, False), 0) + misses
+
+
+def record_throttle(scope):
+    stats = current_request.get()
+    if stats is not None:
+        stats.throttled.append(scope or "")
+
+
+# Installed on every database connection, counts only inside a request
+def query_recorder(execute, sql, params, many, context):
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_time += time.perf_counter() - started
+
+
+def install_query_recorder(connection, **kwargs):
+    if query_recorder not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_recorder)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        if settings.METRICS_DIR:
+            atexit.register(registry.flush)
+        # Connections opened before this module was imported never sent connection_created
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def record(self, request, response, duration, stats):
+        match = request.resolver_match
+        view = match.view_name if match is not None else UNRESOLVED
+        registry.record_request(view, request.method, response.status_code, duration, stats)
+        registry.maybe_flush()
+
+
+def format_labels(names, values):
+    return ",".join(
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+
+
+LABEL_NAMES = {
+    "apex_http_requests_total": ("view", "method", "status"),
+    "apex_http_request_duration_seconds": ("view",),
+    "apex_db_queries_total": ("view",),
+    "apex_db_query_duration_seconds_total": ("view",),
+    "apex_cache_hits_total": ("view", "cache"),
+    "apex_cache_misses_total": ("view", "cache"),
+    "apex_throttle_rejections_total": ("view", "scope"),
+}
+
+
+def render(counters, histograms):
+    lines = []
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for (name, labels), buckets in histograms.items():
+        by_name.setdefault(name, []).append((labels, buckets))
+
+    for name in HELP:
+        samples = by_name.get(name)
+        if not samples:
+            continue
+        kind, help_text = HELP[name]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        label_names = LABEL_NAMES[name]
+        for labels, value in sorted(samples):
+            label_text = format_labels(label_names, labels)
+            if kind != "histogram":
+                lines.append(f"{name}{{{label_text}}} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{label_text}}} {value[-1]}")
+            lines.append(f"{name}_count{{{label_text}}} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# Needs the METRICS_TOKEN bearer token. Without one configured, /metrics is only
+# served with DEBUG on and doesn't exist otherwise.
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseNotFound()
+    elif not hmac.compare_digest(
+        # As bytes: compare_digest raises TypeError on non-ASCII str
+        request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render(*registry.collect()), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
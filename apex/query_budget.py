@@ -0,0 +1,43 @@
+"""
+Count the SQL queries run inside a block and flag blocks that exceed a budget.
+
+    with query_budget(2, "join membership"):
+        ...
+
+Transaction control statements (BEGIN, SAVEPOINT, ...) are not counted. Over
+budget logs a warning and nothing else: the block has already run, and may have
+committed, by the time it is counted. Tests enforce the budgets with
+assertNumQueries.
+"""
+
+import logging
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_STATEMENTS = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(TRANSACTION_STATEMENTS):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def query_budget(limit, label="block"):
+    counter = QueryCounter()
+    # Every database, reads may be routed to a replica
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+        yield counter
+
+    if counter.count > limit:
+        logger.warning("%s ran %d queries, budget is %d", label, counter.count, limit)
@@ -0,0 +1,97 @@
+"""
+DRF renderer and parser backed by orjson, with DRF's stdlib json as the fallback.
+
+    REST_FRAMEWORK = {
+        "DEFAULT_RENDERER_CLASSES": ["apex.renderers.FastJSONRenderer", ...],
+        "DEFAULT_PARSER_CLASSES": ["apex.renderers.FastJSONParser", ...],
+    }
+
+The output is byte for byte what JSONRenderer writes with our settings (compact,
+UTF-8, \\u2028 and \\u2029 escaped): orjson writes datetimes, dates, times and
+UUIDs the same way, and everything it doesn't know (lazy translation strings,
+Decimal, timedelta, querysets) goes through DRF's own JSONEncoder.default.
+Whatever orjson refuses (integers over 64 bits, timezone-aware times, indented
+output for "Accept: application/json; indent=4") is rendered by JSONRenderer
+itself. Known differences, none of which our payloads hit: floats in exponent
+notation ("1e16" rather than "1e+16"), NaN and infinity rendered as null rather
+than raising, and UTC offsets with seconds, which orjson rounds to minutes.
+
+The parser falls back to the stdlib on anything orjson rejects, so error
+messages and the odd edge case (lone surrogates) match JSONParser. orjson reads
+integers over 64 bits as floats.
+
+Without orjson installed both classes behave exactly like DRF's.
+"""
+
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LINE_SEPARATOR = "\u2028".encode()
+PARAGRAPH_SEPARATOR = "\u2029".encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    def __init__(self):
+        super().__init__()
+        self.default = self.encoder_class().default
+        self.options = 0
+        if orjson is not None:
+            # OPT_UTC_Z: "Z" rather than "+00:00", as DRF's encoder does
+            self.options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as JSONRenderer, so the output stays a JavaScript subset
+        if LINE_SEPARATOR in ret or PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b"\\u2028").replace(PARAGRAPH_SEPARATOR, b"\\u2029")
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
+
+
+# A JSON request body, as strict as DRF with STRICT_JSON: NaN and Infinity are
+# rejected. Raises ValueError with the stdlib's message.
+def loads(content):
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass
+    # UnicodeDecodeError is a ValueError as well
+    return json.loads(content.decode())
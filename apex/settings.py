@@ -13,7 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -50,6 +50,8 @@ INSTALLED_APPS = [
     "rest_framework_simplejwt.token_blacklist",
 ]
 MIDDLEWARE = [
+    "apex.metrics.MetricsMiddleware",
+    "apex.db_router.ReplicaPinMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -81,6 +83,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "apex.wsgi.application"
 
+# Warm caches and connections when the app is loaded, see apex/boot.py
+BOOT_WARMUP = config("BOOT_WARMUP", default=True, cast=bool)
+
+# Serve the async views in accounts/async_views.py; apex/asgi.py turns this on
+ASYNC_VIEWS = config("ASYNC_VIEWS", default=False, cast=bool)
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -92,6 +100,91 @@ DATABASES = {
     }
 }
 
+# SQLite tuned for several gunicorn workers writing at once:
+# - WAL lets readers carry on while one connection writes
+# - busy_timeout makes a blocked writer wait for the lock instead of failing
+# - BEGIN IMMEDIATE takes the write lock when the transaction starts. A deferred
+#   transaction that reads and then writes can't wait for the lock and fails
+#   straight away with "database is locked"
+# - connections are reused across requests and health-checked before reuse
+SQLITE_HIGH_CONCURRENCY = config("SQLITE_HIGH_CONCURRENCY", default=True, cast=bool)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": config("SQLITE_BUSY_TIMEOUT_MS", default=5000, cast=int),
+    "mmap_size": 128 * 1024 * 1024,
+    "cache_size": -20000,  # negative means KiB, so about 20MB per connection
+}
+
+if SQLITE_HIGH_CONCURRENCY:
+    DATABASES["default"].update(
+        {
+            "CONN_MAX_AGE": config("CONN_MAX_AGE", default=600, cast=int),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "init_command": ";".join(
+                    f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+                ),
+                "transaction_mode": "IMMEDIATE",
+            },
+        }
+    )
+
+
+# Read replicas, see apex/db_router.py: comma separated SQLite files kept in sync
+# with the primary by `manage.py sync_replicas`. Reads from a client that wrote in
+# the last REPLICA_PIN_SECONDS still go to the primary.
+DATABASE_REPLICAS = []
+for number, path in enumerate(config("DATABASE_REPLICAS", default="", cast=Csv()), 1):
+    alias = f"replica{number}"
+    DATABASES[alias] = {**DATABASES["default"], "NAME": path, "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["apex.db_router.PrimaryReplicaRouter"] if DATABASE_REPLICAS else []
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=10, cast=int)
+
+# Query budgets, see apex/query_budget.py. Exceeding one logs a warning.
+QUERY_BUDGETS = {
+    # SELECT + UPDATE or INSERT + analytics rollup
+    "join_membership": 3,
+    # SELECT + up to 4 INSERT batches (SQLite binds 333 rows per batch) + UPDATE
+    "bulk_subscribe": 6,
+    # One admin changelist page, see apex/admin_performance.py
+    "admin_changelist": 8,
+}
+
+# Admin changelists count matching rows exactly up to this many, then estimate
+ADMIN_EXACT_COUNT_LIMIT = 10_000
+
+# Hits returned by the staff member search API, see accounts/search.py
+MEMBER_SEARCH_MAX_RESULTS = 20
+
+# Staff membership analytics, see apex_gym/analytics.py
+MEMBERSHIP_ANALYTICS_CACHE_SECONDS = config("MEMBERSHIP_ANALYTICS_CACHE_SECONDS", default=60, cast=int)
+MEMBERSHIP_ANALYTICS_MAX_DAYS = 366
+
+
+# Cache
+# The SQLite cache file is shared by every worker on the machine, so throttles
+# and cached objects are consistent across gunicorn processes.
+
+CACHES = {
+    "default": {
+        "BACKEND": "apex.cache.SQLiteCache",
+        "LOCATION": config("CACHE_LOCATION", default=str(BASE_DIR / "cache.sqlite3")),
+        "OPTIONS": {"MAX_ENTRIES": 100_000},
+    }
+}
+
+
+# Password hashing for the async login runs on this bounded thread pool,
+# see accounts/hashing.py
+PASSWORD_HASHER_POOL = {
+    "MAX_WORKERS": config("PASSWORD_HASHER_WORKERS", default=2, cast=int),
+    "MAX_QUEUE": config("PASSWORD_HASHER_QUEUE", default=16, cast=int),
+    "QUEUE_TIMEOUT": 10,  # seconds
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -147,16 +240,40 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": True,
     "TOKEN_BLACKLIST_ENABLED": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.TokenRefreshSerializer",
+}
+
+# In-memory bloom filter in front of the refresh token blacklist, see accounts/tokens.py
+TOKEN_BLACKLIST_FILTER = {
+    "CAPACITY": 100_000,  # doubled automatically when exceeded
+    "ERROR_RATE": 0.01,
+}
+
+# Users resolved by CachedJWTAuthentication: an in-process LRU backed by the shared cache
+AUTH_USER_CACHE = {
+    "MAX_SIZE": 1024,
+    "LOCAL_TTL": 5,  # seconds another worker's invalidation may go unseen
+    "TIMEOUT": 5 * 60,
 }
 
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
     ),
+    # orjson-backed JSON, same bytes as DRF's JSONRenderer (see apex/renderers.py)
+    "DEFAULT_RENDERER_CLASSES": [
+        "apex.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "apex.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "accounts.throttles.AnonSlidingWindowThrottle",
+        "accounts.throttles.UserSlidingWindowThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "100/day",
@@ -174,7 +291,7 @@ UNFOLD = {
     "SITE_TITLE": "Apex Admin",
     "SITE_HEADER": "Apex Admin",
     "SITE_URL": "/admin",
-    "SHOW_COUNTS": True,
+    "SHOW_COUNTS": False,
     "SHOW_RECENT": True,
     "ENVIRONMENT": "Development",  # or "Production"
 }
@@ -192,6 +309,39 @@ DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL")
 # AnyMail setup
 ANYMAIL = {"SENDINBLUE_API_KEY": config("SENDINBLUE_API_KEY")}
 
+# Where OTPs live until verified, see accounts/otp_store.py. The cache store keeps
+# the OTP flow off the database, DatabaseOTPStore keeps them in the OTP tables.
+OTP_STORE = config("OTP_STORE", default="accounts.otp_store.CacheOTPStore")
+OTP_STORE_CACHE = "default"
+OTP_MAX_ATTEMPTS = 5  # wrong codes before the cache store drops the OTP
+OTP_RESEND_COOLDOWN = config("OTP_RESEND_COOLDOWN", default=60, cast=int)  # seconds between OTP emails
+OTP_REUSE_WINDOW = 5 * 60  # resend a code this young instead of issuing a new one
+
+# Email outbox: OTP emails are queued and delivered by `manage.py send_queued_emails`
+EMAIL_OUTBOX_BATCH_SIZE = config("EMAIL_OUTBOX_BATCH_SIZE", default=50, cast=int)
+EMAIL_OUTBOX_POLL_INTERVAL = config("EMAIL_OUTBOX_POLL_INTERVAL", default=2, cast=float)
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BACKOFF = 30  # seconds, doubled after every failed attempt
+EMAIL_OUTBOX_MAX_RETRY_DELAY = 60 * 60
+EMAIL_OUTBOX_LEASE = 5 * 60  # a claimed email becomes due again if the worker dies
+
+# Newsletter campaigns are sent by `manage.py send_newsletters`
+NEWSLETTER_POLL_INTERVAL = config("NEWSLETTER_POLL_INTERVAL", default=5, cast=float)
+NEWSLETTER_CAMPAIGN_LEASE = 10 * 60  # a campaign without heartbeat for this long is resumed
+
+# Request metrics served at /metrics. Under gunicorn every worker flushes its
+# totals to METRICS_DIR, which should be emptied when the server starts
+METRICS_DIR = config("METRICS_DIR", default="")
+METRICS_FLUSH_INTERVAL = config("METRICS_FLUSH_INTERVAL", default=5, cast=float)
+# Bearer token required to scrape /metrics. Unset, /metrics is only served with DEBUG on
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Largest list accepted by the bulk newsletter subscribe endpoint
+NEWSLETTER_BULK_SUBSCRIBE_MAX = 1000
+
+# Rows fetched per database round-trip by the streaming admin CSV exports
+CSV_EXPORT_CHUNK_SIZE = 2000
+
 
 CORS_ALLOW_ALL_ORIGINS = False  # 🔒 Keep this off for production
 CORS_ALLOWED_ORIGINS = [
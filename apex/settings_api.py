@@ -0,0 +1,58 @@
+"""
+API-only profile for workers that serve the JSON endpoints but not /admin.
+
+    DJANGO_SETTINGS_MODULE=apex.settings_api gunicorn apex.wsgi
+
+The API authenticates with JWT only, so sessions, CSRF, messages, clickjacking
+headers and static files are only there for the admin. This profile drops those
+apps and middleware and routes through apex/urls_api.py. Without the admin app
+there is no autodiscover, so unfold and the ModelAdmin modules are never
+imported. DRF's schema module still imports parts of django.contrib.admin.
+
+Run migrations and serve /admin with apex.settings. Put a proxy in front that
+sends /admin and /static to those workers.
+"""
+
+from apex.settings import *  # noqa: F401,F403
+from apex.settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK, TEMPLATES
+
+ADMIN_ONLY_APPS = {
+    "unfold",
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+}
+ADMIN_ONLY_MIDDLEWARE = {
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    # Needs sessions; DRF authenticates the API views itself
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+}
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ADMIN_ONLY_APPS]
+MIDDLEWARE = [name for name in MIDDLEWARE if name not in ADMIN_ONLY_MIDDLEWARE]
+ROOT_URLCONF = "apex.urls_api"
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        "OPTIONS": {
+            **TEMPLATES[0]["OPTIONS"],
+            "context_processors": [
+                processor
+                for processor in TEMPLATES[0]["OPTIONS"]["context_processors"]
+                if processor != "django.contrib.messages.context_processors.messages"
+            ],
+        },
+    }
+]
+
+# JSON only: the browsable API renders templates and serves admin-style static files
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": ["apex.renderers.FastJSONRenderer"],
+}
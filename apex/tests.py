@@ -0,0 +1,419 @@
+import base64
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import User
+from apex_gym.models import NewsletterSubscriber
+
+from . import boot, renderers
+from .admin_performance import EstimatedCountPaginator
+from .cache import SQLiteCache
+from .db_router import (
+    PrimaryReplicaRouter,
+    ReplicaPinMiddleware,
+    RequestPin,
+    current_pin,
+    token_user_id,
+)
+from .query_budget import query_budget
+from .renderers import FastJSONParser, FastJSONRenderer
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class MetricsViewTests(SimpleTestCase):
+    @override_settings(METRICS_TOKEN="", DEBUG=False)
+    def test_hidden_without_a_token_outside_debug(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    @override_settings(METRICS_TOKEN="", DEBUG=True)
+    def test_open_without_a_token_in_debug(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(METRICS_TOKEN="scrape-me", DEBUG=False)
+    def test_requires_the_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        for header in ["Bearer wrong", "Bearer \xff", "Bearer scrape-mé"]:
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION=header)
+            self.assertEqual(response.status_code, 403)
+
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-me")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"apex_http_requests_total", response.content)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix="apex-cache-test-")
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, "cache.sqlite3")
+        self.cache = SQLiteCache(self.path, {})
+
+    def test_get_set_add_delete(self):
+        self.assertIsNone(self.cache.get("missing"))
+        self.cache.set("user", {"id": 1, "name": "Ada"})
+        self.assertEqual(self.cache.get("user"), {"id": 1, "name": "Ada"})
+        self.assertFalse(self.cache.add("user", "other"))
+        self.assertTrue(self.cache.add("new", 0))
+        self.assertTrue(self.cache.has_key("new"))
+        self.assertTrue(self.cache.delete("user"))
+        self.assertFalse(self.cache.delete("user"))
+
+    def test_many(self):
+        self.cache.set_many({"a": 1, "b": [2]})
+        self.assertEqual(self.cache.get_many(["a", "b", "c"]), {"a": 1, "b": [2]})
+        self.cache.delete_many(["a", "b"])
+        self.assertEqual(self.cache.get_many(["a", "b"]), {})
+
+    def test_expiry(self):
+        self.cache.set("short", "value", 10)
+        self.cache.set("forever", "value", None)
+        later = time.time() + 11
+        with mock.patch("time.time", return_value=later):
+            self.assertIsNone(self.cache.get("short"))
+            self.assertEqual(self.cache.get("forever"), "value")
+            self.assertFalse(self.cache.touch("short"))
+            # An expired key can be added again
+            self.assertTrue(self.cache.add("short", "again"))
+
+    def test_touch_and_clear(self):
+        self.cache.set("key", "value", 10)
+        self.assertTrue(self.cache.touch("key", 100))
+        with mock.patch("time.time", return_value=time.time() + 50):
+            self.assertEqual(self.cache.get("key"), "value")
+        self.cache.clear()
+        self.assertFalse(self.cache.has_key("key"))
+
+    def test_incr(self):
+        self.cache.set("counter", 1)
+        self.assertEqual(self.cache.incr("counter"), 2)
+        self.assertEqual(self.cache.decr("counter", 2), 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+        self.cache.set("pickled", "text")
+        with self.assertRaises(ValueError):
+            self.cache.incr("pickled")
+
+    def test_incr_is_shared_and_atomic_across_processes(self):
+        self.cache.set("counter", 0, None)
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=increment, args=(self.path, 200)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get("counter"), 800)
+
+    def test_cull(self):
+        cache = SQLiteCache(self.path, {"OPTIONS": {"MAX_ENTRIES": 10, "CULL_EVERY": 1}})
+        for n in range(30):
+            cache.set(f"key{n}", n)
+        count = cache._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        self.assertLessEqual(count, 11)
+        self.assertEqual(cache.get("key29"), 29)
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr("counter")
+
+
+def fake_token(claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=").decode()
+    return f"header.{payload}.signature"
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], CACHES=LOCMEM_CACHES)
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+
+    def test_outside_requests_everything_uses_the_primary(self):
+        self.assertEqual(self.router.db_for_read(User), "default")
+        self.assertEqual(self.router.db_for_write(User), "default")
+
+    def test_request_reads_go_to_a_replica_until_it_writes(self):
+        token = current_pin.set(RequestPin(pinned=False))
+        self.addCleanup(current_pin.reset, token)
+        self.assertEqual(self.router.db_for_read(User), "replica1")
+        self.router.db_for_write(User)
+        self.assertEqual(self.router.db_for_read(User), "default")
+
+    def test_only_the_primary_is_migrated(self):
+        self.assertTrue(self.router.allow_migrate("default", "accounts"))
+        self.assertFalse(self.router.allow_migrate("replica1", "accounts"))
+
+    def test_token_user_id(self):
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION="Bearer " + fake_token({"user_id": 7}))
+        self.assertEqual(token_user_id(request), 7)
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION="Bearer not-a-token")
+        self.assertIsNone(token_user_id(request))
+
+    def test_a_client_that_wrote_reads_from_the_primary_next_time(self):
+        reads = []
+
+        def view(request):
+            reads.append(self.router.db_for_read(User))
+            if request.method == "POST":
+                self.router.db_for_write(User)
+            return HttpResponse()
+
+        middleware = ReplicaPinMiddleware(view)
+        factory = RequestFactory()
+        middleware(factory.get("/", REMOTE_ADDR="10.0.0.1"))
+        middleware(factory.post("/", REMOTE_ADDR="10.0.0.1"))
+        middleware(factory.get("/", REMOTE_ADDR="10.0.0.1"))
+        middleware(factory.get("/", REMOTE_ADDR="10.0.0.2"))
+        self.assertEqual(reads, ["replica1", "replica1", "default", "replica1"])
+
+    def test_a_user_that_wrote_reads_from_the_primary_from_any_address(self):
+        reads = []
+
+        def view(request):
+            reads.append(self.router.db_for_read(User))
+            if request.method == "POST":
+                self.router.db_for_write(User)
+            return HttpResponse()
+
+        middleware = ReplicaPinMiddleware(view)
+        factory = RequestFactory()
+        token = "Bearer " + fake_token({"user_id": 7})
+        middleware(factory.post("/", REMOTE_ADDR="10.0.0.1", HTTP_AUTHORIZATION=token))
+        middleware(factory.get("/", REMOTE_ADDR="10.0.0.2", HTTP_AUTHORIZATION=token))
+        self.assertEqual(reads, ["replica1", "default"])
+
+    def test_async_middleware_pins_after_a_write(self):
+        reads = []
+
+        async def view(request):
+            reads.append(self.router.db_for_read(User))
+            if request.method == "POST":
+                self.router.db_for_write(User)
+            return HttpResponse()
+
+        middleware = ReplicaPinMiddleware(view)
+        factory = RequestFactory()
+        async_to_sync(middleware)(factory.post("/", REMOTE_ADDR="10.0.0.1"))
+        async_to_sync(middleware)(factory.get("/", REMOTE_ADDR="10.0.0.1"))
+        self.assertEqual(reads, ["replica1", "default"])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_middleware_is_skipped_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaPinMiddleware(lambda request: HttpResponse())
+
+
+class FastJSONTests(SimpleTestCase):
+    payload = {
+        "lazy": gettext_lazy("This field is required."),
+        "price": Decimal("12.50"),
+        "at": datetime(2026, 1, 2, 3, 4, 5, 600, tzinfo=dt_timezone.utc),
+        "local": datetime(2026, 7, 1, 9, 30, tzinfo=dt_timezone(timedelta(hours=1))),
+        "day": date(2026, 1, 2),
+        "duration": timedelta(minutes=1, seconds=30),
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "errors": [ErrorDetail("Not valid.", code="invalid")],
+        "text": "Zoë     \x00 😀",
+        "big": 2**70,
+        1: None,
+    }
+
+    def test_renders_the_same_bytes_as_drf(self):
+        for data in [self.payload, [], {"nested": [self.payload]}, "text", None]:
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        indented = "application/json; indent=4"
+        self.assertEqual(
+            FastJSONRenderer().render(self.payload, indented),
+            JSONRenderer().render(self.payload, indented),
+        )
+
+    def test_round_trip(self):
+        content = FastJSONRenderer().render(self.payload)
+        parsed = FastJSONParser().parse(io.BytesIO(content))
+        self.assertEqual(parsed, JSONParser().parse(io.BytesIO(content)))
+        self.assertEqual(parsed["at"], "2026-01-02T03:04:05.000600Z")
+        self.assertEqual(parsed["price"], 12.5)
+        self.assertEqual(parsed["big"], 2**70)
+
+    def test_parse_errors_match_drf(self):
+        for body in [b"", b"{", b'{"a": NaN}', b"\xff"]:
+            with self.assertRaises(ParseError) as fast:
+                FastJSONParser().parse(io.BytesIO(body))
+            with self.assertRaises(ParseError) as drf:
+                JSONParser().parse(io.BytesIO(body))
+            self.assertEqual(str(fast.exception.detail), str(drf.exception.detail))
+
+    def test_falls_back_without_orjson(self):
+        with mock.patch.object(renderers, "orjson", None):
+            content = FastJSONRenderer().render(self.payload)
+            self.assertEqual(content, JSONRenderer().render(self.payload))
+            self.assertEqual(FastJSONParser().parse(io.BytesIO(b'{"a": [1]}')), {"a": [1]})
+
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=3)
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        NewsletterSubscriber.objects.bulk_create(
+            NewsletterSubscriber(email=f"reader{n}@apex.test") for n in range(7)
+        )
+
+    def test_small_results_are_counted_exactly(self):
+        paginator = EstimatedCountPaginator(NewsletterSubscriber.objects.filter(pk__lte=2), 2)
+        self.assertEqual(str(paginator.count), "2")
+        self.assertFalse(paginator.estimated)
+
+    def test_a_whole_table_is_estimated_from_its_highest_id(self):
+        NewsletterSubscriber.objects.filter(email="reader0@apex.test").delete()
+        queryset = NewsletterSubscriber.objects.order_by("-pk")
+        highest = queryset.first().pk
+        self.assertEqual(EstimatedCountPaginator(queryset, 2).count, highest)
+
+    def test_a_large_filtered_result_is_a_lower_bound(self):
+        queryset = NewsletterSubscriber.objects.filter(email__startswith="reader").order_by("pk")
+        paginator = EstimatedCountPaginator(queryset, 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(str(paginator.count), "3+")
+        self.assertEqual(paginator.num_pages, 2)
+        # Pages past the estimate are served
+        page = paginator.page(4)
+        self.assertEqual([subscriber.email for subscriber in page], ["reader6@apex.test"])
+        self.assertEqual(list(paginator.page(5)), [])
+
+    def test_changelist_shows_the_lower_bound(self):
+        admin = User.objects.create_superuser("admin@apex.test", "Ad", "Min", "admin-pass-1")
+        self.client.force_login(admin)
+        url = reverse("admin:apex_gym_newslettersubscriber_changelist")
+        response = self.client.get(url, {"q": "reader"})
+        self.assertEqual(response.context["cl"].result_count, 4)
+        self.assertContains(response, "3+")
+        self.assertNotContains(response, "4 newsletter subscribers")
+
+
+class QueryBudgetTests(TestCase):
+    def test_warns_only_over_budget(self):
+        with self.assertNoLogs("apex.query_budget"):
+            with query_budget(2, "two reads") as counter:
+                User.objects.exists()
+                User.objects.exists()
+        self.assertEqual(counter.count, 2)
+
+        with self.assertLogs("apex.query_budget", "WARNING") as logs:
+            with query_budget(1, "three reads"):
+                User.objects.exists()
+                with connection.cursor() as cursor:
+                    cursor.execute("SAVEPOINT budget_test")
+                    cursor.execute("RELEASE SAVEPOINT budget_test")
+                User.objects.exists()
+                User.objects.exists()
+        self.assertEqual(
+            logs.output, ["WARNING:apex.query_budget:three reads ran 3 queries, budget is 1"]
+        )
+
+
+# The API-only profile in a process of its own, its apps can't be swapped in here
+API_PROFILE_CHECK = """
+import json, sys
+import django
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+django.setup()
+setup_test_environment()
+client = Client()
+subscribe = client.post("/api/subscribe/", {}, content_type="application/json")
+print(json.dumps({
+    "subscribe": [subscribe.status_code, subscribe["Content-Type"], subscribe.json()],
+    "admin": client.get("/admin/").status_code,
+    "loaded": [name for name in ["unfold", "apex_gym.admin", "django.contrib.sessions.models"]
+               if name in sys.modules],
+}))
+"""
+
+
+class APIProfileTests(SimpleTestCase):
+    def test_serves_the_api_without_the_admin(self):
+        directory = tempfile.mkdtemp(prefix="apex-profile-")
+        self.addCleanup(shutil.rmtree, directory)
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "apex.settings_api",
+            "CACHE_LOCATION": os.path.join(directory, "cache.sqlite3"),
+        }
+        output = subprocess.run(
+            [sys.executable, "-c", API_PROFILE_CHECK],
+            cwd=settings.BASE_DIR, env=env, check=True, capture_output=True, text=True,
+            timeout=60,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        self.assertEqual(
+            result["subscribe"],
+            [400, "application/json", {"error": "Email field is required."}],
+        )
+        self.assertEqual(result["admin"], 404)
+        self.assertEqual(result["loaded"], [])
+
+
+class WarmUpTests(SimpleTestCase):
+    def steps(self, *side_effects):
+        steps = [
+            mock.Mock(__name__=f"step_{n}", side_effect=effect)
+            for n, effect in enumerate(side_effects)
+        ]
+        patcher = mock.patch.object(boot, "STEPS", steps)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return steps
+
+    @mock.patch.object(boot, "connections")
+    @mock.patch.object(boot, "gc")
+    def test_a_failing_step_does_not_stop_the_boot(self, gc, connections):
+        steps = self.steps(RuntimeError("no database"), None)
+        with self.assertLogs("apex.boot", "WARNING") as logs:
+            boot.warm_up()
+        self.assertIn("Boot warm-up step step_0 failed", logs.output[0])
+        for step in steps:
+            step.assert_called_once_with()
+        # The master hands no connections to its workers, and freezes what it warmed
+        connections.close_all.assert_called_once_with()
+        gc.freeze.assert_called_once_with()
+
+    @override_settings(BOOT_WARMUP=False)
+    @mock.patch.object(boot, "gc")
+    def test_disabled(self, gc):
+        [step] = self.steps(None)
+        boot.warm_up()
+        step.assert_not_called()
+        gc.freeze.assert_not_called()
+
+    def test_steps_run_against_this_project(self):
+        boot.warm_urls_and_serializers()
+        boot.warm_auth()
+        boot.warm_translations()
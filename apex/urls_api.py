@@ -0,0 +1,22 @@
+"""
+URL configuration of the API endpoints, without the admin.
+
+apex/urls.py adds the admin on top. apex/settings_api.py routes here directly,
+so API-only workers never build the admin site.
+"""
+
+from django.urls import path, include
+from apex.metrics import metrics_view
+from rest_framework_simplejwt.views import (
+    TokenObtainPairView,
+    TokenRefreshView,
+)
+
+
+urlpatterns = [
+    path("api/auth/", include("accounts.urls")),
+    path("api/", include("apex_gym.urls")),
+    path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("metrics", metrics_view, name="metrics"),
+]
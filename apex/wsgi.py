@@ -11,6 +11,9 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from apex.boot import warm_up
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'apex.settings')
 
 application = get_wsgi_application()
+warm_up()
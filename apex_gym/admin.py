@@ -1,48 +1,66 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ERROR_FLAG, IGNORED_PARAMS, PAGE_VAR, SEARCH_VAR
 from unfold.admin import ModelAdmin
-from .models import Membership, NewsletterSubscriber
-import csv
-from django.http import HttpResponse
-from django.core.mail import send_mass_mail
+from .models import Membership, NewsletterSubscriber, NewsletterCampaign
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from .utils import stream_csv, gzip_stream
+from apex.admin_performance import FastChangeListMixin
+from accounts.search import MemberSearchAdminMixin
 
 @admin.register(Membership)
-class MembershipAdmin(ModelAdmin):
+class MembershipAdmin(MemberSearchAdminMixin, FastChangeListMixin, ModelAdmin):
     list_display = ("user", "membership_type", "join_date", "is_active")
+    list_select_related = ("user",)
+    member_search_field = "user"
     list_filter = ("membership_type", "is_active", "join_date")
     search_fields = ("user__email", "user__first_name", "user__last_name")
     autocomplete_fields = ("user",)
     readonly_fields = ("join_date",)
 
 @admin.register(NewsletterSubscriber)
-class NewsletterSubscriberAdmin(ModelAdmin):
+class NewsletterSubscriberAdmin(FastChangeListMixin, ModelAdmin):
     list_display = ("email", "subscribed_at", "is_active")
     list_filter = ("is_active", "subscribed_at")
     search_fields = ("email",)
     readonly_fields = ("subscribed_at",)
-    actions = ["send_newsletter", "unsubscribe_selected", "export_emails"]
+    actions = ["send_newsletter", "unsubscribe_selected", "export_emails", "export_emails_gzip"]
 
     def send_newsletter(self, request, queryset):
-        # Example mass email - customize as needed
+        # Example newsletter - customize as needed
         subject = "💪 Your Gym Weekly Newsletter"
         message = (
             "Hey Champ,\n\nHere’s what’s new this week at the gym: \n"
             "- New classes\n- Workout tips\n- Nutrition guide\n\nStay strong!"
         )
-        from_email = "no-reply@gymfreak.com"
 
-        emails = [subscriber.email for subscriber in queryset if subscriber.is_active]
-
-        if not emails:
+        active = queryset.filter(is_active=True)
+        if not active.exists():
             self.message_user(request, "No active emails selected.", level="warning")
             return
 
-        messages = [(subject, message, from_email, [email]) for email in emails]
-
-        try:
-            send_mass_mail(messages, fail_silently=False)
-            self.message_user(request, f"Newsletter sent to {len(emails)} subscribers.")
-        except Exception as e:
-            self.message_user(request, f"Failed to send: {str(e)}", level="error")
+        campaign = NewsletterCampaign(subject=subject, message=message)
+        if request.POST.get("select_across") == "1":
+            # Every row matching the changelist's search and filters: saved as the
+            # criteria, send_newsletters streams the matching rows in chunks
+            campaign.subscriber_filter = {
+                "lookups": {
+                    key: request.GET.getlist(key)
+                    for key in request.GET
+                    if key not in (*IGNORED_PARAMS, PAGE_VAR, ERROR_FLAG)
+                },
+                "search": request.GET.get(SEARCH_VAR, ""),
+            }
+        else:
+            # The ticked rows, one changelist page at most
+            campaign.subscriber_ids = list(active.values_list("pk", flat=True))
+        campaign.save()
+        campaign.queue()
+        self.message_user(
+            request,
+            f"Newsletter queued for {campaign.total_recipients} subscribers. "
+            "Follow its progress under Newsletter campaigns.",
+        )
 
     send_newsletter.short_description = "📧 Send weekly newsletter"
 
@@ -52,16 +70,60 @@ class NewsletterSubscriberAdmin(ModelAdmin):
     
     unsubscribe_selected.short_description = "❌ Mark as unsubscribed"
 
-    def export_emails(self, request, queryset):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="newsletter_subscribers.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(["Email", "Subscribed At", "Is Active"])
-
-        for sub in queryset:
-            writer.writerow([sub.email, sub.subscribed_at, sub.is_active])
+    def export_emails(self, request, queryset, compress=False):
+        # Only the exported columns, fetched in server-side chunks
+        rows = (
+            queryset.order_by()
+            .values_list("email", "subscribed_at", "is_active")
+            .iterator(chunk_size=settings.CSV_EXPORT_CHUNK_SIZE)
+        )
+        content = stream_csv(["Email", "Subscribed At", "Is Active"], rows)
+        filename = "newsletter_subscribers.csv"
 
+        if compress:
+            content = gzip_stream(content)
+            filename += ".gz"
+            response = StreamingHttpResponse(content, content_type="application/gzip")
+        else:
+            response = StreamingHttpResponse(content, content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
         return response
 
     export_emails.short_description = "📥 Export selected to CSV"
+
+    def export_emails_gzip(self, request, queryset):
+        return self.export_emails(request, queryset, compress=True)
+
+    export_emails_gzip.short_description = "📥 Export selected to CSV (gzip)"
+
+
+@admin.register(NewsletterCampaign)
+class NewsletterCampaignAdmin(ModelAdmin):
+    list_display = ("subject", "status", "progress", "created_at", "finished_at")
+    list_filter = ("status",)
+    search_fields = ("subject",)
+    fields = ("subject", "message", "from_email", "chunk_size", "status", "progress",
+              "last_error", "created_at", "started_at", "finished_at")
+    readonly_fields = ("status", "progress", "last_error", "created_at", "started_at", "finished_at")
+    actions = ["queue_campaigns"]
+
+    def progress(self, obj):
+        if not obj.total_recipients:
+            return f"{obj.sent_count} sent"
+        percent = obj.sent_count * 100 // obj.total_recipients
+        return f"{obj.sent_count}/{obj.total_recipients} ({percent}%)"
+
+    progress.short_description = "Progress"
+
+    def queue_campaigns(self, request, queryset):
+        # Drafts start from the beginning, failed campaigns resume from their cursor
+        campaigns = queryset.filter(
+            status__in=[NewsletterCampaign.STATUS_DRAFT, NewsletterCampaign.STATUS_FAILED]
+        )
+        count = 0
+        for campaign in campaigns:
+            campaign.queue()
+            count += 1
+        self.message_user(request, f"{count} campaign(s) queued for sending.")
+
+    queue_campaigns.short_description = "📧 Send / resume selected campaigns"
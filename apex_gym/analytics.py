@@ -0,0 +1,137 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Membership, MembershipDailyStats
+
+PLANS = [value for value, _ in Membership.MEMBER_CHOICES]
+
+
+# The rollup bucket a membership counts towards. Days are in TIME_ZONE, not the
+# timezone of whoever happens to be making the request.
+def rollup_key(join_date, membership_type, is_active):
+    if settings.USE_TZ:
+        day = timezone.localdate(join_date, timezone.get_default_timezone())
+    else:
+        day = join_date.date()
+    return day, membership_type, bool(is_active)
+
+
+def membership_key(membership):
+    return rollup_key(membership.join_date, membership.membership_type, membership.is_active)
+
+
+# Add each delta to its bucket with one INSERT ... ON CONFLICT DO UPDATE per
+# bucket, sent as a single executemany. Concurrent writers only ever add to the
+# count, so there is no read-modify-write race.
+def apply_deltas(deltas):
+    rows = [(key, delta) for key, delta in deltas.items() if delta]
+    if not rows:
+        return
+
+    using = router.db_for_write(MembershipDailyStats)
+    connection = connections[using]
+    table = connection.ops.quote_name(MembershipDailyStats._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} (day, membership_type, is_active, members) "
+            "VALUES (%s, %s, %s, %s) "
+            "ON CONFLICT (day, membership_type, is_active) "
+            f"DO UPDATE SET members = {table}.members + excluded.members",
+            [
+                (connection.ops.adapt_datefield_value(day), membership_type, is_active, delta)
+                for (day, membership_type, is_active), delta in rows
+            ],
+        )
+
+
+# Rollup buckets of the current memberships of these users, in one query
+def current_keys(user_ids):
+    rows = Membership.objects.filter(user_id__in=user_ids).values_list(
+        "user_id", "join_date", "membership_type", "is_active"
+    )
+    return {user_id: rollup_key(*values) for user_id, *values in rows}
+
+
+# bulk_create sends no signals: count memberships that were just upserted on the
+# user column. `previous` holds the buckets of the rows that already existed,
+# whose join_date and is_active the upsert left untouched.
+def record_upserts(memberships, previous):
+    deltas = Counter()
+    for membership in memberships:
+        old = previous.get(membership.user_id)
+        if old is None:
+            new = membership_key(membership)
+        else:
+            deltas[old] -= 1
+            new = (old[0], membership.membership_type, old[2])
+        deltas[new] += 1
+        membership._rollup_key = new
+    apply_deltas(deltas)
+
+
+# Recount every bucket from the Membership table, for data written without
+# signals (queryset.update(), raw SQL) or a rollup that has drifted
+def rebuild():
+    buckets = (
+        Membership.objects.annotate(
+            day=TruncDate("join_date", tzinfo=timezone.get_default_timezone())
+        )
+        .values("day", "membership_type", "is_active")
+        .annotate(members=Count("pk"))
+        .order_by()
+    )
+    with transaction.atomic(using=router.db_for_write(MembershipDailyStats)):
+        MembershipDailyStats.objects.all().delete()
+        stats = MembershipDailyStats.objects.bulk_create(
+            MembershipDailyStats(**bucket) for bucket in buckets
+        )
+    return len(stats)
+
+
+# Plan totals over the whole rollup and daily joins for the last `days` days.
+# Reads O(days x plans) rollup rows whatever the number of members.
+def membership_summary(days):
+    today = timezone.localdate(timezone=timezone.get_default_timezone())
+    since = today - timedelta(days=days - 1)
+
+    totals = {plan: {"active": 0, "inactive": 0} for plan in PLANS}
+    for row in MembershipDailyStats.objects.values("membership_type", "is_active").annotate(
+        members=Sum("members")
+    ).order_by():
+        state = "active" if row["is_active"] else "inactive"
+        totals.setdefault(row["membership_type"], {"active": 0, "inactive": 0})[state] = row["members"]
+
+    joins = {since + timedelta(days=n): Counter() for n in range(days)}
+    for row in (
+        MembershipDailyStats.objects.filter(day__gte=since, day__lte=today)
+        .values("day", "membership_type")
+        .annotate(members=Sum("members"))
+        .order_by()
+    ):
+        joins[row["day"]][row["membership_type"]] = row["members"]
+
+    return {
+        "generated_at": timezone.now(),
+        "totals": totals,
+        "active": sum(counts["active"] for counts in totals.values()),
+        "inactive": sum(counts["inactive"] for counts in totals.values()),
+        "daily_joins": [
+            {"date": day, "total": sum(counts.values()), **{plan: counts[plan] for plan in PLANS}}
+            for day, counts in joins.items()
+        ],
+    }
+
+
+def cached_membership_summary(days):
+    return cache.get_or_set(
+        f"membership_analytics:{days}",
+        lambda: membership_summary(days),
+        settings.MEMBERSHIP_ANALYTICS_CACHE_SECONDS,
+    )
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ApexGymConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apex_gym'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,225 @@
+import csv
+import json
+import time
+from collections import defaultdict
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from accounts.authentication import invalidate_cached_users
+from apex_gym.analytics import current_keys, record_upserts
+from apex_gym.models import Membership
+from apex_gym.utils import chunked
+
+User = get_user_model()
+MEMBERSHIP_TYPES = {value for value, _ in Membership.MEMBER_CHOICES}
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+# A row's value as stripped text: "" when missing, JSON numbers and booleans as text
+def field(row, name):
+    value = row.get(name)
+    return "" if value is None else str(value).strip()
+
+
+class Command(BaseCommand):
+    help = (
+        "Import members from a CSV or JSONL file. Expected fields: email, first_name, "
+        "last_name and optionally password (already hashed), membership_type, is_active."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV (with a header row) or JSONL file.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="File format, guessed from the extension when omitted.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Rows read and committed per transaction.",
+        )
+        parser.add_argument(
+            "--user-batch-size",
+            type=int,
+            default=1000,
+            help="Users per INSERT statement.",
+        )
+        parser.add_argument(
+            "--membership-batch-size",
+            type=int,
+            default=1000,
+            help="Memberships per INSERT statement.",
+        )
+        parser.add_argument(
+            "--on-conflict",
+            choices=["skip", "update", "error"],
+            default="skip",
+            help="What to do with emails that already exist.",
+        )
+        parser.add_argument(
+            "--default-membership",
+            choices=sorted(MEMBERSHIP_TYPES),
+            help="Membership created for rows without a membership_type.",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stats = dict.fromkeys(["created", "updated", "skipped", "invalid"], 0)
+        started = time.monotonic()
+
+        rows = self.read_rows(options["path"], options["format"])
+        for chunk in chunked(rows, options["chunk_size"]):
+            with transaction.atomic():
+                self.import_chunk(chunk)
+
+            elapsed = time.monotonic() - started
+            processed = sum(self.stats.values())
+            self.stdout.write(f"{processed} rows processed ({processed / elapsed:.0f} rows/s)")
+
+        elapsed = time.monotonic() - started
+        processed = sum(self.stats.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Imported in {:.1f}s ({:.0f} rows/s): {created} created, {updated} updated, "
+                "{skipped} skipped, {invalid} invalid.".format(
+                    elapsed, processed / elapsed if elapsed else processed, **self.stats
+                )
+            )
+        )
+
+    def read_rows(self, path, file_format):
+        file_format = file_format or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        with open(path, newline="", encoding="utf-8") as fh:
+            if file_format == "csv":
+                for line_number, row in enumerate(csv.DictReader(fh), start=2):
+                    yield line_number, row
+            else:
+                for line_number, line in enumerate(fh, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        row = json.loads(line)
+                    except ValueError as exc:
+                        self.invalid(line_number, f"invalid JSON ({exc})")
+                        continue
+                    if not isinstance(row, dict):
+                        self.invalid(line_number, "not a JSON object")
+                        continue
+                    yield line_number, row
+
+    def clean_row(self, line_number, row):
+        email = User.objects.normalize_email(field(row, "email"))
+        first_name = field(row, "first_name")
+        last_name = field(row, "last_name")
+        try:
+            validate_email(email)
+        except ValidationError:
+            return self.invalid(line_number, f"invalid email {email!r}")
+        if not first_name or not last_name:
+            return self.invalid(line_number, "first_name and last_name are required")
+
+        # Optional fields the row sets; --on-conflict update leaves the others alone
+        provided = []
+
+        # Passwords must arrive hashed; hashing 200k passwords here would take hours
+        password = field(row, "password") or None
+        if password:
+            try:
+                identify_hasher(password)
+            except ValueError:
+                return self.invalid(line_number, "password is not a recognised hash")
+            provided.append("password")
+        else:
+            password = make_password(None)  # unusable, member resets it by email
+
+        membership_type = field(row, "membership_type").lower() or self.options[
+            "default_membership"
+        ]
+        if membership_type and membership_type not in MEMBERSHIP_TYPES:
+            return self.invalid(line_number, f"unknown membership_type {membership_type!r}")
+
+        # New members are active unless the row says otherwise
+        active_value = field(row, "is_active").lower()
+        is_active = True
+        if active_value:
+            is_active = active_value in TRUE_VALUES
+            provided.append("is_active")
+        user = User(
+            email=email,
+            first_name=first_name,
+            last_name=last_name,
+            password=password,
+            is_active=is_active,
+            is_verified=True,
+        )
+        return user, membership_type, tuple(provided)
+
+    def invalid(self, line_number, reason):
+        self.stats["invalid"] += 1
+        self.stderr.write(f"Line {line_number}: {reason}")
+        return None
+
+    def import_chunk(self, chunk):
+        # Clean and de-duplicate in memory, the last row for an email wins
+        members = {}
+        for line_number, row in chunk:
+            cleaned = self.clean_row(line_number, row)
+            if cleaned is not None:
+                if cleaned[0].email in members:
+                    self.stats["skipped"] += 1
+                members[cleaned[0].email] = cleaned
+
+        existing = dict(
+            User.objects.filter(email__in=list(members)).values_list("email", "pk")
+        )
+        if existing and self.options["on_conflict"] == "error":
+            raise CommandError(f"Email already exists: {next(iter(existing))}")
+
+        if self.options["on_conflict"] == "update":
+            # Upserts for new and existing users; SQLite returns every row's pk. A row
+            # without a password or is_active keeps the existing member's, so one
+            # statement per combination of the optional fields present.
+            users_by_fields = defaultdict(list)
+            for user, _, provided in members.values():
+                users_by_fields[provided].append(user)
+            for provided, users in users_by_fields.items():
+                User.objects.bulk_create(
+                    users,
+                    batch_size=self.options["user_batch_size"],
+                    update_conflicts=True,
+                    unique_fields=["email"],
+                    update_fields=["first_name", "last_name", *provided],
+                )
+            # Upserts send no post_save, drop the members' cached copies ourselves
+            transaction.on_commit(partial(invalidate_cached_users, list(existing.values())))
+            self.stats["updated"] += len(existing)
+            self.stats["created"] += len(members) - len(existing)
+        else:
+            users = [user for email, (user, _, _) in members.items() if email not in existing]
+            User.objects.bulk_create(users, batch_size=self.options["user_batch_size"])
+            self.stats["skipped"] += len(existing)
+            self.stats["created"] += len(users)
+
+        # Existing members may already have a membership: upsert on the user column
+        memberships = [
+            Membership(user=user, membership_type=membership_type)
+            for user, membership_type, _ in members.values()
+            if membership_type and user.pk is not None
+        ]
+        previous = current_keys([membership.user_id for membership in memberships])
+        Membership.objects.bulk_create(
+            memberships,
+            batch_size=self.options["membership_batch_size"],
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["membership_type"],
+        )
+        record_upserts(memberships, previous)
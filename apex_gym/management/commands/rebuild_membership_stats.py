@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apex_gym.analytics import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the membership analytics rollup from the Membership table. Run after "
+        "changing memberships with queryset.update() or raw SQL."
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        buckets = rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {buckets} membership stats buckets in {time.monotonic() - started:.1f}s."
+            )
+        )
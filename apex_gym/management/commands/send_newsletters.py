@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apex_gym.utils import claim_campaign, send_campaign
+
+
+class Command(BaseCommand):
+    help = "Send queued newsletter campaigns in chunks, resuming interrupted ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.NEWSLETTER_POLL_INTERVAL,
+            help="Seconds to sleep when no campaign is queued.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Send every queued campaign once and exit instead of polling forever.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            campaign = claim_campaign()
+
+            if campaign is None:
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+                continue
+
+            self.stdout.write(f"Sending campaign '{campaign.subject}'")
+            try:
+                send_campaign(campaign, on_chunk=self.report_progress)
+            except Exception as e:
+                self.stderr.write(f"Campaign '{campaign.subject}' failed: {e}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Campaign '{campaign.subject}' done."))
+
+    def report_progress(self, campaign):
+        self.stdout.write(f"  {campaign.sent_count}/{campaign.total_recipients} sent")
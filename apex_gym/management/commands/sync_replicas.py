@@ -0,0 +1,44 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database onto every read replica in DATABASE_REPLICAS."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep copying every N seconds instead of copying once.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured, set DATABASE_REPLICAS.")
+        primary = settings.DATABASES["default"]
+        if primary["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("Only SQLite primaries can be copied, use the database's own replication.")
+
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                started = time.monotonic()
+                self.copy(str(primary["NAME"]), str(settings.DATABASES[alias]["NAME"]))
+                self.stdout.write(
+                    f"Copied primary to {alias} in {time.monotonic() - started:.2f}s"
+                )
+
+            if options["interval"] is None:
+                break
+            time.sleep(options["interval"])
+
+    def copy(self, source_path, target_path):
+        # The online backup API copies a consistent snapshot while the primary keeps
+        # taking writes, and replaces the replica in one transaction so readers of the
+        # replica never see a half-copied file
+        with closing(sqlite3.connect(source_path)) as source:
+            with closing(sqlite3.connect(target_path, timeout=30)) as target:
+                source.backup(target)
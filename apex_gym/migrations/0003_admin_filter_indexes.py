@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apex_gym', '0002_newsletter_campaign'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['membership_type', 'is_active'], name='membership_type_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['is_active', 'join_date'], name='membership_active_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['join_date'], name='membership_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newslettersubscriber',
+            index=models.Index(fields=['is_active', 'subscribed_at'], name='subscriber_active_since_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newslettersubscriber',
+            index=models.Index(fields=['subscribed_at'], name='subscriber_since_idx'),
+        ),
+    ]
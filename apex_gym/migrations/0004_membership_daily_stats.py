@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:02
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+# Count the memberships that exist before the rollup starts tracking changes
+def populate_stats(apps, schema_editor):
+    Membership = apps.get_model("apex_gym", "Membership")
+    MembershipDailyStats = apps.get_model("apex_gym", "MembershipDailyStats")
+    buckets = (
+        Membership.objects.using(schema_editor.connection.alias)
+        .annotate(day=TruncDate("join_date", tzinfo=timezone.get_default_timezone()))
+        .values("day", "membership_type", "is_active")
+        .annotate(members=Count("pk"))
+        .order_by()
+    )
+    MembershipDailyStats.objects.using(schema_editor.connection.alias).bulk_create(
+        MembershipDailyStats(**bucket) for bucket in buckets
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apex_gym', '0003_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MembershipDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('membership_type', models.CharField(choices=[('basic', 'Basic'), ('premium', 'Premium'), ('vip', 'VIP')], max_length=20)),
+                ('is_active', models.BooleanField()),
+                ('members', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'membership daily stats',
+                'constraints': [models.UniqueConstraint(fields=('day', 'membership_type', 'is_active'), name='membership_stats_bucket')],
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
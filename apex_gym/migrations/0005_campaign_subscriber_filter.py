@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apex_gym', '0004_membership_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newslettercampaign',
+            name='subscriber_filter',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apex_gym', '0005_campaign_subscriber_filter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='membership',
+            name='membership_type_active_idx',
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['membership_type'], name='membership_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['membership_type'], name='membership_type_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['membership_type'], name='membership_type_inactive_idx'),
+        ),
+    ]
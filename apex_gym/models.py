@@ -1,5 +1,10 @@
-from django.db import models
+import json
+
+from django.contrib.admin.utils import build_q_object_from_lookup_parameters, prepare_lookup_value
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
 from django.conf import settings
+from django.utils.text import smart_split, unescape_string_literal
 
 class Membership(models.Model):
     MEMBER_CHOICES = [
@@ -13,15 +18,133 @@ class Membership(models.Model):
     join_date = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        # Back the admin list_filter options. Each entry ends in the id, so the
+        # matching rows come out in the changelist's ORDER BY -id. On SQLite Django
+        # writes is_active=True as a bare "is_active" term, which a (membership_type,
+        # is_active) index can't match, hence one partial index per is_active value.
+        indexes = [
+            models.Index(fields=["membership_type"], name="membership_type_idx"),
+            models.Index(
+                fields=["membership_type"],
+                condition=models.Q(is_active=True),
+                name="membership_type_active_idx",
+            ),
+            models.Index(
+                fields=["membership_type"],
+                condition=models.Q(is_active=False),
+                name="membership_type_inactive_idx",
+            ),
+            models.Index(fields=["is_active", "join_date"], name="membership_active_joined_idx"),
+            models.Index(fields=["join_date"], name="membership_joined_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.membership_type.capitalize()}"
 
 
+# Rollup of Membership: how many members joined on `day` and are now on this plan
+# and active state. Kept up to date by apex_gym/analytics.py, rebuilt from
+# scratch by `manage.py rebuild_membership_stats`.
+class MembershipDailyStats(models.Model):
+    day = models.DateField()
+    membership_type = models.CharField(max_length=20, choices=Membership.MEMBER_CHOICES)
+    is_active = models.BooleanField()
+    members = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "membership daily stats"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "membership_type", "is_active"], name="membership_stats_bucket"
+            ),
+        ]
+
+    def __str__(self):
+        state = "active" if self.is_active else "inactive"
+        return f"{self.day} {self.membership_type} {state}: {self.members}"
+
 
 class NewsletterSubscriber(models.Model):
     email = models.EmailField(unique=True)
     subscribed_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_active", "subscribed_at"], name="subscriber_active_since_idx"),
+            models.Index(fields=["subscribed_at"], name="subscriber_since_idx"),
+        ]
+
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+
+# A newsletter sent in chunks by `manage.py send_newsletters`, progress is saved per chunk
+class NewsletterCampaign(models.Model):
+    STATUS_DRAFT = "draft"
+    STATUS_QUEUED = "queued"
+    STATUS_SENDING = "sending"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_DRAFT, "Draft"),
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_SENDING, "Sending"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=255, default="no-reply@gymfreak.com")
+    # Explicitly selected subscribers, empty means every active subscriber
+    subscriber_ids = models.JSONField(null=True, blank=True)
+    # Or the subscriber changelist's filters and search at "select all", e.g.
+    # {"lookups": {"subscribed_at__gte": ["2026-01-01"]}, "search": "@apex.test"}
+    subscriber_filter = models.JSONField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_DRAFT)
+    chunk_size = models.PositiveIntegerField(default=500)
+    # Resume point: the highest subscriber id already sent to
+    last_subscriber_id = models.BigIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    total_recipients = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
+
+    def recipients(self):
+        subscribers = NewsletterSubscriber.objects.filter(is_active=True)
+        if self.subscriber_filter is not None:
+            # Same lookups as the admin's list filters and search (search_fields = email)
+            lookups = self.subscriber_filter.get("lookups", {})
+            subscribers = subscribers.filter(
+                build_q_object_from_lookup_parameters(
+                    {key: prepare_lookup_value(key, values) for key, values in lookups.items()}
+                )
+            )
+            for bit in smart_split(self.subscriber_filter.get("search", "")):
+                if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                    bit = unescape_string_literal(bit)
+                subscribers = subscribers.filter(email__icontains=bit)
+        elif self.subscriber_ids:
+            ids = self.subscriber_ids
+            if connections[subscribers.db].vendor == "sqlite":
+                # One JSON parameter: a "select all" campaign can hold more ids
+                # than SQLite allows variables in a statement
+                ids = RawSQL("SELECT value FROM json_each(%s)", (json.dumps(ids),))
+            subscribers = subscribers.filter(pk__in=ids)
+        return subscribers
+
+    def queue(self):
+        self.total_recipients = self.recipients().filter(
+            pk__gt=self.last_subscriber_id
+        ).count() + self.sent_count
+        self.status = self.STATUS_QUEUED
+        self.last_error = ""
+        self.save(update_fields=["total_recipients", "status", "last_error"])
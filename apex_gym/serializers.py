@@ -1,6 +1,7 @@
 from .models import Membership, NewsletterSubscriber
 from rest_framework import serializers
-from django.utils import timezone
+from django.conf import settings
+from django.contrib.auth import get_user_model
 
 
 
@@ -18,6 +19,12 @@ class MembershipSerializer(serializers.ModelSerializer):
         user = self.context["request"].user
         return Membership.objects.create(user=user, **validated_data)
 
+    def update(self, instance, validated_data):
+        # Only the plan changes, join_date is kept
+        instance.membership_type = validated_data.get("membership_type", instance.membership_type)
+        instance.save(update_fields=["membership_type"])
+        return instance
+
 
 class NewsletterSubscriberSerializer(serializers.ModelSerializer):
     class Meta:
@@ -29,10 +36,20 @@ class NewsletterSubscriberSerializer(serializers.ModelSerializer):
         if NewsletterSubscriber.objects.filter(email=value).exists():
             raise serializers.ValidationError("This email is already subscribed.")
         return value
-    
-    def update(self, instance, validated_data):
-        instance.membership_type = validated_data.get("membership_type", instance.membership_type)
-        instance.join_date = timezone.now()  # reset date on change
-        instance.save()
-        return instance
 
+
+class NewsletterBulkSubscribeSerializer(serializers.Serializer):
+    emails = serializers.ListField(
+        child=serializers.CharField(max_length=254),
+        allow_empty=False,
+        max_length=settings.NEWSLETTER_BULK_SUBSCRIBE_MAX,
+    )
+
+
+# One front desk search hit: the member and their plan, if any
+class MemberSearchSerializer(serializers.ModelSerializer):
+    membership_type = serializers.CharField(source="membership.membership_type", read_only=True)
+
+    class Meta:
+        model = get_user_model()
+        fields = ["id", "email", "first_name", "last_name", "is_active", "membership_type"]
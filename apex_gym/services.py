@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from apex.query_budget import query_budget
+
+from .models import Membership, NewsletterSubscriber
+
+
+class AlreadyOnPlan(Exception):
+    pass
+
+
+# Join or switch plan in at most three queries: read the current row, then either
+# UPDATE just membership_type or INSERT it, then move the member's analytics
+# bucket (the post_save signal). A concurrent "join" that inserted the row first
+# makes the INSERT fail; its savepoint is rolled back and the request continues as
+# a plan switch on that row, so a double-tapped "join" never raises an
+# IntegrityError or counts the member twice.
+def join_or_update_membership(user, membership_type):
+    with query_budget(settings.QUERY_BUDGETS["join_membership"], "join_or_update_membership"):
+        with transaction.atomic():
+            membership = Membership.objects.filter(user=user).first()
+
+            if membership is None:
+                try:
+                    with transaction.atomic():
+                        membership = Membership.objects.create(
+                            user=user, membership_type=membership_type
+                        )
+                    return membership, True
+                except IntegrityError:
+                    membership = Membership.objects.get(user=user)
+
+            if membership.membership_type == membership_type:
+                raise AlreadyOnPlan(membership_type)
+            membership.membership_type = membership_type
+            # The post_save signal updates the analytics rollup
+            membership.save(update_fields=["membership_type"])
+            return membership, False
+
+
+# Subscribe a list of emails in a constant number of queries: one SELECT of the
+# known addresses, conflict-ignoring INSERTs for new ones and a single UPDATE to
+# reactivate unsubscribed ones. Returns {email: outcome} in request order.
+def bulk_subscribe(emails):
+    outcomes = {}
+    for raw in emails:
+        email = str(raw).strip().lower()
+        if email in outcomes:
+            continue
+        try:
+            validate_email(email)
+        except ValidationError:
+            outcomes[email] = "invalid"
+        else:
+            outcomes[email] = None
+
+    valid = [email for email, outcome in outcomes.items() if outcome is None]
+    with query_budget(settings.QUERY_BUDGETS["bulk_subscribe"], "bulk_subscribe"):
+        existing = dict(
+            NewsletterSubscriber.objects.filter(email__in=valid).values_list(
+                "email", "is_active"
+            )
+        )
+        new = [email for email in valid if email not in existing]
+        inactive = [email for email, is_active in existing.items() if not is_active]
+
+        NewsletterSubscriber.objects.bulk_create(
+            [NewsletterSubscriber(email=email) for email in new], ignore_conflicts=True
+        )
+        if inactive:
+            NewsletterSubscriber.objects.filter(email__in=inactive).update(is_active=True)
+
+    for email in new:
+        outcomes[email] = "subscribed"
+    for email, is_active in existing.items():
+        outcomes[email] = "already_subscribed" if is_active else "reactivated"
+    return outcomes
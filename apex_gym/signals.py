@@ -0,0 +1,53 @@
+from collections import Counter
+
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .analytics import apply_deltas, membership_key, rollup_key
+from .models import Membership
+
+TRACKED_FIELDS = ("join_date", "membership_type", "is_active")
+
+
+# Remember which rollup bucket a loaded membership counts towards. Deferred
+# fields are not loaded here, pre_save fetches the bucket for those instead.
+@receiver(post_init, sender=Membership)
+def remember_rollup_key(sender, instance, **kwargs):
+    if instance.pk is not None and all(name in instance.__dict__ for name in TRACKED_FIELDS):
+        instance._rollup_key = membership_key(instance)
+    else:
+        instance._rollup_key = None
+
+
+@receiver(pre_save, sender=Membership)
+def load_rollup_key(sender, instance, using, **kwargs):
+    if instance._rollup_key is None and not instance._state.adding:
+        previous = (
+            Membership.objects.using(using)
+            .filter(pk=instance.pk)
+            .values_list(*TRACKED_FIELDS)
+            .first()
+        )
+        if previous is not None:
+            instance._rollup_key = rollup_key(*previous)
+
+
+# Move the member to its new bucket after each save. queryset.update() and
+# bulk_create() send no signals, see analytics.record_upserts.
+@receiver(post_save, sender=Membership)
+def update_rollup_on_save(sender, instance, created, **kwargs):
+    old, new = instance._rollup_key, membership_key(instance)
+    if old == new and not created:
+        return
+
+    deltas = Counter({new: 1})
+    if old is not None and not created:
+        deltas[old] -= 1
+    apply_deltas(deltas)
+    instance._rollup_key = new
+
+
+@receiver(post_delete, sender=Membership)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    key = instance._rollup_key or membership_key(instance)
+    apply_deltas(Counter({key: -1}))
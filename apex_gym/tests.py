@@ -1,3 +1,419 @@
-from django.test import TestCase
+import csv
+import gzip
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+from urllib.parse import urlencode
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.authentication import user_cache_key
+from apex.query_budget import TRANSACTION_STATEMENTS
+
+from .models import Membership, MembershipDailyStats, NewsletterCampaign, NewsletterSubscriber
+from .services import AlreadyOnPlan, bulk_subscribe, join_or_update_membership
+from .utils import gzip_stream, send_campaign, stream_csv
+
+User = get_user_model()
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+# assertNumQueries without the BEGIN/SAVEPOINT/RELEASE statements, which the
+# query budgets don't count either
+class QueryCountMixin:
+    @contextmanager
+    def assertQueries(self, expected):
+        with CaptureQueriesContext(connection) as context:
+            yield
+        queries = [
+            query["sql"] for query in context.captured_queries
+            if not query["sql"].lstrip().upper().startswith(TRANSACTION_STATEMENTS)
+        ]
+        self.assertEqual(len(queries), expected, "\n".join(queries))
+
+
+class ImportMembersTests(TestCase):
+    def import_file(self, content, suffix=".csv", **options):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(content)
+        stdout = StringIO()
+        call_command("import_members", path, stdout=stdout, stderr=StringIO(), **options)
+        return stdout.getvalue()
+
+    def test_creates_members_and_memberships(self):
+        self.import_file(
+            "email,first_name,last_name,membership_type\n"
+            "ada@apex.test,Ada,Lovelace,vip\n"
+            "bad-email,No,One,basic\n"
+        )
+        user = User.objects.get(email="ada@apex.test")
+        self.assertTrue(user.is_active)
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(user.membership.membership_type, "vip")
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_skip_leaves_existing_members_alone(self):
+        User.objects.create_user("ada@apex.test", "Ada", "Lovelace", "secret-pass-1")
+        self.import_file("email,first_name,last_name\nada@apex.test,Augusta,King\n")
+        self.assertEqual(User.objects.get(email="ada@apex.test").first_name, "Ada")
+
+    def test_update_keeps_password_and_status_the_file_does_not_set(self):
+        user = User.objects.create_user("ada@apex.test", "Ada", "Lovelace", "secret-pass-1")
+        user.is_active = False
+        user.save(update_fields=["is_active"])
+
+        self.import_file(
+            "email,first_name,last_name,membership_type\nada@apex.test,Augusta,King,basic\n",
+            on_conflict="update",
+        )
+        user.refresh_from_db()
+        self.assertEqual(user.first_name, "Augusta")
+        self.assertTrue(user.check_password("secret-pass-1"))
+        self.assertFalse(user.is_active)
+        self.assertEqual(Membership.objects.get(user=user).membership_type, "basic")
+
+    def test_update_sets_password_and_status_the_file_provides(self):
+        user = User.objects.create_user("ada@apex.test", "Ada", "Lovelace", "secret-pass-1")
+        other = User.objects.create_user(
+            "bob@apex.test", "Bob", "Smith", "secret-pass-2", is_active=True
+        )
+        hashed = make_password("imported-pass-1")
+        self.import_file(
+            f'{{"email": "ada@apex.test", "first_name": "Ada", "last_name": "King", '
+            f'"password": "{hashed}", "is_active": false}}\n'
+            '{"email": "bob@apex.test", "first_name": "Bob", "last_name": "Smith"}\n',
+            suffix=".jsonl",
+            on_conflict="update",
+        )
+        user.refresh_from_db()
+        other.refresh_from_db()
+        self.assertTrue(user.check_password("imported-pass-1"))
+        self.assertFalse(user.is_active)
+        self.assertTrue(other.check_password("secret-pass-2"))
+        self.assertTrue(other.is_active)
+
+    def test_bad_jsonl_lines_are_counted_as_invalid(self):
+        output = self.import_file(
+            '{"email": "ada@apex.test", "first_name": "Ada", "last_name": "Lovelace"}\n'
+            '{"email": "broken@apex.test",\n'
+            '["not", "an", "object"]\n'
+            '42\n'
+            '{"email": 7, "first_name": "Bob", "last_name": "Smith"}\n'
+            '{"email": "eve@apex.test", "first_name": "Eve", "last_name": 1, "is_active": 0}\n',
+            suffix=".jsonl",
+            chunk_size=2,
+        )
+        self.assertIn("2 created, 0 updated, 0 skipped, 4 invalid", output)
+        self.assertFalse(User.objects.get(email="eve@apex.test").is_active)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_update_drops_cached_users_once_committed(self):
+        user = User.objects.create_user(
+            "ada@apex.test", "Ada", "Lovelace", "secret-pass-1", is_active=True
+        )
+        cache.set(user_cache_key(user.pk), user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_file(
+                '{"email": "ada@apex.test", "first_name": "Ada", "last_name": "King", '
+                '"is_active": false}\n',
+                suffix=".jsonl",
+                on_conflict="update",
+            )
+        self.assertIsNone(cache.get(user_cache_key(user.pk)))
+
+
+class MembershipChangelistIndexTests(TestCase):
+    def test_filtered_pages_are_read_in_id_order(self):
+        for filters in [
+            {"membership_type__exact": "vip"},
+            {"membership_type__exact": "vip", "is_active__exact": "1"},
+            {"membership_type__exact": "vip", "is_active__exact": "0"},
+        ]:
+            with self.subTest(filters):
+                plan = (
+                    Membership.objects.select_related("user")
+                    .filter(**filters)
+                    .order_by("-pk")[:100]
+                    .explain()
+                )
+                self.assertIn("USING INDEX membership_type_", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+
+class SendNewsletterActionTests(TestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser("admin@apex.test", "Ad", "Min", "admin-pass-1")
+        self.client.force_login(admin)
+        NewsletterSubscriber.objects.bulk_create(
+            NewsletterSubscriber(email=f"reader{n}@apex.test") for n in range(5)
+        )
+        NewsletterSubscriber.objects.create(email="match@apex.test")
+        NewsletterSubscriber.objects.create(email="match-gone@apex.test", is_active=False)
+
+    def send(self, query, selected, select_across):
+        url = reverse("admin:apex_gym_newslettersubscriber_changelist") + query
+        return self.client.post(url, {
+            "action": "send_newsletter",
+            "select_across": select_across,
+            "index": "0",
+            "_selected_action": [str(pk) for pk in selected],
+        })
+
+    def test_select_all_keeps_the_changelist_search(self):
+        match = NewsletterSubscriber.objects.get(email="match@apex.test")
+        self.send("?q=match", [match.pk], select_across="1")
+        campaign = NewsletterCampaign.objects.get()
+        # The criteria, not every matching id
+        self.assertIsNone(campaign.subscriber_ids)
+        self.assertEqual(campaign.subscriber_filter, {"lookups": {}, "search": "match"})
+        self.assertEqual(campaign.total_recipients, 1)
+        self.assertEqual(list(campaign.recipients()), [match])
+
+    def test_select_all_keeps_the_changelist_filters(self):
+        NewsletterSubscriber.objects.filter(email="reader0@apex.test").update(
+            subscribed_at=timezone.now() - timedelta(days=400)
+        )
+        # As the admin's "Past 30 days" date filter writes it
+        today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        since = str(today - timedelta(days=30))
+        query = urlencode(
+            {"subscribed_at__gte": since, "is_active__exact": 1, "p": 1, "o": -1, "q": "reader"}
+        )
+        ticked = NewsletterSubscriber.objects.get(email="reader1@apex.test")
+        self.send(f"?{query}", [ticked.pk], "1")
+        campaign = NewsletterCampaign.objects.get()
+        self.assertEqual(
+            campaign.subscriber_filter,
+            {
+                "lookups": {"subscribed_at__gte": [since], "is_active__exact": ["1"]},
+                "search": "reader",
+            },
+        )
+        self.assertEqual(
+            sorted(campaign.recipients().values_list("email", flat=True)),
+            [f"reader{n}@apex.test" for n in range(1, 5)],
+        )
+
+        send_campaign(NewsletterCampaign.objects.get(pk=campaign.pk))
+        self.assertEqual(len(mail.outbox), 4)
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, NewsletterCampaign.STATUS_DONE)
+        self.assertEqual(campaign.sent_count, 4)
+
+    def test_ticked_rows_only(self):
+        picked = list(NewsletterSubscriber.objects.filter(is_active=True)[:2])
+        self.send("", [subscriber.pk for subscriber in picked], select_across="0")
+        campaign = NewsletterCampaign.objects.get()
+        self.assertEqual(sorted(campaign.subscriber_ids), sorted(s.pk for s in picked))
+        self.assertEqual(campaign.total_recipients, 2)
+
+    def test_recipients_with_more_ids_than_sqlite_variables(self):
+        match = NewsletterSubscriber.objects.get(email="match@apex.test")
+        gone = NewsletterSubscriber.objects.get(email="match-gone@apex.test")
+        campaign = NewsletterCampaign(subscriber_ids=[*range(10**6, 10**6 + 300_000), match.pk, gone.pk])
+        self.assertEqual(list(campaign.recipients()), [match])
+
+
+class ExportEmailsTests(TestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser("admin@apex.test", "Ad", "Min", "admin-pass-1")
+        self.client.force_login(admin)
+        NewsletterSubscriber.objects.bulk_create(
+            NewsletterSubscriber(email=f"reader{n}@apex.test", is_active=n % 2 == 0) for n in range(5)
+        )
+
+    def export(self, action):
+        subscribers = NewsletterSubscriber.objects.order_by("pk")
+        response = self.client.post(reverse("admin:apex_gym_newslettersubscriber_changelist"), {
+            "action": action,
+            "index": "0",
+            "_selected_action": [str(pk) for pk in subscribers.values_list("pk", flat=True)],
+        })
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def expected_rows(self):
+        return [["Email", "Subscribed At", "Is Active"]] + [
+            [subscriber.email, str(subscriber.subscribed_at), str(subscriber.is_active)]
+            for subscriber in NewsletterSubscriber.objects.order_by("pk")
+        ]
+
+    def test_export_csv(self):
+        response, content = self.export("export_emails")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('filename="newsletter_subscribers.csv"', response["Content-Disposition"])
+        header, *rows = csv.reader(content.decode().splitlines())
+        expected_header, *expected_rows = self.expected_rows()
+        self.assertEqual(header, expected_header)
+        self.assertCountEqual(rows, expected_rows)
+
+    def test_export_gzip(self):
+        response, content = self.export("export_emails_gzip")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn('filename="newsletter_subscribers.csv.gz"', response["Content-Disposition"])
+        rows = list(csv.reader(gzip.decompress(content).decode().splitlines()))
+        self.assertCountEqual(rows, self.expected_rows())
+
+    def test_stream_csv_in_blocks(self):
+        rows = [(n, f"row {n}") for n in range(5)]
+        blocks = list(stream_csv(["n", "label"], iter(rows), rows_per_block=2))
+        # The header, then blocks of 2, 2 and 1 rows
+        self.assertEqual(len(blocks), 4)
+        self.assertEqual(blocks[0], b"n,label\r\n")
+        self.assertEqual(blocks[-1], b"4,row 4\r\n")
+        self.assertEqual(gzip.decompress(b"".join(gzip_stream(iter(blocks)))), b"".join(blocks))
+
+
+def rollup(**filters):
+    return MembershipDailyStats.objects.filter(**filters).aggregate(total=Sum("members"))["total"] or 0
+
+
+class JoinOrUpdateMembershipTests(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ada@apex.test", "Ada", "Lovelace", "secret-pass-1")
+
+    def test_join_then_switch_plan(self):
+        with self.assertQueries(3):
+            membership, created = join_or_update_membership(self.user, "basic")
+        self.assertTrue(created)
+        self.assertEqual(rollup(membership_type="basic"), 1)
+
+        with self.assertQueries(3):
+            membership, created = join_or_update_membership(self.user, "vip")
+        self.assertFalse(created)
+        self.assertEqual(Membership.objects.get(user=self.user).membership_type, "vip")
+        self.assertEqual(rollup(membership_type="basic"), 0)
+        self.assertEqual(rollup(membership_type="vip"), 1)
+
+    def test_same_plan_is_refused(self):
+        join_or_update_membership(self.user, "basic")
+        with self.assertRaises(AlreadyOnPlan):
+            join_or_update_membership(self.user, "basic")
+        self.assertEqual(rollup(), 1)
+
+    def test_join_racing_another_join_counts_the_member_once(self):
+        Membership.objects.create(user=self.user, membership_type="basic")
+        # The other request inserted the row after this one looked for it
+        with mock.patch.object(Membership.objects, "filter") as filter_, self.assertLogs(
+            "apex.query_budget", "WARNING"
+        ):
+            filter_.return_value.first.return_value = None
+            membership, created = join_or_update_membership(self.user, "premium")
+        self.assertFalse(created)
+        self.assertEqual(Membership.objects.get().membership_type, "premium")
+        self.assertEqual(rollup(), 1)
+        self.assertEqual(rollup(membership_type="premium"), 1)
+
+
+class MembershipAnalyticsTests(TestCase):
+    def setUp(self):
+        for n, plan in enumerate(["basic", "basic", "vip"]):
+            user = User.objects.create_user(f"member{n}@apex.test", "Mem", "Ber", "secret-pass-1")
+            Membership.objects.create(user=user, membership_type=plan)
+
+    def test_rebuild_recounts_the_rollup(self):
+        # Writes that send no signals leave the rollup behind
+        Membership.objects.filter(membership_type="basic").update(
+            is_active=False, join_date=timezone.now() - timedelta(days=10)
+        )
+        self.assertEqual(rollup(is_active=False), 0)
+
+        stdout = StringIO()
+        call_command("rebuild_membership_stats", stdout=stdout)
+        self.assertIn("Rebuilt 2 membership stats buckets", stdout.getvalue())
+        ten_days_ago = timezone.localdate() - timedelta(days=10)
+        self.assertEqual(rollup(membership_type="basic", is_active=False, day=ten_days_ago), 2)
+        self.assertEqual(rollup(membership_type="vip", is_active=True, day=timezone.localdate()), 1)
+        self.assertEqual(rollup(), 3)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_endpoint(self):
+        cache.clear()
+        url = reverse("membership-analytics")
+        client = APIClient()
+        client.force_authenticate(User.objects.get(email="member0@apex.test"))
+        self.assertEqual(client.get(url).status_code, 403)
+
+        admin = User.objects.create_superuser("admin@apex.test", "Ad", "Min", "admin-pass-1")
+        client.force_authenticate(admin)
+        response = client.get(url, {"days": 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["totals"]["basic"], {"active": 2, "inactive": 0})
+        self.assertEqual((response.data["active"], response.data["inactive"]), (3, 0))
+        self.assertEqual(len(response.data["daily_joins"]), 7)
+        self.assertEqual(
+            response.data["daily_joins"][-1],
+            {"date": timezone.localdate(), "total": 3, "basic": 2, "premium": 0, "vip": 1},
+        )
+
+        # Served from the cache until it expires
+        Membership.objects.filter(membership_type="vip").delete()
+        self.assertEqual(client.get(url, {"days": 7}).data["active"], 3)
+        self.assertEqual(client.get(url, {"days": 8}).data["active"], 2)
+
+        for days in ["0", "367", "soon"]:
+            self.assertEqual(client.get(url, {"days": days}).status_code, 400)
+
+
+class BulkSubscribeTests(QueryCountMixin, TestCase):
+    def test_outcomes_in_a_constant_number_of_queries(self):
+        NewsletterSubscriber.objects.create(email="known@apex.test")
+        NewsletterSubscriber.objects.create(email="gone@apex.test", is_active=False)
+        emails = [f"new{n}@apex.test" for n in range(500)]
+
+        # SELECT + 2 INSERT batches + UPDATE
+        with self.assertQueries(4):
+            outcomes = bulk_subscribe(
+                [" Known@apex.test", "gone@apex.test", "not-an-email", *emails, "new0@apex.test"]
+            )
+        self.assertEqual(outcomes["known@apex.test"], "already_subscribed")
+        self.assertEqual(outcomes["gone@apex.test"], "reactivated")
+        self.assertEqual(outcomes["not-an-email"], "invalid")
+        self.assertEqual(outcomes["new0@apex.test"], "subscribed")
+        self.assertEqual(len(outcomes), 503)
+        self.assertEqual(NewsletterSubscriber.objects.filter(is_active=True).count(), 502)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_endpoint(self):
+        cache.clear()
+        NewsletterSubscriber.objects.create(email="known@apex.test")
+        url = reverse("newsletter-bulk-subscribe")
+        client = APIClient()
+        member = User.objects.create_user("ada@apex.test", "Ada", "Lovelace", "secret-pass-1")
+        client.force_authenticate(member)
+        self.assertEqual(client.post(url, {"emails": ["new@apex.test"]}, format="json").status_code, 403)
+
+        admin = User.objects.create_superuser("admin@apex.test", "Ad", "Min", "admin-pass-1")
+        client.force_authenticate(admin)
+        response = client.post(
+            url, {"emails": ["new@apex.test", "known@apex.test", "nope"]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["summary"], {"subscribed": 1, "already_subscribed": 1, "invalid": 1}
+        )
+        self.assertEqual(
+            response.data["results"][0], {"email": "new@apex.test", "status": "subscribed"}
+        )
+        self.assertTrue(NewsletterSubscriber.objects.filter(email="new@apex.test").exists())
+
+        too_many = [f"new{n}@apex.test" for n in range(settings.NEWSLETTER_BULK_SUBSCRIBE_MAX + 1)]
+        for emails in [[], too_many]:
+            self.assertEqual(client.post(url, {"emails": emails}, format="json").status_code, 400)
@@ -1,9 +1,26 @@
 
 
 from django.urls import path
-from .views import JoinOrUpdateMembershipView, NewsletterSubscribeView
+from .views import (
+    JoinOrUpdateMembershipView,
+    NewsletterSubscribeView,
+    NewsletterBulkSubscribeView,
+    MemberSearchView,
+    MembershipAnalyticsView,
+)
 
 urlpatterns = [
     path("join/", JoinOrUpdateMembershipView.as_view(), name="join-membership"),
     path("subscribe/", NewsletterSubscribeView.as_view(), name="newsletter-subscribe"),
+    path(
+        "subscribe/bulk/",
+        NewsletterBulkSubscribeView.as_view(),
+        name="newsletter-bulk-subscribe",
+    ),
+    path("members/search/", MemberSearchView.as_view(), name="member-search"),
+    path(
+        "analytics/memberships/",
+        MembershipAnalyticsView.as_view(),
+        name="membership-analytics",
+    ),
 ]
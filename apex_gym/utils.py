@@ -0,0 +1,113 @@
+import csv
+import zlib
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import NewsletterCampaign
+
+
+# Pick the next queued campaign, or one whose worker stopped sending heartbeats
+def claim_campaign():
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.NEWSLETTER_CAMPAIGN_LEASE)
+    candidates = NewsletterCampaign.objects.filter(
+        Q(status=NewsletterCampaign.STATUS_QUEUED)
+        | Q(status=NewsletterCampaign.STATUS_SENDING, heartbeat_at__lt=stale)
+    ).order_by("created_at")
+
+    for campaign in candidates:
+        won = NewsletterCampaign.objects.filter(
+            pk=campaign.pk, status=campaign.status, heartbeat_at=campaign.heartbeat_at
+        ).update(
+            status=NewsletterCampaign.STATUS_SENDING,
+            heartbeat_at=now,
+            started_at=campaign.started_at or now,
+        )
+        if won:
+            campaign.refresh_from_db()
+            return campaign
+    return None
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# Stream the remaining recipients and send them chunk by chunk over one connection.
+# After every chunk the cursor is saved, so a crashed run resumes without re-sending.
+def send_campaign(campaign, on_chunk=None):
+    recipients = (
+        campaign.recipients()
+        .filter(pk__gt=campaign.last_subscriber_id)
+        .order_by("pk")
+        .values_list("pk", "email")
+        .iterator(chunk_size=campaign.chunk_size)
+    )
+
+    connection = get_connection()
+    try:
+        connection.open()
+        for chunk in chunked(recipients, campaign.chunk_size):
+            messages = [
+                EmailMessage(
+                    campaign.subject,
+                    campaign.message,
+                    campaign.from_email,
+                    [email],
+                    connection=connection,
+                )
+                for _, email in chunk
+            ]
+            connection.send_messages(messages)
+
+            campaign.last_subscriber_id = chunk[-1][0]
+            campaign.sent_count += len(chunk)
+            NewsletterCampaign.objects.filter(pk=campaign.pk).update(
+                last_subscriber_id=campaign.last_subscriber_id,
+                sent_count=F("sent_count") + len(chunk),
+                heartbeat_at=timezone.now(),
+            )
+            if on_chunk:
+                on_chunk(campaign)
+    except Exception as e:
+        NewsletterCampaign.objects.filter(pk=campaign.pk).update(
+            status=NewsletterCampaign.STATUS_FAILED, last_error=str(e)
+        )
+        raise
+    finally:
+        connection.close()
+
+    NewsletterCampaign.objects.filter(pk=campaign.pk).update(
+        status=NewsletterCampaign.STATUS_DONE, finished_at=timezone.now()
+    )
+
+
+# csv.writer needs a file-like object, this one hands each row back instead of storing it
+class Echo:
+    def write(self, value):
+        return value
+
+
+# Yield the CSV as encoded blocks of `rows_per_block` rows, nothing is kept in memory
+def stream_csv(header, rows, rows_per_block=1000):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header).encode()
+    for block in chunked(rows, rows_per_block):
+        yield "".join(writer.writerow(row) for row in block).encode()
+
+
+# Compress a stream of bytes on the fly into a single gzip file
+def gzip_stream(blocks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
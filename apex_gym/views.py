@@ -1,10 +1,21 @@
 from rest_framework.generics import CreateAPIView, GenericAPIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.contrib.auth import get_user_model
 
-from .models import Membership, NewsletterSubscriber
-from .serializers import MembershipSerializer, NewsletterSubscriberSerializer
+from accounts.search import search_user_ids
+
+from .models import NewsletterSubscriber
+from .serializers import (
+    MembershipSerializer,
+    NewsletterSubscriberSerializer,
+    NewsletterBulkSubscribeSerializer,
+    MemberSearchSerializer,
+)
+from .analytics import cached_membership_summary
+from .services import AlreadyOnPlan, join_or_update_membership, bulk_subscribe
 
 
 class JoinOrUpdateMembershipView(GenericAPIView):
@@ -13,32 +24,21 @@ class JoinOrUpdateMembershipView(GenericAPIView):
 
     def post(self, request, *args, **kwargs):
         user = request.user
-        data = request.data
-
-        membership_type = request.data.get(
-            "membership_type", "Basic"
-        )  # default to 'monthly' if none given
 
-        membership, created = Membership.objects.get_or_create(
-            user=user, defaults={"membership_type": membership_type}
-        )
+        # Validate the plan before touching the database; choices are lowercase
+        membership_type = str(request.data.get("membership_type", "basic")).lower()
+        serializer = self.get_serializer(data={"membership_type": membership_type})
+        serializer.is_valid(raise_exception=True)
 
-        # If user is already on this plan, stop here
-        if not created and membership.membership_type == membership_type:
+        try:
+            membership, created = join_or_update_membership(user, membership_type)
+        except AlreadyOnPlan:
+            # If user is already on this plan, stop here
             return Response(
                 {"detail": f"You’re already on the {membership_type} plan."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        serializer = self.get_serializer(
-            membership,
-            data=data,
-            context=self.get_serializer_context(),
-            partial=True,  # allow updates without needing all fields
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-
         if created:
             message = f"Welcome, {user.first_name}. You’ve successfully joined the membership!"
             status_code = status.HTTP_201_CREATED
@@ -49,7 +49,7 @@ class JoinOrUpdateMembershipView(GenericAPIView):
         return Response(
             {
                 "detail": message,
-                "membership": serializer.data,
+                "membership": self.get_serializer(membership).data,
             },
             status=status_code,
         )
@@ -95,3 +95,72 @@ class NewsletterSubscribeView(CreateAPIView):
             {"detail": "You’ve successfully subscribed to our newsletter."},
             status=status.HTTP_201_CREATED,
         )
+
+
+# Staff/partner endpoint: subscribe many emails at once with per-email outcomes
+class NewsletterBulkSubscribeView(GenericAPIView):
+    serializer_class = NewsletterBulkSubscribeSerializer
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        outcomes = bulk_subscribe(serializer.validated_data["emails"])
+
+        summary = {}
+        for outcome in outcomes.values():
+            summary[outcome] = summary.get(outcome, 0) + 1
+
+        return Response(
+            {
+                "summary": summary,
+                "results": [
+                    {"email": email, "status": outcome}
+                    for email, outcome in outcomes.items()
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+# Staff search by name or email prefix, served from the full-text index
+class MemberSearchView(GenericAPIView):
+    serializer_class = MemberSearchSerializer
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        term = request.query_params.get("q", "").strip()
+        if len(term) < 2:
+            return Response(
+                {"error": "Search term must be at least 2 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Ranked ids first, then one query for the members in that order
+        ids = search_user_ids(term, settings.MEMBER_SEARCH_MAX_RESULTS)
+        members = get_user_model().objects.select_related("membership").in_bulk(ids)
+        results = [members[pk] for pk in ids if pk in members]
+
+        return Response(
+            {"results": self.get_serializer(results, many=True).data},
+            status=status.HTTP_200_OK,
+        )
+
+
+# Staff dashboard: plan totals and daily joins, served from the rollup table
+class MembershipAnalyticsView(GenericAPIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            days = int(request.query_params.get("days", 30))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= settings.MEMBERSHIP_ANALYTICS_MAX_DAYS:
+            return Response(
+                {"error": f"days must be between 1 and {settings.MEMBERSHIP_ANALYTICS_MAX_DAYS}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(cached_membership_summary(days), status=status.HTTP_200_OK)
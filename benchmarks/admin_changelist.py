@@ -0,0 +1,160 @@
+"""
+Admin changelist latency on large Membership and NewsletterSubscriber tables.
+
+Seeds a throwaway database, then times each changelist twice, in total and
+in SQL. "before" uses the stock admin setup: exact counts, the unfiltered
+total and no filter indexes. "after" is the current FastChangeListMixin setup.
+
+    python -m benchmarks.admin_changelist [--rows 200000] [--json results.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+ROWS_PER_BATCH = 20_000
+
+URLS = [
+    "/admin/apex_gym/membership/",
+    "/admin/apex_gym/membership/?membership_type__exact=vip",
+    "/admin/apex_gym/membership/?is_active__exact=0&membership_type__exact=basic",
+    "/admin/apex_gym/membership/?p=50",
+    "/admin/apex_gym/newslettersubscriber/",
+    "/admin/apex_gym/newslettersubscriber/?is_active__exact=1",
+]
+
+
+def seed(rows):
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection
+
+    from accounts.models import User
+    from apex_gym.models import Membership, NewsletterSubscriber
+
+    password = make_password(None)
+    plans = ["basic", "premium", "vip"]
+    for start in range(0, rows, ROWS_PER_BATCH):
+        numbers = range(start, min(start + ROWS_PER_BATCH, rows))
+        users = User.objects.bulk_create(
+            User(email=f"member{n}@apex.test", first_name="Member", last_name=str(n),
+                 password=password, is_active=n % 10 != 0)
+            for n in numbers
+        )
+        Membership.objects.bulk_create(
+            Membership(user=user, membership_type=plans[n % 3], is_active=n % 10 != 0)
+            for n, user in zip(numbers, users)
+        )
+        NewsletterSubscriber.objects.bulk_create(
+            NewsletterSubscriber(email=f"reader{n}@apex.test", is_active=n % 7 != 0)
+            for n in numbers
+        )
+
+    # auto_now_add ignores the value given, spread the join dates afterwards
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE apex_gym_membership SET join_date = datetime('now', '-' || id || ' minutes')"
+        )
+
+
+def time_urls(client, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    results = {}
+    for url in URLS:
+        client.get(url)  # warm caches
+        timings, db_timings = [], []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append(time.perf_counter() - started)
+            assert response.status_code == 200, (url, response.status_code)
+            db_timings.append(sum(float(query["time"]) for query in queries.captured_queries))
+        results[url] = {
+            "ms": round(min(timings) * 1000, 1),
+            "db_ms": round(min(db_timings) * 1000, 1),
+            "queries": len(queries),
+        }
+    return results
+
+
+def stock_admin():
+    """Put the admin classes and indexes back to the stock setup."""
+    from django.contrib import admin
+    from django.contrib.admin import ShowFacets
+    from django.core.paginator import Paginator
+    from django.db import connection
+
+    from apex_gym.models import Membership, NewsletterSubscriber
+
+    for model in (Membership, NewsletterSubscriber):
+        model_admin = admin.site._registry[model]
+        model_admin.paginator = Paginator
+        model_admin.show_full_result_count = True
+        model_admin.show_facets = ShowFacets.ALLOW
+        model_admin.list_select_related = False
+        with connection.schema_editor() as editor:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="apex-admin-")
+    os.environ.update(
+        DJANGO_SETTINGS_MODULE="benchmarks.loadtest_settings",
+        LOADTEST_DIR=directory,
+        LOADTEST_FAST_HASHERS="1",
+    )
+    try:
+        import django
+
+        django.setup()
+
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test import Client
+
+        from accounts.models import User
+
+        call_command("migrate", verbosity=0)
+        started = time.perf_counter()
+        seed(args.rows)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        print(f"seeded {args.rows} members and subscribers in {time.perf_counter() - started:.1f}s")
+
+        admin_user = User.objects.create_superuser("admin@apex.test", "Admin", "User", "admin-pass-1")
+        client = Client(HTTP_HOST="localhost")
+        client.force_login(admin_user)
+
+        results = {"after": time_urls(client, args.repeat)}
+        stock_admin()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        results["before"] = time_urls(client, args.repeat)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{'changelist':<72} {'before (total / sql)':>24} {'after (total / sql)':>24}")
+    for url in URLS:
+        before, after = results["before"][url], results["after"][url]
+        print(f"{url:<72} {before['ms']:>8}ms {before['db_ms']:>7}ms {before['queries']:>3}q "
+              f"{after['ms']:>8}ms {after['db_ms']:>7}ms {after['queries']:>3}q")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Worker cold start and per-request overhead of the full profile (apex.settings)
+against the API-only profile (apex.settings_api).
+
+Each profile runs in fresh subprocesses. A run times django.setup() and the
+first request, then counts the modules loaded and the peak RSS. Finally it
+times many cheap API requests through the WSGI handler, none of which touch
+the database:
+
+    python -m benchmarks.api_profile [--runs 5] [--requests 2000] [--json results.json]
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from wsgiref.util import setup_testing_defaults
+
+PROFILES = ["apex.settings", "apex.settings_api"]
+
+# (method, path, body): a DRF permission failure and a DRF validation failure
+REQUESTS = [
+    ("GET", "/api/members/search/?q=ab", b""),
+    ("POST", "/api/subscribe/", b"{}"),
+]
+
+addresses = (f"10.{n // 62500 % 250}.{n // 250 % 250}.{n % 250 + 1}" for n in itertools.count())
+
+
+def call(app, method, url, body):
+    path, _, query = url.partition("?")
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "REMOTE_ADDR": next(addresses),  # stay clear of the anon throttle
+        "wsgi.input": io.BytesIO(body),
+    }
+    setup_testing_defaults(environ)
+    statuses = []
+    result = app(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b"".join(result)
+    result.close()
+    return statuses[0]
+
+
+def run_child(requests):
+    started = time.perf_counter()
+    import django
+
+    django.setup()
+
+    from django.core.wsgi import get_wsgi_application
+
+    app = get_wsgi_application()
+    first_status = call(app, *REQUESTS[0])
+    cold_ms = (time.perf_counter() - started) * 1000
+
+    per_request = {}
+    for method, url, body in REQUESTS:
+        status = call(app, method, url, body)  # warm
+        started = time.perf_counter()
+        for _ in range(requests):
+            call(app, method, url, body)
+        per_request[f"{method} {url} ({status})"] = round(
+            (time.perf_counter() - started) / requests * 1e6
+        )
+
+    print(json.dumps({
+        "cold_ms": round(cold_ms, 1),
+        "first_status": first_status,
+        "modules": len(sys.modules),
+        "admin_site_loaded": "unfold" in sys.modules or "apex_gym.admin" in sys.modules,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "per_request_us": per_request,
+    }))
+
+
+def run_profile(settings_module, runs, requests):
+    directory = tempfile.mkdtemp(prefix="apex-profile-")
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": settings_module,
+        "CACHE_LOCATION": os.path.join(directory, "cache.sqlite3"),
+    }
+    samples, process_ms = [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.api_profile", "--child",
+             "--requests", str(requests)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        process_ms.append((time.perf_counter() - started) * 1000)
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    last = samples[-1]
+    return {
+        "cold_ms": round(statistics.median(s["cold_ms"] for s in samples), 1),
+        "process_ms": round(statistics.median(process_ms)),
+        "modules": last["modules"],
+        "admin_site_loaded": last["admin_site_loaded"],
+        "max_rss_kb": round(statistics.median(s["max_rss_kb"] for s in samples)),
+        "per_request_us": {
+            name: round(statistics.median(s["per_request_us"][name] for s in samples))
+            for name in last["per_request_us"]
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--json", help="Also write the results to this file.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.requests)
+
+    results = {profile: run_profile(profile, args.runs, args.requests) for profile in PROFILES}
+
+    print(f"{'profile':<20} {'setup+1st req':>14} {'process':>9} {'modules':>8} "
+          f"{'admin':>6} {'max rss':>9}")
+    for profile, result in results.items():
+        print(f"{profile:<20} {result['cold_ms']:>12}ms {result['process_ms']:>7}ms "
+              f"{result['modules']:>8} {str(result['admin_site_loaded']):>6} "
+              f"{result['max_rss_kb'] / 1024:>7.1f}MB")
+    print()
+    print(f"{'request':<44} " + " ".join(f"{profile:>18}" for profile in PROFILES))
+    for name in results[PROFILES[0]]["per_request_us"]:
+        print(f"{name:<44} " + " ".join(
+            f"{results[profile]['per_request_us'][name]:>16}us" for profile in PROFILES
+        ))
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Tiny in-process ASGI client used by the benchmarks: no server, no sockets.
+"""
+
+import asyncio
+import json
+import time
+
+
+async def asgi_request(app, method, path, body=None, ip="127.0.0.1", headers=()):
+    """Send one HTTP request through ``app``; return (seconds, status, body)."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"localhost"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+            (b"x-forwarded-for", ip.encode()),
+            *headers,
+        ],
+        "client": (ip, 50000),
+        "server": ("localhost", 80),
+    }
+    received = False
+    response = {"status": None, "body": b""}
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        # Never disconnect; Django cancels this once the response is sent
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    return time.perf_counter() - started, response["status"], response["body"]
@@ -0,0 +1,166 @@
+"""
+gunicorn worker memory and time to the first request, before and after the
+preloaded, warmed boot (gunicorn.conf.py and apex/boot.py).
+
+"before" is a plain gunicorn: no config file, BOOT_WARMUP=False, so every
+worker imports the app after the fork and pays for its first request. "after"
+uses gunicorn.conf.py: the master warms the app and freezes it before forking.
+
+    python -m benchmarks.boot [--workers 4] [--runs 3] [--json results.json]
+
+Per worker it reports RSS and PSS (RSS with shared pages split between the
+processes sharing them), plus private memory: what a worker really adds.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.loadtest import wait_for_port
+
+PORT = 8765
+
+# (method, path, body): JWT auth failure, a throttled login with a DB lookup and
+# a DRF permission failure
+REQUESTS = [
+    ("POST", "/api/token/refresh/", {"refresh": "not-a-token"}),
+    ("POST", "/api/auth/login/", {"email": "nobody@apex.test", "password": "not-a-password"}),
+    ("GET", "/api/members/search/?q=ab", None),
+]
+
+
+def memory(pid):
+    """Rss, Pss and private memory of a process in KB, from /proc."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def worker_pids(master_pid):
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as fh:
+        return [int(pid) for pid in fh.read().split()]
+
+
+def run_server(mode, workers, directory):
+    import requests
+
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "benchmarks.loadtest_settings",
+        "LOADTEST_DIR": directory,
+        "LOADTEST_FAST_HASHERS": "1",
+        "BOOT_WARMUP": str(mode == "after"),
+    }
+    if mode == "after":
+        config = "gunicorn.conf.py"
+    else:
+        # Any config file, or gunicorn picks up ./gunicorn.conf.py by itself
+        config = os.path.join(directory, "empty.conf.py")
+        open(config, "w").close()
+
+    addresses = (f"10.0.{n // 250}.{n % 250 + 1}" for n in itertools.count())
+    base_url = f"http://127.0.0.1:{PORT}"
+
+    def send(method, path, body):
+        started = time.perf_counter()
+        response = requests.request(
+            method, base_url + path, json=body,
+            headers={"X-Forwarded-For": next(addresses), "Connection": "close"},
+        )
+        assert response.status_code < 500, (path, response.status_code)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "apex.wsgi:application", "-c", config,
+         "--workers", str(workers), "--bind", f"127.0.0.1:{PORT}", "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        wait_for_port("127.0.0.1", PORT)
+        first_request = send(*REQUESTS[0])
+        to_first_response = time.perf_counter() - started
+
+        # Wait for every worker, then send each request type a few times per worker
+        deadline = time.monotonic() + 60
+        while len(worker_pids(server.pid)) < workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+        latencies = [send(*request) for _ in range(workers * 10) for request in REQUESTS]
+
+        per_worker = [memory(pid) for pid in worker_pids(server.pid)]
+        return {
+            "to_first_response_ms": round(to_first_response * 1000),
+            "first_request_ms": round(first_request * 1000, 1),
+            "steady_p50_ms": round(statistics.median(latencies) * 1000, 1),
+            "master": memory(server.pid),
+            "worker": {
+                key: round(statistics.mean(worker[key] for worker in per_worker))
+                for key in ("rss", "pss", "private")
+            },
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def median_of(samples):
+    first = samples[0]
+    if isinstance(first, dict):
+        return {key: median_of([sample[key] for sample in samples]) for key in first}
+    return round(statistics.median(samples), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="apex-boot-")
+    try:
+        subprocess.run(
+            [sys.executable, "manage.py", "migrate", "--verbosity", "0"],
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "benchmarks.loadtest_settings",
+                 "LOADTEST_DIR": directory},
+            check=True,
+        )
+        results = {
+            mode: median_of([run_server(mode, args.workers, directory) for _ in range(args.runs)])
+            for mode in ("before", "after")
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{args.workers} workers, median of {args.runs} runs")
+    print(f"{'':<8} {'to 1st response':>16} {'1st request':>12} {'steady p50':>11} "
+          f"{'worker rss':>11} {'worker pss':>11} {'worker private':>15} {'master rss':>11}")
+    for mode, result in results.items():
+        worker = result["worker"]
+        print(f"{mode:<8} {result['to_first_response_ms']:>14}ms {result['first_request_ms']:>10}ms "
+              f"{result['steady_p50_ms']:>9}ms {worker['rss'] / 1024:>9.1f}MB "
+              f"{worker['pss'] / 1024:>9.1f}MB {worker['private'] / 1024:>13.1f}MB "
+              f"{result['master']['rss'] / 1024:>9.1f}MB")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare LocMemCache, DatabaseCache and the shared SQLiteCache.
+
+Measures per-operation latency in one process, then has several processes
+increment the same counter to show which backends are shared and atomic.
+
+    python -m benchmarks.cache
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+from benchmarks.common import per_call, setup_django
+
+setup_django(test_database=True)
+
+from django.core.cache.backends.db import DatabaseCache  # noqa: E402
+from django.core.cache.backends.locmem import LocMemCache  # noqa: E402
+from django.core.management.commands.createcachetable import (  # noqa: E402
+    Command as CreateCacheTable,
+)
+
+from apex.cache import SQLiteCache  # noqa: E402
+
+SQLITE_PATH = os.path.join(tempfile.mkdtemp(), "bench-cache.sqlite3")
+PROCESSES = 4
+INCREMENTS = 500
+
+
+def make_backends():
+    return {
+        "LocMemCache": LocMemCache("bench", {"OPTIONS": {"MAX_ENTRIES": 100_000}}),
+        "DatabaseCache": DatabaseCache("bench_cache", {"OPTIONS": {"MAX_ENTRIES": 100_000}}),
+        "SQLiteCache": SQLiteCache(SQLITE_PATH, {"OPTIONS": {"MAX_ENTRIES": 100_000}}),
+    }
+
+
+def hammer(name):
+    cache = make_backends()[name]
+    for _ in range(INCREMENTS):
+        cache.incr("shared-counter")
+
+
+def shared_total(name, cache):
+    from django.db import connections
+
+    cache.set("shared-counter", 0, None)
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=hammer, args=(name,)) for _ in range(PROCESSES)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return cache.get("shared-counter")
+
+
+def main():
+    command = CreateCacheTable()
+    command.verbosity = 0
+    command.create_table("default", "bench_cache", dry_run=False)
+    backends = make_backends()
+    print(f"{'backend':<14} {'get':>9} {'set':>9} {'incr':>9}   shared incr total")
+    for name, cache in backends.items():
+        cache.set("hit", {"user": 1, "name": "apex"})
+        cache.set("counter", 0)
+        get = per_call(lambda: cache.get("hit"), 2000)
+        set_ = per_call(lambda: cache.set("hit", {"user": 1, "name": "apex"}), 2000)
+        incr = per_call(lambda: cache.incr("counter"), 2000)
+        total = shared_total(name, cache)
+        print(
+            f"{name:<14} {get:>7.1f}us {set_:>7.1f}us {incr:>7.1f}us   "
+            f"{total}/{PROCESSES * INCREMENTS}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Run a benchmark from the project root, e.g. ``python -m benchmarks.throttles``.
+The usual environment variables (SECRET_KEY, EMAIL_BACKEND, ...) must be set.
+"""
+
+import os
+import tempfile
+import time
+
+import django
+
+
+def setup_django(test_database=False):
+    """Configure Django; optionally create a throwaway test database."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "apex.settings")
+    django.setup()
+
+    if test_database:
+        from django.conf import settings
+        from django.db import connections
+        from django.test.utils import setup_test_environment
+
+        # A file rather than :memory: so forked worker processes share it
+        directory = tempfile.mkdtemp(prefix="apex-bench-")
+        setup_test_environment()
+        for alias in settings.DATABASES:
+            test_settings = settings.DATABASES[alias].setdefault("TEST", {})
+            test_settings["NAME"] = os.path.join(directory, f"{alias}.sqlite3")
+            connections[alias].creation.create_test_db(verbosity=0, keepdb=False)
+
+
+def per_call(fn, calls):
+    """Average wall time of ``fn()`` in microseconds over ``calls`` calls."""
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
@@ -0,0 +1,147 @@
+"""
+Encode and decode cost of DRF's JSONRenderer and JSONParser against the
+orjson-backed FastJSONRenderer and FastJSONParser (apex/renderers.py).
+
+The payloads are built by the real serializers and views' helpers against a
+throwaway database: a login response, a membership response, a validation
+error, a page of member search results, a year of membership analytics and a
+full bulk newsletter subscription body.
+
+    python -m benchmarks.json_renderer [--calls 2000] [--json results.json]
+
+Each row also checks that both renderers wrote the same bytes.
+"""
+
+import argparse
+import io
+import json
+from datetime import timedelta
+
+from benchmarks.common import per_call, setup_django
+
+setup_django(test_database=True)
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from accounts.serializers import LoginSerializer, UserRegisterSerializer  # noqa: E402
+from apex.renderers import FastJSONParser, FastJSONRenderer, orjson  # noqa: E402
+from apex_gym import analytics  # noqa: E402
+from apex_gym.models import Membership  # noqa: E402
+from apex_gym.serializers import MemberSearchSerializer, MembershipSerializer  # noqa: E402
+
+PASSWORD = "bench-password-1"
+MEMBERS = 500
+
+
+def create_members():
+    User = get_user_model()
+    now = timezone.now()
+    plans = [value for value, _ in Membership.MEMBER_CHOICES]
+    User.objects.bulk_create(
+        User(
+            email=f"member{n}@apex.test",
+            first_name=f"Zoë {n}",
+            last_name="Ngọc",
+            is_verified=True,
+            is_active=True,
+        )
+        for n in range(MEMBERS)
+    )
+    users = list(User.objects.order_by("pk"))
+    Membership.objects.bulk_create(
+        Membership(
+            user=user,
+            membership_type=plans[n % len(plans)],
+            join_date=now - timedelta(days=n % 366),
+            is_active=n % 7 != 0,
+        )
+        for n, user in enumerate(users)
+    )
+    analytics.rebuild()
+
+    user = users[0]
+    user.set_password(PASSWORD)
+    user.save(update_fields=["password"])
+    return users
+
+
+def build_payloads(users):
+    login = LoginSerializer(
+        data={"email": users[0].email, "password": PASSWORD}, context={"request": None}
+    )
+    login.is_valid(raise_exception=True)
+
+    membership = Membership.objects.select_related("user").get(user=users[0])
+    register = UserRegisterSerializer(data={"email": "not-an-email", "password": "x"})
+    register.is_valid()
+
+    search_results = (
+        get_user_model().objects.select_related("membership").order_by("pk")
+        [: settings.MEMBER_SEARCH_MAX_RESULTS]
+    )
+    return {
+        "login": login.data,
+        "membership": {
+            "message": f"Welcome, {membership.user.first_name}. You’ve successfully joined the membership!",
+            "membership": MembershipSerializer(membership).data,
+        },
+        "validation error": register.errors,
+        "member search": {"results": MemberSearchSerializer(search_results, many=True).data},
+        "analytics (366 days)": analytics.membership_summary(366),
+        "bulk subscribe body": {
+            "emails": [f"subscriber{n}@apex.test" for n in range(settings.NEWSLETTER_BULK_SUBSCRIBE_MAX)]
+        },
+    }
+
+
+def measure(data, calls):
+    stdlib_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+    stdlib_parser, fast_parser = JSONParser(), FastJSONParser()
+    content = stdlib_renderer.render(data)
+    return {
+        "bytes": len(content),
+        "identical": fast_renderer.render(data) == content,
+        "encode_us": {
+            "stdlib": round(per_call(lambda: stdlib_renderer.render(data), calls), 1),
+            "fast": round(per_call(lambda: fast_renderer.render(data), calls), 1),
+        },
+        "decode_us": {
+            "stdlib": round(per_call(lambda: stdlib_parser.parse(io.BytesIO(content)), calls), 1),
+            "fast": round(per_call(lambda: fast_parser.parse(io.BytesIO(content)), calls), 1),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson is not installed: both sides run DRF's stdlib json")
+
+    payloads = build_payloads(create_members())
+    results = {name: measure(data, args.calls) for name, data in payloads.items()}
+
+    print(f"{'payload':<22} {'bytes':>7} {'same':>5} {'encode stdlib':>14} {'fast':>9} "
+          f"{'speedup':>8} {'decode stdlib':>14} {'fast':>9} {'speedup':>8}")
+    for name, result in results.items():
+        encode, decode = result["encode_us"], result["decode_us"]
+        print(f"{name:<22} {result['bytes']:>7} {str(result['identical']):>5} "
+              f"{encode['stdlib']:>12}us {encode['fast']:>7}us "
+              f"{encode['stdlib'] / encode['fast']:>7.1f}x "
+              f"{decode['stdlib']:>12}us {decode['fast']:>7}us "
+              f"{decode['stdlib'] / decode['fast']:>7.1f}x")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Load test of the member journey: register -> verify-otp -> login -> join ->
+logout, plus a newsletter subscribe. Each virtual user runs the journey once
+with its own email and client IP, so the per-IP throttles never trip.
+
+Two modes, both against a throwaway SQLite database (benchmarks/loadtest_settings.py):
+
+    # Django test client in this process, OTP codes read from the locmem mailbox
+    python -m benchmarks.loadtest inprocess --users 50 --concurrency 4
+
+    # A local gunicorn, driven over HTTP by several client processes
+    python -m benchmarks.loadtest gunicorn --users 200 --workers 2 --concurrency 8
+
+Reports throughput and p50/p95/p99 per endpoint. --json writes the results
+(with the git commit) to a file, and --compare prints the change against an
+earlier results file:
+
+    python -m benchmarks.loadtest inprocess --json before.json
+    python -m benchmarks.loadtest inprocess --compare before.json
+
+--fast-hashers swaps PBKDF2 for MD5 so register and login show the cost of
+everything except the password hash.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import percentile
+
+PASSWORD = "load-test-password-1"
+OTP_PATTERN = re.compile(r"Your OTP code is (\d+)")
+ENDPOINTS = ["register", "verify-otp", "login", "join", "logout", "subscribe"]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {name: [] for name in ENDPOINTS}
+        self.statuses = {name: {} for name in ENDPOINTS}
+        self.journeys = 0
+        self.failed_journeys = 0
+        self.failures = []
+
+    def add(self, name, seconds, status):
+        # list.append and dict item assignment are atomic, threads can share one Recorder
+        self.samples[name].append(seconds)
+        statuses = self.statuses[name]
+        statuses[status] = statuses.get(status, 0) + 1
+
+    def as_dict(self):
+        return {
+            "samples": self.samples,
+            "statuses": self.statuses,
+            "journeys": self.journeys,
+            "failed_journeys": self.failed_journeys,
+            "failures": self.failures,
+        }
+
+    def merge(self, data):
+        for name in ENDPOINTS:
+            self.samples[name].extend(data["samples"][name])
+            for status, count in data["statuses"][name].items():
+                self.statuses[name][int(status)] = self.statuses[name].get(int(status), 0) + count
+        self.journeys += data["journeys"]
+        self.failed_journeys += data["failed_journeys"]
+        self.failures.extend(data["failures"])
+
+
+def client_ip(n):
+    return f"10.{n // 62500 % 250}.{n // 250 % 250}.{n % 250 + 1}"
+
+
+# One virtual user. send(method, path, body, ip, token) returns (status, json body)
+def run_journey(n, run_id, send, fetch_otp, recorder):
+    email = f"load-{run_id}-{n}@apex.test"
+    ip = client_ip(n)
+
+    def step(name, path, body, token=None, expected=(200, 201)):
+        started = time.perf_counter()
+        status, data = send("POST", path, body, ip, token)
+        recorder.add(name, time.perf_counter() - started, status)
+        if status not in expected:
+            raise RuntimeError(f"{name} returned {status}: {data}")
+        return data
+
+    try:
+        step("register", "/api/auth/register/", {
+            "email": email,
+            "first_name": "Load",
+            "last_name": f"User{n}",
+            "password": PASSWORD,
+            "password2": PASSWORD,
+        })
+        step("verify-otp", "/api/auth/verify-otp/", {"email": email, "otp": fetch_otp(email)})
+        tokens = step("login", "/api/auth/login/", {"email": email, "password": PASSWORD})
+        access = tokens["access_token"]
+        step("join", "/api/join/", {"membership_type": "basic"}, access)
+        step("logout", "/api/auth/logout/", {"refresh": tokens["refresh_token"]}, access)
+        step("subscribe", "/api/subscribe/", {"email": email})
+    except Exception as e:
+        recorder.failed_journeys += 1
+        recorder.failures.append(str(e)[:300])
+    else:
+        recorder.journeys += 1
+
+
+def parse_otp(body):
+    match = OTP_PATTERN.search(body or "")
+    return match.group(1) if match else ""
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure(directory, fast_hashers):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.loadtest_settings"
+    os.environ["LOADTEST_DIR"] = directory
+    os.environ["LOADTEST_FAST_HASHERS"] = "1" if fast_hashers else "0"
+
+
+def run_inprocess(args, run_id):
+    import django
+    from django.core import mail
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+
+    django.setup()
+    call_command("migrate", verbosity=0)
+    # The locmem backend creates the mailbox on first send, a thread may poll sooner
+    mail.outbox = []
+
+    from accounts.utils import deliver_queued_emails
+
+    local = threading.local()
+    recorder = Recorder()
+
+    def send(method, path, body, ip, token):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = Client(HTTP_HOST="localhost")
+        extra = {"HTTP_X_FORWARDED_FOR": ip, "REMOTE_ADDR": ip}
+        if token:
+            extra["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        response = client.generic(
+            method, path, json.dumps(body), content_type="application/json", **extra
+        )
+        is_json = response.get("Content-Type", "").startswith("application/json")
+        return response.status_code, response.json() if is_json else None
+
+    # Deliver the outbox into the locmem mailbox, as the worker would. Another
+    # thread may have claimed this user's email and still be sending it, so retry
+    def fetch_otp(email):
+        for _ in range(50):
+            deliver_queued_emails()
+            for message in reversed(mail.outbox):
+                if email in message.to:
+                    return parse_otp(message.body)
+            time.sleep(0.02)
+        return ""
+
+    def virtual_user(n):
+        try:
+            run_journey(n, run_id, send, fetch_otp, recorder)
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(virtual_user, range(args.users)))
+    return recorder, time.perf_counter() - started
+
+
+def drive_http(job):
+    import requests
+    from accounts.models import EmailOutbox
+
+    indices, base_url, run_id = job
+    session = requests.Session()
+    recorder = Recorder()
+
+    def send(method, path, body, ip, token):
+        headers = {"X-Forwarded-For": ip}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        response = session.request(method, base_url + path, json=body, headers=headers)
+        is_json = response.headers.get("Content-Type", "").startswith("application/json")
+        return response.status_code, response.json() if is_json else None
+
+    # gunicorn's locmem mailbox lives in its workers, so read the queued email instead
+    def fetch_otp(email):
+        body = (
+            EmailOutbox.objects.filter(to_email=email)
+            .order_by("-id")
+            .values_list("body", flat=True)
+            .first()
+        )
+        return parse_otp(body)
+
+    for n in indices:
+        run_journey(n, run_id, send, fetch_otp, recorder)
+    return recorder.as_dict()
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not start listening on {host}:{port}")
+
+
+def run_gunicorn(args, run_id):
+    subprocess.run(
+        [sys.executable, "manage.py", "migrate", "--verbosity", "0"], check=True
+    )
+    server = subprocess.Popen([
+        sys.executable, "-m", "gunicorn", "apex.wsgi:application",
+        "--workers", str(args.workers),
+        "--bind", f"127.0.0.1:{args.port}",
+        "--log-level", "warning",
+    ])
+    try:
+        wait_for_port("127.0.0.1", args.port)
+
+        import django
+
+        # Forked client processes inherit the setup, but no database connection
+        django.setup()
+        base_url = f"http://127.0.0.1:{args.port}"
+        jobs = [
+            (range(i, args.users, args.concurrency), base_url, run_id)
+            for i in range(args.concurrency)
+        ]
+        recorder = Recorder()
+        started = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(args.concurrency) as pool:
+            for data in pool.imap_unordered(drive_http, jobs):
+                recorder.merge(data)
+        return recorder, time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def summarize(recorder, elapsed, args):
+    endpoints = {}
+    for name in ENDPOINTS:
+        samples = recorder.samples[name]
+        endpoints[name] = {
+            "count": len(samples),
+            "errors": sum(
+                count for status, count in recorder.statuses[name].items() if status >= 400
+            ),
+            "statuses": {str(status): count for status, count in sorted(recorder.statuses[name].items())},
+            "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 2) if samples else 0.0,
+            "p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "p95_ms": round(percentile(samples, 95) * 1000, 2),
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        }
+    return {
+        "mode": args.mode,
+        "commit": git_commit(),
+        "config": {
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "workers": args.workers if args.mode == "gunicorn" else None,
+            "fast_hashers": args.fast_hashers,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "journeys": recorder.journeys,
+        "failed_journeys": recorder.failed_journeys,
+        "journeys_per_s": round(recorder.journeys / elapsed, 2) if elapsed else 0.0,
+        "endpoints": endpoints,
+        # The first few errors, enough to see why journeys failed
+        "failures": recorder.failures[:10],
+    }
+
+
+def print_results(results):
+    print(f"{results['mode']} @ {results['commit']}: {results['journeys']} journeys "
+          f"({results['failed_journeys']} failed) in {results['elapsed_s']}s, "
+          f"{results['journeys_per_s']} journeys/s")
+    print(f"{'endpoint':<11} {'count':>6} {'errors':>6} {'req/s':>8} "
+          f"{'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, row in results["endpoints"].items():
+        print(f"{name:<11} {row['count']:>6} {row['errors']:>6} {row['throughput_rps']:>8} "
+              f"{row['p50_ms']:>7}ms {row['p95_ms']:>7}ms {row['p99_ms']:>7}ms")
+    for failure in results["failures"]:
+        print(f"failed: {failure}")
+
+
+def print_comparison(before, after):
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"\nchange since {before.get('commit')} ({before['mode']}):")
+    print(f"{'endpoint':<11} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8}")
+    for name, row in after["endpoints"].items():
+        old = before["endpoints"].get(name)
+        if old is None:
+            continue
+        print(f"{name:<11} {change(old['p50_ms'], row['p50_ms']):>8} "
+              f"{change(old['p95_ms'], row['p95_ms']):>8} "
+              f"{change(old['p99_ms'], row['p99_ms']):>8} "
+              f"{change(old['throughput_rps'], row['throughput_rps']):>8}")
+    print(f"{'journeys/s':<11} {change(before['journeys_per_s'], after['journeys_per_s']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mode", choices=["inprocess", "gunicorn"])
+    parser.add_argument("--users", type=int, default=20, help="Journeys to run.")
+    parser.add_argument(
+        "--concurrency", type=int, default=4,
+        help="Threads (inprocess) or client processes (gunicorn).",
+    )
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fast-hashers", action="store_true")
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare with.")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="apex-loadtest-")
+    configure(directory, args.fast_hashers)
+    run_id = uuid.uuid4().hex[:8]
+    try:
+        if args.mode == "inprocess":
+            recorder, elapsed = run_inprocess(args, run_id)
+        else:
+            recorder, elapsed = run_gunicorn(args, run_id)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    results = summarize(recorder, elapsed, args)
+    print_results(results)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            print_comparison(json.load(fh), results)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Settings for benchmarks.loadtest: the project settings pointed at a throwaway
+database and cache so a run never touches db.sqlite3 or the dev cache.
+
+    LOADTEST_DIR           directory holding db.sqlite3 and cache.sqlite3
+    LOADTEST_FAST_HASHERS  "1" to hash with MD5 instead of PBKDF2
+"""
+
+import os
+
+from apex.settings import *  # noqa: F401,F403
+from apex.settings import CACHES, DATABASES
+
+LOADTEST_DIR = os.environ["LOADTEST_DIR"]
+
+DATABASES["default"]["NAME"] = os.path.join(LOADTEST_DIR, "db.sqlite3")
+CACHES["default"]["LOCATION"] = os.path.join(LOADTEST_DIR, "cache.sqlite3")
+
+# Emails stay in the outbox table; the driver reads the OTP codes from there
+EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+
+# PBKDF2 dominates register and login; MD5 shows the cost of everything else
+if os.environ.get("LOADTEST_FAST_HASHERS") == "1":
+    PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
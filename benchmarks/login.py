@@ -0,0 +1,121 @@
+"""
+Latency of logins and of other API requests during a login burst, served by
+the ASGI app with the sync LoginView ("before") and AsyncLoginView ("after").
+
+Each mode runs in a fresh subprocess against a throwaway database:
+
+    python -m benchmarks.login [--logins 12] [--clients 4] [--json results.json]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import percentile
+
+EMAIL = "bench@apex.test"
+PASSWORD = "bench-password-1"
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 1),
+        "p99_ms": round(percentile(samples, 99) * 1000, 1),
+    }
+
+
+async def drive(app, logins, clients):
+    from benchmarks.asgi import asgi_request
+
+    addresses = (f"10.0.{n // 250}.{n % 250 + 1}" for n in itertools.count())
+    login_times, other_times, statuses = [], [], {}
+    done = asyncio.Event()
+
+    async def login():
+        seconds, status, _ = await asgi_request(
+            app, "POST", "/api/auth/login/",
+            {"email": EMAIL, "password": PASSWORD}, ip=next(addresses),
+        )
+        login_times.append(seconds)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    async def other_traffic():
+        # A cheap request that never touches the password hasher
+        while not done.is_set():
+            seconds, _, _ = await asgi_request(
+                app, "POST", "/api/subscribe/", {}, ip=next(addresses)
+            )
+            other_times.append(seconds)
+
+    background = [asyncio.create_task(other_traffic()) for _ in range(clients)]
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*background)
+
+    return {
+        "login": summarize(login_times),
+        "other": summarize(other_times),
+        "login_statuses": statuses,
+        "burst_seconds": round(elapsed, 2),
+    }
+
+
+def run_mode(logins, clients):
+    from benchmarks.common import setup_django
+
+    setup_django(test_database=True)
+
+    from django.core.asgi import get_asgi_application
+
+    from accounts.models import User
+
+    User.objects.create_user(
+        EMAIL, "Bench", "User", PASSWORD, is_active=True, is_verified=True
+    )
+    app = get_asgi_application()
+    print(json.dumps(asyncio.run(drive(app, logins, clients))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=12)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--json", help="Also write the results to this file.")
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        return run_mode(args.logins, args.clients)
+
+    results = {}
+    for mode in ("sync", "async"):
+        env = {**os.environ, "ASYNC_VIEWS": str(mode == "async")}
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.login", "--mode", mode,
+             "--logins", str(args.logins), "--clients", str(args.clients)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'view':<6} {'login p50':>10} {'login p99':>10} {'other p50':>10} "
+          f"{'other p99':>10} {'other reqs':>11}")
+    for mode, result in results.items():
+        login, other = result["login"], result["other"]
+        print(f"{mode:<6} {login['p50_ms']:>8}ms {login['p99_ms']:>8}ms "
+              f"{other['p50_ms']:>8}ms {other['p99_ms']:>8}ms {other['count']:>11}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
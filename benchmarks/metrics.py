@@ -0,0 +1,60 @@
+"""
+Instrumentation overhead of apex.metrics.
+
+Times the work MetricsMiddleware adds around one request (context variable,
+histogram and counter updates) and the wrapper it puts around each query.
+
+    python -m benchmarks.metrics
+"""
+
+import time
+
+from benchmarks.common import per_call, setup_django
+
+setup_django()
+
+from apex.metrics import (  # noqa: E402
+    RequestStats,
+    current_request,
+    query_recorder,
+    record_cache,
+    registry,
+)
+
+CALLS = 100_000
+
+
+def request_overhead():
+    stats = RequestStats()
+    token = current_request.set(stats)
+    started = time.perf_counter()
+    record_cache("shared", 1, 0)
+    current_request.reset(token)
+    registry.record_request(
+        "login", "POST", 200, time.perf_counter() - started, stats
+    )
+
+
+def noop_execute(sql, params, many, context):
+    return None
+
+
+def query_overhead():
+    query_recorder(noop_execute, "SELECT 1", (), False, None)
+
+
+def main():
+    print(f"{'per request':<28} {per_call(request_overhead, CALLS):>6.2f}us")
+
+    token = current_request.set(RequestStats())
+    print(f"{'per query (in request)':<28} {per_call(query_overhead, CALLS):>6.2f}us")
+    current_request.reset(token)
+    print(f"{'per query (outside request)':<28} {per_call(query_overhead, CALLS):>6.2f}us")
+
+    started = time.perf_counter()
+    registry.snapshot()
+    print(f"{'snapshot':<28} {(time.perf_counter() - started) * 1e6:>6.2f}us")
+
+
+if __name__ == "__main__":
+    main()
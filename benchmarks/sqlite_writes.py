@@ -0,0 +1,117 @@
+"""
+Write throughput of SQLite under concurrent worker processes, with the plain
+Django defaults ("default") and the SQLITE_HIGH_CONCURRENCY profile ("tuned").
+
+Each worker process simulates signup requests: a transaction that checks
+whether an email exists and then inserts it. The request_started and
+request_finished signals are sent around every request, so CONN_MAX_AGE
+behaves the way it does under gunicorn.
+
+    python -m benchmarks.sqlite_writes [--workers 4] [--requests 200] [--json results.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import percentile
+
+
+def signup_requests(job):
+    from django.core.signals import request_finished, request_started
+    from django.db import OperationalError, transaction
+
+    from apex_gym.models import NewsletterSubscriber
+
+    worker, count = job
+    latencies, locked = [], 0
+    for n in range(count):
+        email = f"writer-{worker}-{n}@apex.test"
+        request_started.send(sender=None)
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                if not NewsletterSubscriber.objects.filter(email=email).exists():
+                    NewsletterSubscriber.objects.create(email=email)
+        except OperationalError:
+            locked += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+        finally:
+            request_finished.send(sender=None)
+    return latencies, locked
+
+
+def run_profile(workers, count):
+    import django
+
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+
+    call_command("migrate", verbosity=0)
+    connection.close()
+
+    started = time.perf_counter()
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        results = pool.map(signup_requests, [(w, count) for w in range(workers)])
+    elapsed = time.perf_counter() - started
+
+    latencies = [seconds for worker_latencies, _ in results for seconds in worker_latencies]
+    locked = sum(worker_locked for _, worker_locked in results)
+    return {
+        "writes": len(latencies),
+        "locked_errors": locked,
+        "writes_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="Signups per worker.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    parser.add_argument("--profile", choices=["default", "tuned"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(run_profile(args.workers, args.requests)))
+        return
+
+    results = {}
+    for profile in ("default", "tuned"):
+        with tempfile.TemporaryDirectory(prefix="apex-sqlite-") as directory:
+            env = {
+                **os.environ,
+                "DJANGO_SETTINGS_MODULE": "benchmarks.loadtest_settings",
+                "LOADTEST_DIR": directory,
+                "SQLITE_HIGH_CONCURRENCY": str(profile == "tuned"),
+            }
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.sqlite_writes", "--profile", profile,
+                 "--workers", str(args.workers), "--requests", str(args.requests)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            results[profile] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{args.workers} workers x {args.requests} signups")
+    print(f"{'profile':<8} {'writes':>7} {'locked':>7} {'writes/s':>9} {'p50':>9} {'p99':>9}")
+    for profile, result in results.items():
+        print(f"{profile:<8} {result['writes']:>7} {result['locked_errors']:>7} "
+              f"{result['writes_per_s']:>9} {result['p50_ms']:>7}ms {result['p99_ms']:>7}ms")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+class InProcessLoadTestTests(SimpleTestCase):
+    # In its own process: the harness sets up Django with benchmarks/loadtest_settings.py
+    def test_every_journey_completes(self):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.loadtest", "inprocess", "--users", "4",
+             "--concurrency", "4", "--fast-hashers", "--json", path],
+            cwd=settings.BASE_DIR, check=True, capture_output=True, timeout=120,
+        )
+        with open(path) as fh:
+            results = json.load(fh)
+        self.assertEqual(results["failures"], [])
+        self.assertEqual((results["journeys"], results["failed_journeys"]), (4, 0))
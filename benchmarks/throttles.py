@@ -0,0 +1,57 @@
+"""
+Per-request cost of DRF's SimpleRateThrottle versus SlidingWindowRateThrottle.
+
+SimpleRateThrottle stores every request timestamp, so its cost grows with the
+allowed rate; the sliding window counter should stay flat.
+
+    python -m benchmarks.throttles
+"""
+
+from types import SimpleNamespace
+
+from benchmarks.common import per_call, setup_django
+
+setup_django()
+
+from django.core.cache import cache, caches  # noqa: E402
+from rest_framework.throttling import SimpleRateThrottle  # noqa: E402
+
+from accounts.throttles import SlidingWindowRateThrottle  # noqa: E402
+
+RATES = [10, 100, 1000, 10000]
+
+
+def make_throttle(base, rate):
+    class Throttle(base):
+        scope = "bench"
+
+        def get_cache_key(self, request, view):
+            return self.cache_format % {"scope": base.__name__, "ident": rate}
+
+    Throttle.rate = f"{rate}/h"
+    return Throttle
+
+
+def bench(base, rate):
+    throttle_class = make_throttle(base, rate)
+    request = SimpleNamespace(META={"REMOTE_ADDR": "127.0.0.1"})
+    cache.clear()
+
+    # Fill the allowance so the stored state is as large as the rate permits
+    for _ in range(rate):
+        throttle_class().allow_request(request, None)
+
+    return per_call(lambda: throttle_class().allow_request(request, None), 500)
+
+
+def main():
+    print(f"cache backend: {caches['default'].__class__.__name__}")
+    print(f"{'rate/h':>8} {'SimpleRateThrottle':>20} {'SlidingWindow':>15}")
+    for rate in RATES:
+        simple = bench(SimpleRateThrottle, rate)
+        sliding = bench(SlidingWindowRateThrottle, rate)
+        print(f"{rate:>8} {simple:>18.1f}us {sliding:>13.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+gunicorn settings, read automatically when gunicorn starts in the project root:
+
+    gunicorn apex.wsgi
+
+The master loads and warms the app once (apex/boot.py), then forks the workers,
+which share the warmed memory copy-on-write.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+preload_app = True
+
+
+def on_starting(server):
+    # Totals left behind by the workers of a previous run would be merged into /metrics
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "apex.settings")
+    from django.conf import settings
+
+    if settings.METRICS_DIR:
+        from apex.metrics import clear_metrics_dir
+
+        clear_metrics_dir()
+
+
+def post_worker_init(worker):
+    from apex.boot import connect_databases
+
+    connect_databases()